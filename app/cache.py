@@ -0,0 +1,212 @@
+from collections import Counter, OrderedDict
+from collections.abc import Awaitable, Callable, Collection, Iterable, Mapping
+from dataclasses import dataclass, field
+import json
+import threading
+import time
+from typing import Any, Protocol
+
+from pydantic import BaseModel
+from sqlalchemy import Row
+
+from app.config import Settings, settings
+
+
+MISSING = object()
+
+# Cached read endpoints. Entries hold JSON-ready schema dicts, never ORM objects.
+GAMES = "games"  # list pages, versioned by a generation counter
+
+
+def game_key(game_id: int) -> str:
+    return f"game:{game_id}"
+
+
+def gamer_games_key(gamer_id: int) -> str:
+    return f"gamer_games:{gamer_id}"
+
+
+def swap_key(swap_id: int) -> str:
+    return f"swap:{swap_id}"
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> Any: ...
+    def set(self, key: str, value: Any) -> None: ...
+    def delete(self, keys: Collection[str]) -> None: ...
+    def get_counter(self, key: str) -> int: ...
+    def incr(self, key: str) -> int: ...
+    def clear(self) -> None: ...
+
+
+@dataclass
+class LRUCache:
+    """In-process backend: least recently used entries go first, and none outlive `ttl`."""
+    max_entries: int = 10_000
+    ttl: float = 60.0
+
+    _entries: OrderedDict[str, tuple[float, Any]] = field(default_factory=OrderedDict, init=False, repr=False)
+    _counters: dict[str, int] = field(default_factory=dict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, keys: Collection[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+
+@dataclass
+class RedisCache:
+    """Shared backend, so every worker sees the same entries and invalidations.
+
+    Works with any client exposing the redis-py `get`/`set`/`delete`/`incr`/`scan_iter` calls.
+    """
+    client: Any
+    ttl: float = 60.0
+    prefix: str = "gameswap:"
+
+    def get(self, key: str) -> Any:
+        raw = self.client.get(self.prefix + key)
+        return MISSING if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any) -> None:
+        self.client.set(self.prefix + key, json.dumps(value), px=int(self.ttl * 1000))
+
+    def delete(self, keys: Collection[str]) -> None:
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def get_counter(self, key: str) -> int:
+        return int(self.client.get(f"{self.prefix}counter:{key}") or 0)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(f"{self.prefix}counter:{key}")
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+@dataclass
+class ResponseCache:
+    """Read-through cache for the read endpoints, invalidated by the CRUD writes.
+
+    Single items are deleted by key. List pages are keyed by a generation
+    counter that every write to the list bumps, so a page loaded while a write
+    commits is stored under the old generation and never served afterwards.
+    """
+    backend: CacheBackend | None
+    hits: Counter[str] = field(default_factory=Counter)
+    misses: Counter[str] = field(default_factory=Counter)
+
+    async def get_or_load(
+            self, 
+            key: str, 
+            load: Callable[[], Awaitable[Any]], 
+            version: str | None = None,
+        ) -> Any:
+        """Cached value for `key`, loaded on a miss.
+
+        With a `version` (the response ETag) an entry stored under another
+        version counts as a miss, so a value cached just before a write commits
+        is never served with the ETag of the data after it.
+        """
+        if self.backend is None:
+            return await load()
+        namespace = key.split(":", 1)[0]
+        entry = self.backend.get(key)
+        if entry is not MISSING and entry[0] == version:
+            self.hits[namespace] += 1
+            return entry[1]
+        self.misses[namespace] += 1
+        value = await load()
+        self.backend.set(key, [version, value])
+        return value
+
+    def list_key(self, name: str, *params: Any) -> str:
+        generation = self.backend.get_counter(name) if self.backend is not None else 0
+        return ":".join(map(str, (name, generation, *params)))
+
+    def invalidate(self, keys: Collection[str] = (), lists: Collection[str] = ()) -> None:
+        if self.backend is None:
+            return
+        self.backend.delete(keys)
+        for name in lists:
+            self.backend.incr(name)
+
+    def clear(self) -> None:
+        if self.backend is not None:
+            self.backend.clear()
+        self.hits.clear()
+        self.misses.clear()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            namespace: {"hits": self.hits[namespace], "misses": self.misses[namespace]}
+            for namespace in sorted(self.hits.keys() | self.misses.keys())
+        }
+
+
+def to_cached(schema: type[BaseModel], value: Any) -> Any:
+    if isinstance(value, list):
+        return [to_cached(schema, item) for item in value]
+    if isinstance(value, Row):
+        # Rows selected with the schema's columns are already in its shape
+        return value._asdict()
+    return schema.model_validate(value, from_attributes=True).model_dump(mode="json")
+
+
+def invalidate_games(games: Iterable[Mapping[str, Any]]) -> None:
+    # A game shows up on its own, in its owner's games, in its swap and in the lists
+    keys = set()
+    for game in games:
+        keys.update((game_key(game["id"]), gamer_games_key(game["gamer_id"])))
+        if game["swap_id"] is not None:
+            keys.add(swap_key(game["swap_id"]))
+    cache.invalidate(keys, lists=[GAMES])
+
+
+def create_backend(settings: Settings) -> CacheBackend | None:
+    if settings.cache_url:
+        # Optional dependency (requirements-redis.txt), only needed for a shared cache
+        import redis
+        return RedisCache(redis.Redis.from_url(settings.cache_url), ttl=settings.cache_ttl)
+    if settings.cache_enabled:
+        return LRUCache(max_entries=settings.cache_max_entries, ttl=settings.cache_ttl)
+    return None
+
+
+cache = ResponseCache(create_backend(settings))
@@ -0,0 +1,95 @@
+from dataclasses import dataclass, fields
+import os
+from types import UnionType
+from typing import Any, get_args, get_type_hints
+
+
+ENV_PREFIX = "GAMESWAP_"
+
+
+@dataclass(frozen=True)
+class Settings:
+    database_url: str = "sqlite:///gameswap.db"
+    async_database: bool = False
+    async_database_url: str = "sqlite+aiosqlite:///gameswap.db"
+
+    # Connection pool (ignored for in-memory SQLite)
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_pre_ping: bool = False
+    pool_recycle: int = -1
+
+    # SQLite connection profile, applied to every new connection
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64_000
+    sqlite_busy_timeout: int = 5_000
+
+    # Notification dispatch
+    notification_queue_size: int = 1_000
+    notification_workers: int = 4
+    notification_batch_size: int = 50
+    notification_max_retries: int = 3
+    notification_retry_backoff: float = 0.5
+    notification_overflow_policy: str = "drop_oldest"
+    notification_drain_timeout: float = 10.0
+
+    # Outbox relay
+    outbox_batch_size: int = 100
+    outbox_poll_interval: float = 1.0
+    outbox_max_attempts: int = 10
+    outbox_retention: float = 24 * 60 * 60
+    outbox_dead_letter_retention: float = 7 * 24 * 60 * 60
+
+    # Live /events feed
+    events_buffer_size: int = 100
+    events_keepalive: float = 15.0
+
+    # Read-through response cache. Setting cache_url (redis) turns on the shared
+    # cache; cache_enabled turns on an in-process one, which writes only
+    # invalidate in their own worker, so it is for single-worker deployments
+    cache_enabled: bool = False
+    cache_max_entries: int = 10_000
+    cache_ttl: float = 60.0
+    cache_url: str | None = None
+
+    # /stats counters, rebuilt from the tables at startup and then periodically
+    stats_reconcile_interval: float = 60 * 60
+
+    # Warm trade graph behind /swaps/suggestions: loaded at startup, kept up to
+    # date by this process's writes and reloaded after writes of other processes
+    trade_graph_refresh_interval: float = 60.0
+
+    # Request metrics on /metrics (Prometheus), off by default so nothing is hooked in
+    metrics_enabled: bool = False
+    metrics_server_timing: bool = False
+
+    # Diagnostics: log statements slower than this many seconds, and answer
+    # requests sent with X-Profile: 1 with a cProfile report (not for production)
+    slow_query_threshold: float | None = None
+    profiling_enabled: bool = False
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        hints = get_type_hints(cls)
+        values = {}
+        for f in fields(cls):
+            raw = os.environ.get(ENV_PREFIX + f.name.upper())
+            if raw is not None:
+                values[f.name] = _parse(raw, hints[f.name])
+        return cls(**values)
+
+
+def _parse(raw: str, type_: Any) -> Any:
+    if isinstance(type_, UnionType):
+        if raw.lower() in ("", "none"):
+            return None
+        type_ = next(arg for arg in get_args(type_) if arg is not type(None))
+    if type_ is bool:
+        return raw.lower() in ("1", "true", "yes", "on")
+    return type_(raw)
+
+
+settings = Settings.from_env()
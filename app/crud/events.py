@@ -0,0 +1,30 @@
+from typing import Any
+
+from sqlalchemy import Row
+
+from app.crud.outbox import message_key
+from app.dependencies.notifications import Event, Notification
+from app.models import Game
+
+
+# Games as they appear in responses and events; here rather than in crud.games
+# so that crud.gamers can record the events of the games its deletes cascade to
+GAME_COLUMNS = (Game.id, Game.title, Game.platform, Game.gamer_id, Game.swap_id)
+
+
+def game_data(game: Game | Row) -> dict[str, Any]:
+    return {column.key: getattr(game, column.key) for column in GAME_COLUMNS}
+
+
+def game_event(event: Event, game: Game | Row) -> Notification:
+    verb = {
+        Event.GAME_CREATED: "added", 
+        Event.GAME_UPDATED: "updated", 
+        Event.GAME_DELETED: "removed",
+    }[event]
+    return Notification(
+        event=event,
+        message=f"{game.title} ({game.platform}) {verb}.",
+        key=message_key(event, game.id),
+        data=game_data(game),
+    )
@@ -1,11 +1,25 @@
+from collections.abc import Collection, Mapping
+
+from sqlalchemy import Row, Select, insert, select
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.dependencies.notifications import Event, Notification, NotificationService
-from app.models import Game, Gamer
+from app.cache import GAMES, cache, game_key, gamer_games_key, swap_key
+from app.crud.events import game_event
+from app.crud.outbox import add_messages, message_key
+from app.crud.pagination import DEFAULT_CHUNK_SIZE, Chunks, paginate, stream
+from app.crud.stats import count_games, count_wishes
+from app.crud.versions import bump_table_versions, update_row_version
+from app.cycles import trade_graph
+from app.dependencies.notifications import Event, Notification
+from app.models import Game, Gamer, Swap
 from app.schemas.gamer import GamerCreate, GamerUpdate
 
 
+GAMER_COLUMNS = (Gamer.id, Gamer.name, Gamer.email)
+
+
 class GamerNotFoundError(Exception):
     pass
 
@@ -21,63 +35,160 @@ def get_gamer(session: Session, gamer_id: int) -> Gamer:
     return gamer
 
 
-def get_gamers(session: Session) -> list[Gamer]:
-    gamers = session.query(Gamer).all()
+def get_gamer_version(session: Session, gamer_id: int) -> int:
+    version = session.execute(select(Gamer.version).where(Gamer.id == gamer_id)).scalar_one_or_none()
+    if version is None:
+        raise GamerNotFoundError
+    return version
+
+
+def get_gamers(session: Session, limit: int | None = None, after: int | None = None) -> list[Row]:
+    result = session.execute(paginate(select(*GAMER_COLUMNS), Gamer.id, limit, after))
+    gamers = result.all()
     return gamers
 
 
-def create_gamer(
-        session: Session, 
-        params: GamerCreate,
-        notification_service: NotificationService,
-    ) -> Gamer:
+def stream_gamers(
+        session: Session | AsyncSession, 
+        title: str | None = None, 
+        platform: str | None = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Chunks:
+    if title or platform:
+        stmt = _select_gamers_who_own_game(title, platform)
+    else:
+        stmt = select(Gamer)
+    return stream(session, stmt.order_by(Gamer.id), chunk_size)
+
+
+def create_gamer(session: Session, params: GamerCreate) -> Gamer:
     gamer = Gamer(**params.model_dump())
     session.add(gamer)
     try:
-        session.commit()
+        session.flush()
     except IntegrityError as exc:
         session.rollback()
         raise DuplicateGamerError from exc
+    add_messages(session, [_gamer_created(gamer)])
+    bump_table_versions(session, "gamer")
+    session.commit()
     session.refresh(gamer)
+    return gamer
+    
 
-    notification_service.post(
-        Notification(
-            event=Event.GAMER_CREATED,
-            message=f"Welcome {gamer.name}!"
-        )
+def create_gamers(
+        session: Session,
+        items: Mapping[int, GamerCreate],
+    ) -> tuple[list[Row], dict[int, str]]:
+    emails = {params.email for params in items.values()}
+    taken = set(session.execute(select(Gamer.email).where(Gamer.email.in_(emails))).scalars())
+
+    rows, errors = [], {}
+    for index, params in items.items():
+        if params.email in taken:
+            errors[index] = f"Gamer with email {params.email} already exists."
+            continue
+        taken.add(params.email)
+        rows.append(params.model_dump())
+    if not rows:
+        return [], errors
+
+    stmt = insert(Gamer).returning(Gamer.id, Gamer.name, Gamer.email, sort_by_parameter_order=True)
+    try:
+        gamers = session.execute(stmt, rows).all()
+    except IntegrityError as exc:
+        session.rollback()
+        raise DuplicateGamerError from exc
+    add_messages(session, [_gamer_created(gamer) for gamer in gamers])
+    bump_table_versions(session, "gamer")
+    session.commit()
+    return gamers, errors
+
+
+def _gamer_created(gamer: Gamer | Row) -> Notification:
+    return Notification(
+        event=Event.GAMER_CREATED,
+        message=f"Welcome {gamer.name}!",
+        key=message_key(Event.GAMER_CREATED, gamer.id),
+        data={"gamer_id": gamer.id, "name": gamer.name},
     )
 
-    return gamer
-    
 
-def update_gamer(session: Session, gamer_id: int, params: GamerUpdate) -> Gamer:
+def update_gamer(
+        session: Session, 
+        gamer_id: int, 
+        params: GamerUpdate,
+        versions: Collection[int] | None = None,
+    ) -> Gamer:
     gamer = get_gamer(session, gamer_id)
-    for attr, value in params.model_dump(exclude_unset=True).items():
-        setattr(gamer, attr, value)
-    session.add(gamer)
     try:
-        session.commit()
+        update_row_version(
+            session, Gamer, gamer_id, versions, **params.model_dump(exclude_unset=True)
+        )
     except IntegrityError as exc:
+        session.rollback()
         raise DuplicateGamerError from exc
+    bump_table_versions(session, "gamer")
+    session.commit()
     session.refresh(gamer)
+    # Swaps embed both gamers
+    cache.invalidate([swap_key(swap_id) for swap_id in _get_swap_ids(session, gamer_id)])
     return gamer
 
 
-def delete_gamer(session: Session, gamer_id: int) -> None:    
+def delete_gamer(
+        session: Session, 
+        gamer_id: int, 
+        versions: Collection[int] | None = None,
+    ) -> None:    
     gamer = get_gamer(session, gamer_id)
+    if versions is not None:
+        update_row_version(session, Gamer, gamer_id, versions)
+    keys = [gamer_games_key(gamer_id)]
+    keys += [game_key(game.id) for game in gamer.games]
+    keys += [swap_key(swap_id) for swap_id in _get_swap_ids(session, gamer_id)]
+    count_games(session, [{"platform": game.platform, "swap_id": game.swap_id} for game in gamer.games], -1)
+    wishes = [(wish.title, wish.platform) for wish in gamer.wishlist]
+    count_wishes(session, wishes, -1)
+    game_ids = [game.id for game in gamer.games]
+    # Their games go with them, so their subscribers are told as for any deleted game
+    add_messages(session, [game_event(Event.GAME_DELETED, game) for game in gamer.games])
     session.delete(gamer)
+    # Their games and wishes go with them
+    bump_table_versions(session, "gamer", "game", "wish")
     session.commit()
+    cache.invalidate(keys, lists=[GAMES])
+    trade_graph.remove_games(game_ids)
+    trade_graph.remove_wishes(gamer_id, wishes)
+
+
+def _get_swap_ids(session: Session, gamer_id: int) -> list[int]:
+    return session.execute(
+        select(Swap.id).where(Swap.proposer_id == gamer_id)
+        .union(select(Swap.id).where(Swap.acceptor_id == gamer_id))
+    ).scalars().all()
 
 
-def get_gamers_who_own_game(session: Session, title: str | None, platform: str | None) -> list[Gamer]:
+def get_gamers_who_own_game(
+        session: Session, 
+        title: str | None, 
+        platform: str | None,
+        limit: int | None = None,
+        after: int | None = None,
+    ) -> list[Row]:
     if title is None and platform is None:
         raise ValueError("At least one filter parameter should be provided.")
     
-    query = session.query(Gamer)
+    stmt = _select_gamers_who_own_game(title, platform).with_only_columns(*GAMER_COLUMNS)
+    gamers = session.execute(paginate(stmt, Gamer.id, limit, after)).all()
+    return gamers
+
+
+def _select_gamers_who_own_game(title: str | None, platform: str | None) -> Select:
+    # IN subqueries seek the game indexes first instead of probing every gamer
+    stmt = select(Gamer)
     if title:
-        query = query.filter(Gamer.games.any(Game.title == title))
+        stmt = stmt.where(Gamer.id.in_(select(Game.gamer_id).where(Game.title == title)))
     if platform:
-        query = query.filter(Gamer.games.any(Game.platform == platform))
-
-    gamers = query.all()
-    return gamers
+        stmt = stmt.where(Gamer.id.in_(select(Game.gamer_id).where(Game.platform == platform)))
+    return stmt
@@ -1,10 +1,30 @@
-from sqlalchemy import select
+from collections import defaultdict
+from collections.abc import Collection, Iterable, Mapping, Sequence
+from itertools import islice
+from typing import Any
+
+from sqlalchemy import Row, delete, insert, select, update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.crud.gamers import GamerNotFoundError
-from app.models import Game 
-from app.schemas.game import GameCreate, GameUpdate
+from app.cache import GAMES, cache, gamer_games_key, invalidate_games
+from app.crud.events import GAME_COLUMNS, game_data, game_event
+from app.crud.gamers import GamerNotFoundError, get_gamer
+from app.crud.outbox import add_messages
+from app.crud.pagination import DEFAULT_CHUNK_SIZE, Chunks, paginate, stream
+from app.crud.stats import count_games
+from app.crud.versions import bump_table_versions, update_row_version
+from app.cycles import trade_graph
+from app.dependencies.notifications import Event
+from app.models import Game, Gamer
+from app.schemas.bulk import validate_items
+from app.search import search_statement
+from app.schemas.game import GameBulkUpdate, GameCreate, GameUpdate
+
+
+GAME_FIELDS = tuple(column.key for column in GAME_COLUMNS)
+GAME_EXPANSIONS = ("gamer",)
 
 
 class GameNotFoundError(Exception):
@@ -15,6 +35,17 @@ class GameUnavailableError(Exception):
     pass
 
 
+# Renaming a game in a swap to another game's title and platform in that swap
+# is refused by the unique index ix_game_swap_id_title_platform
+_DUPLICATE_IN_SWAP = "A game in a swap cannot share its title and platform with another game in that swap."
+
+
+def _is_duplicate_in_swap(exc: IntegrityError) -> bool:
+    # Postgres names the index, SQLite its columns
+    message = str(exc.orig)
+    return "ix_game_swap_id_title_platform" in message or "game.swap_id, game.title, game.platform" in message
+
+
 def get_game(session: Session, game_id: int) -> Game:
     game = session.get(Game, game_id)
     if game is None:
@@ -22,42 +53,340 @@ def get_game(session: Session, game_id: int) -> Game:
     return game
 
 
-def get_games(session: Session) -> list[Game]:
-    games = session.query(Game).all()
+def get_game_version(session: Session, game_id: int) -> int:
+    version = session.execute(select(Game.version).where(Game.id == game_id)).scalar_one_or_none()
+    if version is None:
+        raise GameNotFoundError(f"Game {game_id} not found.")
+    return version
+
+
+def get_games(session: Session, limit: int | None = None, after: int | None = None) -> list[Row]:
+    result = session.execute(paginate(select(*GAME_COLUMNS), Game.id, limit, after))
+    games = result.all()
     return games
 
 
+def get_gamer_games(
+        session: Session, 
+        gamer_id: int,
+        fields: Collection[str] | None = None,
+        expand: Collection[str] = (),
+    ) -> list[Row] | list[dict[str, Any]]:
+    gamer = get_gamer(session, gamer_id)
+    stmt = select(*game_columns(fields)).where(Game.gamer_id == gamer_id).order_by(Game.id)
+    games = session.execute(stmt).all()
+    if "gamer" not in expand:
+        return games
+    # Every game has the same owner, already loaded for the 404 check
+    owner = {"id": gamer.id, "name": gamer.name, "email": gamer.email}
+    return [{**game._asdict(), "gamer": owner} for game in games]
+
+
+def get_gamer_game_versions(session: Session, gamer_id: int) -> list[tuple[int, int | None, int | None]]:
+    """(gamer version, game id, game version) per game of a gamer, in id order.
+
+    Tags the gamer's games list: any write to the gamer or one of its games,
+    or a game added or removed, changes the result.
+    """
+    stmt = (
+        select(Gamer.version, Game.id, Game.version)
+        .select_from(Gamer)
+        .outerjoin(Game, Game.gamer_id == Gamer.id)
+        .where(Gamer.id == gamer_id)
+        .order_by(Game.id)
+    )
+    versions = [tuple(row) for row in session.execute(stmt)]
+    if not versions:
+        raise GamerNotFoundError
+    return versions
+
+
+def game_columns(fields: Collection[str] | None = None) -> list:
+    """GAME_COLUMNS narrowed to a sparse fieldset, in schema order."""
+    if fields is None:
+        return list(GAME_COLUMNS)
+    return [column for column in GAME_COLUMNS if column.key in fields]
+
+
+def stream_games(
+        session: Session | AsyncSession, 
+        only_available: bool = False, 
+        gamer_id: int | None = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Chunks:
+    stmt = select(Game).order_by(Game.id)
+    if only_available:
+        stmt = stmt.where(Game.swap_id == None)
+    if gamer_id is not None:
+        stmt = stmt.where(Game.gamer_id == gamer_id)
+    return stream(session, stmt, chunk_size)
+
+
 def create_game(session: Session, params: GameCreate) -> Game:
     game = Game(**params.model_dump())
     session.add(game)
     try:
-        session.commit()
+        session.flush()
     except IntegrityError as exc:
         session.rollback()
         raise GamerNotFoundError from exc
+    add_messages(session, [game_event(Event.GAME_CREATED, game)])
+    count_games(session, [game_data(game)])
+    bump_table_versions(session, "game")
+    session.commit()
     session.refresh(game)
+    invalidate_games([game_data(game)])
+    trade_graph.update_games([game_data(game)])
     return game
     
 
-def update_game(session: Session, game_id: int, params: GameUpdate) -> Game:
+def create_games(
+        session: Session, 
+        items: Mapping[int, GameCreate],
+    ) -> tuple[list[Row], dict[int, str]]:
+    rows, errors = _game_rows(session, items)
+    if not rows:
+        return [], errors
+
+    games = _insert_games(session, rows)
+    session.commit()
+    invalidate_games([game_data(game) for game in games])
+    trade_graph.update_games([game_data(game) for game in games])
+    return games, errors
+
+
+def _insert_games(session: Session, rows: list[dict[str, Any]]) -> list[Row]:
+    # Inserts, outbox messages and counters, left for the caller to commit
+    stmt = insert(Game).returning(*GAME_COLUMNS, sort_by_parameter_order=True)
+    try:
+        games = session.execute(stmt, rows).all()
+    except IntegrityError as exc:
+        session.rollback()
+        raise GamerNotFoundError from exc
+    add_messages(session, [game_event(Event.GAME_CREATED, game) for game in games])
+    count_games(session, [game_data(game) for game in games])
+    bump_table_versions(session, "game")
+    return games
+
+
+def import_games(
+        session: Session, 
+        records: Iterable[Any], 
+        batch_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> tuple[int, dict[int, str]]:
+    """Insert valid records in batches, all in one transaction.
+
+    Invalid records are reported by index and skipped; an error reading the
+    upload itself (see app.imports) rolls back the whole import. Only the
+    owners of the new games are kept, so memory does not grow with the upload.
+    """
+    created, gamer_ids, errors, start = 0, set(), {}, 0
+    records = iter(records)
+    try:
+        while batch := list(islice(records, batch_size)):
+            valid, invalid = validate_items(batch, GameCreate, start=start)
+            rows, missing = _game_rows(session, valid) if valid else ([], {})
+            if rows:
+                games = _insert_games(session, rows)
+                created += len(games)
+                gamer_ids.update(game.gamer_id for game in games)
+            errors |= invalid | missing
+            start += len(batch)
+    except Exception:
+        session.rollback()
+        raise
+    session.commit()
+    # New games are in no swap and have no cache entries of their own yet
+    cache.invalidate([gamer_games_key(gamer_id) for gamer_id in gamer_ids], lists=[GAMES])
+    # Reloaded by the refresher rather than replayed game by game
+    trade_graph.mark_stale()
+    return created, errors
+
+
+def _game_rows(
+        session: Session, 
+        items: Mapping[int, GameCreate],
+    ) -> tuple[list[dict[str, Any]], dict[int, str]]:
+    # Items are keyed by their position in the request, which errors refer back to
+    gamer_ids = {params.gamer_id for params in items.values()}
+    existing = set(session.execute(select(Gamer.id).where(Gamer.id.in_(gamer_ids))).scalars())
+
+    rows, errors = [], {}
+    for index, params in items.items():
+        if params.gamer_id in existing:
+            rows.append(params.model_dump())
+        else:
+            errors[index] = f"Gamer {params.gamer_id} not found."
+    return rows, errors
+
+
+def update_game(
+        session: Session, 
+        game_id: int, 
+        params: GameUpdate,
+        versions: Collection[int] | None = None,
+    ) -> Game:
     game = get_game(session, game_id)
-    for attr, value in params.model_dump(exclude_unset=True).items():
-        setattr(game, attr, value)
-    session.add(game)
+    before = game_data(game)
+    values = params.model_dump(exclude_unset=True)
+    try:
+        update_row_version(session, Game, game_id, versions, **values)
+    except IntegrityError as exc:
+        session.rollback()
+        if not _is_duplicate_in_swap(exc):
+            raise
+        raise GameUnavailableError(_DUPLICATE_IN_SWAP) from exc
+    add_messages(session, [game_event(Event.GAME_UPDATED, game)])
+    _count_moved_games(session, [before], [{**before, **values}])
+    bump_table_versions(session, "game")
     session.commit()
     session.refresh(game)
+    invalidate_games([game_data(game)])
+    trade_graph.update_games([game_data(game)])
     return game
 
 
-def delete_game(session: Session, game_id: int) -> None:    
+def update_games(
+        session: Session, 
+        items: Mapping[int, GameBulkUpdate],
+    ) -> tuple[list[Row], dict[int, str]]:
+    game_ids = {params.id for params in items.values()}
+    before = {
+        game.id: game 
+        for game in session.execute(select(*GAME_COLUMNS, Game.version).where(Game.id.in_(game_ids)))
+    }
+    existing = {game_id: game.version for game_id, game in before.items()}
+
+    # Titles and platforms taken in the swaps of these games, so a rename that
+    # would clash inside its swap is reported on its own item
+    current = {game_id: (game.title, game.platform) for game_id, game in before.items()}
+    swap_ids = {game.swap_id for game in before.values() if game.swap_id is not None}
+    taken = defaultdict(dict)
+    if swap_ids:
+        stmt = select(Game.id, Game.title, Game.platform, Game.swap_id).where(Game.swap_id.in_(swap_ids))
+        for game in session.execute(stmt):
+            taken[game.swap_id][(game.title, game.platform)] = game.id
+
+    rows, errors = [], {}
+    for index, params in items.items():
+        if params.id not in existing:
+            errors[index] = f"Game {params.id} not found."
+            continue
+        values = params.model_dump(exclude_unset=True)
+        if len(values) > 1:
+            title, platform = current[params.id]
+            key = (values.get("title", title), values.get("platform", platform))
+            swap_id = before[params.id].swap_id
+            if swap_id is not None:
+                if taken[swap_id].get(key, params.id) != params.id:
+                    errors[index] = _DUPLICATE_IN_SWAP
+                    continue
+                del taken[swap_id][current[params.id]]
+                taken[swap_id][key] = params.id
+            current[params.id] = key
+            # A game listed twice is bumped once per row
+            existing[params.id] += 1
+            rows.append({**values, "version": existing[params.id]})
+    if rows:
+        try:
+            session.execute(update(Game), rows)
+        except IntegrityError as exc:
+            # Only a swap changed by a concurrent write gets here
+            session.rollback()
+            if not _is_duplicate_in_swap(exc):
+                raise
+            raise GameUnavailableError(_DUPLICATE_IN_SWAP) from exc
+
+    updated_ids = game_ids & existing.keys()
+    games = session.execute(
+        select(*GAME_COLUMNS).where(Game.id.in_(updated_ids)).order_by(Game.id)
+    ).all()
+    if rows:
+        changed = [game for game in games if game.id in {row["id"] for row in rows}]
+        add_messages(session, [game_event(Event.GAME_UPDATED, game) for game in changed])
+        _count_moved_games(
+            session, 
+            [game_data(before[game.id]) for game in changed], 
+            [game_data(game) for game in changed],
+        )
+        bump_table_versions(session, "game")
+        session.commit()
+        invalidate_games([game_data(game) for game in changed])
+        trade_graph.update_games([game_data(game) for game in changed])
+    return games, errors
+
+
+def delete_game(
+        session: Session, 
+        game_id: int, 
+        versions: Collection[int] | None = None,
+    ) -> None:    
     game = get_game(session, game_id)
     if not game.is_available():
         raise GameUnavailableError(f"Game {game.id} is currently in a swap.")
+    if versions is not None:
+        update_row_version(session, Game, game_id, versions)
+    deleted = game_event(Event.GAME_DELETED, game)
+    add_messages(session, [deleted])
+    count_games(session, [deleted.data], -1)
     session.delete(game)
+    bump_table_versions(session, "game")
     session.commit()
+    invalidate_games([deleted.data])
+    trade_graph.remove_games([game_id])
+
+
+def delete_games(session: Session, game_ids: Sequence[int]) -> tuple[list[int], dict[int, str]]:
+    found = {
+        game.id: game 
+        for game in session.execute(select(*GAME_COLUMNS).where(Game.id.in_(game_ids)))
+    }
+
+    deletable, errors = [], {}
+    for index, game_id in enumerate(game_ids):
+        if game_id not in found:
+            errors[index] = f"Game {game_id} not found."
+        elif found[game_id].swap_id is not None:
+            errors[index] = f"Game {game_id} is currently in a swap."
+        elif game_id not in deletable:
+            deletable.append(game_id)
+    if deletable:
+        session.execute(
+            delete(Game)
+            .where(Game.id.in_(deletable), Game.swap_id == None)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = [game_event(Event.GAME_DELETED, found[game_id]) for game_id in deletable]
+        add_messages(session, deleted)
+        count_games(session, [event.data for event in deleted], -1)
+        bump_table_versions(session, "game")
+        session.commit()
+        invalidate_games([event.data for event in deleted])
+        trade_graph.remove_games(deletable)
+    return deletable, errors
+
+
+def _count_moved_games(
+        session: Session, 
+        before: list[dict[str, Any]], 
+        after: list[dict[str, Any]],
+    ) -> None:
+    # Only a platform change moves a game between counters
+    moved = [index for index, game in enumerate(before) if game["platform"] != after[index]["platform"]]
+    if moved:
+        count_games(session, [before[index] for index in moved], -1)
+        count_games(session, [after[index] for index in moved])
+
+
+def search_games(session: Session, query: str, limit: int, offset: int = 0) -> list[Game]:
+    dialect = session.get_bind().dialect.name
+    stmt = search_statement(dialect, query).limit(limit).offset(offset)
+    games = session.execute(stmt).scalars().all()
+    return games
 
 
-def get_available_games(session: Session) -> list[Game]:
-    result = session.execute(select(Game).where(Game.swap_id == None))
-    games = result.scalars().all()
+def get_available_games(session: Session, limit: int | None = None, after: int | None = None) -> list[Row]:
+    stmt = paginate(select(*GAME_COLUMNS).where(Game.swap_id == None), Game.id, limit, after)
+    result = session.execute(stmt)
+    games = result.all()
     return games
@@ -0,0 +1,99 @@
+from collections.abc import Iterable
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import Row, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.dependencies.notifications import Event, Notification
+from app.models import OutboxMessage, utcnow
+
+
+def message_key(event: Event, subject_id: int) -> str:
+    # Ids can be reused once deleted, so a random suffix keeps every message's key unique
+    return f"{event}:{subject_id}:{uuid4().hex}"
+
+
+def add_messages(session: Session, notifications: Iterable[Notification]) -> None:
+    # Part of the caller's transaction: the message is only kept if the write commits
+    rows = [
+        {"key": n.key, "event": n.event, "message": n.message, "data": n.data}
+        for n in notifications
+    ]
+    if rows:
+        session.execute(insert(OutboxMessage), rows)
+
+
+def get_pending_messages(session: Session, limit: int, max_attempts: int) -> list[Row]:
+    stmt = (
+        select(
+            OutboxMessage.id, 
+            OutboxMessage.key, 
+            OutboxMessage.event, 
+            OutboxMessage.message, 
+            OutboxMessage.data,
+            OutboxMessage.attempts,
+        )
+        .where(OutboxMessage.delivered_at == None, OutboxMessage.attempts < max_attempts)
+        .order_by(OutboxMessage.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return session.execute(stmt).all()
+
+
+def mark_messages(session: Session, delivered: list[int], failed: list[int], dead: list[int] = ()) -> None:
+    """Record an attempt at each message; `dead` ones (among `failed`) had their last."""
+    attempts = OutboxMessage.attempts + 1
+    if delivered:
+        session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(delivered))
+            .values(delivered_at=utcnow(), attempts=attempts)
+        )
+    if failed:
+        session.execute(
+            update(OutboxMessage).where(OutboxMessage.id.in_(failed)).values(attempts=attempts)
+        )
+    if dead:
+        session.execute(
+            update(OutboxMessage).where(OutboxMessage.id.in_(dead)).values(failed_at=utcnow())
+        )
+    session.commit()
+
+
+def get_relay_lag(session: Session, max_attempts: int) -> float:
+    """Seconds since the oldest message still waiting for delivery was written."""
+    created_at = session.execute(
+        select(OutboxMessage.created_at)
+        .where(OutboxMessage.delivered_at == None, OutboxMessage.attempts < max_attempts)
+        .order_by(OutboxMessage.id)
+        .limit(1)
+    ).scalar_one_or_none()
+    if created_at is None:
+        return 0.0
+    return max((utcnow() - created_at).total_seconds(), 0.0)
+
+
+def count_dead_letters(session: Session) -> int:
+    return session.execute(
+        select(func.count()).select_from(OutboxMessage).where(OutboxMessage.failed_at != None)
+    ).scalar_one()
+
+
+def prune_messages(
+        session: Session, 
+        delivered_before: datetime, 
+        failed_before: datetime | None = None,
+    ) -> int:
+    """Delete messages delivered before `delivered_before`, and dead letters
+    that failed before `failed_before`."""
+    pruned = session.execute(
+        delete(OutboxMessage).where(OutboxMessage.delivered_at < delivered_before)
+    ).rowcount
+    if failed_before is not None:
+        pruned += session.execute(
+            delete(OutboxMessage).where(OutboxMessage.failed_at < failed_before)
+        ).rowcount
+    session.commit()
+    return pruned
@@ -0,0 +1,55 @@
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+from sqlalchemy import Select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute, Session
+
+
+DEFAULT_CHUNK_SIZE = 500
+
+Chunks = Iterator[list[Any]] | AsyncIterator[list[Any]]
+
+
+def paginate(
+        stmt: Select, 
+        key: InstrumentedAttribute[int], 
+        limit: int | None = None, 
+        after: int | None = None,
+    ) -> Select:
+    # Keyset pagination: seek past the cursor on an indexed key instead of OFFSET
+    stmt = stmt.order_by(key)
+    if after is not None:
+        stmt = stmt.where(key > after)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def stream(
+        session: Session | AsyncSession, 
+        stmt: Select, 
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        scalars: bool = True,
+    ) -> Chunks:
+    # Streams outlive the request-scoped session, so they run in a session of their own.
+    # Chunks hold the first column of each row, or whole rows without `scalars`
+    stmt = stmt.execution_options(yield_per=chunk_size)
+    if isinstance(session, AsyncSession):
+        return _stream_async(session.bind, stmt, scalars)
+    return _stream(session.get_bind(), stmt, scalars)
+
+
+def _stream(bind: Engine, stmt: Select, scalars: bool) -> Iterator[list[Any]]:
+    with Session(bind) as stream_session:
+        result = stream_session.execute(stmt)
+        for partition in (result.scalars() if scalars else result).partitions():
+            yield partition
+
+
+async def _stream_async(bind: AsyncEngine, stmt: Select, scalars: bool) -> AsyncIterator[list[Any]]:
+    async with AsyncSession(bind) as stream_session:
+        result = await stream_session.stream(stmt)
+        async for partition in (result.scalars() if scalars else result).partitions():
+            yield partition
@@ -0,0 +1,143 @@
+from collections import Counter
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Any
+
+from sqlalchemy import Row, case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.crud.versions import UPSERTS
+from app.models import Game, Gamer, GamerStats, PlatformStats, Swap, TitleStats, Wish
+
+
+def count_games(session: Session, games: Iterable[Mapping[str, Any]], sign: int = 1) -> None:
+    """Add games (or remove them, with `sign=-1`) to the per-platform counters."""
+    totals, available = Counter(), Counter()
+    for game in games:
+        totals[game["platform"]] += sign
+        if game["swap_id"] is None:
+            available[game["platform"]] += sign
+    _add(session, PlatformStats, ("platform",), [
+        {"platform": platform, "games": count, "available": available[platform]}
+        for platform, count in sorted(totals.items())
+    ])
+
+
+def count_swap(
+        session: Session,
+        gamer_ids: Iterable[int],
+        games: Iterable[Mapping[str, Any]],
+        sign: int = 1,
+    ) -> None:
+    """Record a swap (or its cancellation, with `sign=-1`) for its gamers and games."""
+    claimed = Counter(game["platform"] for game in games)
+    _add(session, PlatformStats, ("platform",), [
+        {"platform": platform, "games": 0, "available": -sign * count}
+        for platform, count in sorted(claimed.items())
+    ])
+    _add(session, GamerStats, ("gamer_id",), [
+        {"gamer_id": gamer_id, "swaps": sign} for gamer_id in sorted(gamer_ids)
+    ])
+
+
+def count_wishes(session: Session, wishes: Iterable[tuple[str, str]], sign: int = 1) -> None:
+    counts = Counter(wishes)
+    _add(session, TitleStats, ("title", "platform"), [
+        {"title": title, "platform": platform, "wishes": sign * count}
+        for (title, platform), count in sorted(counts.items())
+    ])
+
+
+def _add(session: Session, model: type, keys: Sequence[str], rows: list[dict[str, Any]]) -> None:
+    # Counters are incremented in place, in the caller's transaction
+    if not rows:
+        return
+    counts = [name for name in rows[0] if name not in keys]
+    dialect = session.get_bind().dialect.name
+    if dialect in UPSERTS:
+        stmt = UPSERTS[dialect](model).values(rows)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[getattr(model, key) for key in keys],
+            set_={name: getattr(model, name) + stmt.excluded[name] for name in counts},
+        ))
+        return
+    for row in rows:
+        result = session.execute(
+            update(model)
+            .where(*(getattr(model, key) == row[key] for key in keys))
+            .values({name: getattr(model, name) + row[name] for name in counts})
+        )
+        if result.rowcount == 0:
+            session.execute(insert(model).values(row))
+
+
+def reconcile_stats(session: Session) -> None:
+    """Rebuild every counter from the base tables, in one transaction.
+
+    Corrects any drift (writes that bypassed the CRUD layer, databases that
+    predate the counters); a write committing while this runs is picked up by
+    the next run at the latest.
+    """
+    session.execute(delete(PlatformStats))
+    session.execute(insert(PlatformStats).from_select(
+        ["platform", "games", "available"],
+        select(
+            Game.platform,
+            func.count(),
+            func.sum(case((Game.swap_id == None, 1), else_=0)),
+        ).group_by(Game.platform),
+    ))
+    session.execute(delete(GamerStats))
+    swaps = (
+        select(Swap.proposer_id.label("gamer_id"))
+        .union_all(select(Swap.acceptor_id))
+        .subquery()
+    )
+    session.execute(insert(GamerStats).from_select(
+        ["gamer_id", "swaps"],
+        select(swaps.c.gamer_id, func.count()).group_by(swaps.c.gamer_id),
+    ))
+    session.execute(delete(TitleStats))
+    session.execute(insert(TitleStats).from_select(
+        ["title", "platform", "wishes"],
+        select(Wish.title, Wish.platform, func.count()).group_by(Wish.title, Wish.platform),
+    ))
+    session.commit()
+
+
+def get_platform_stats(session: Session) -> list[Row]:
+    stmt = (
+        select(PlatformStats.platform, PlatformStats.games, PlatformStats.available)
+        .where(PlatformStats.games > 0)
+        .order_by(PlatformStats.platform)
+    )
+    return session.execute(stmt).all()
+
+
+def get_game_totals(session: Session) -> Row:
+    # One row per platform, so this stays small however many games there are
+    stmt = select(
+        func.coalesce(func.sum(PlatformStats.games), 0).label("games"),
+        func.coalesce(func.sum(PlatformStats.available), 0).label("available"),
+    )
+    return session.execute(stmt).one()
+
+
+def get_gamer_stats(session: Session, gamer_id: int) -> Row | None:
+    # None for an unknown gamer; app.crud.gamers (and its GamerNotFoundError)
+    # imports this module for the counters
+    stmt = (
+        select(Gamer.id.label("gamer_id"), func.coalesce(GamerStats.swaps, 0).label("swaps"))
+        .outerjoin(GamerStats, GamerStats.gamer_id == Gamer.id)
+        .where(Gamer.id == gamer_id)
+    )
+    return session.execute(stmt).one_or_none()
+
+
+def get_most_wanted(session: Session, limit: int) -> list[Row]:
+    stmt = (
+        select(TitleStats.title, TitleStats.platform, TitleStats.wishes)
+        .where(TitleStats.wishes > 0)
+        .order_by(TitleStats.wishes.desc(), TitleStats.title, TitleStats.platform)
+        .limit(limit)
+    )
+    return session.execute(stmt).all()
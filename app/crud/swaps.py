@@ -1,12 +1,28 @@
+from collections import defaultdict
+from collections.abc import Collection
+from typing import Any
+
+from sqlalchemy import select, update
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
 
-from app.crud.games import GameNotFoundError, get_game
-from app.dependencies.notifications import Event, Notification, NotificationService
-from app.models import Swap
+from app.cache import invalidate_games
+from app.crud.gamers import GAMER_COLUMNS
+from app.crud.events import GAME_COLUMNS, game_data
+from app.crud.outbox import add_messages, message_key
+from app.crud.pagination import DEFAULT_CHUNK_SIZE, Chunks, paginate, stream
+from app.crud.stats import count_swap
+from app.crud.versions import bump_table_versions, get_table_versions
+from app.dependencies.notifications import Event, Notification
+from app.cycles import trade_graph
+from app.models import Game, Gamer, Swap, SwapGameValidator, Wish
 from app.schemas.swap import SwapCreate
 
 
+SWAP_FIELDS = ("id", "proposer", "acceptor", "games")
+
+
 class SwapNotFoundError(Exception):
     pass
 
@@ -15,60 +31,225 @@ class InvalidSwapError(Exception):
     pass
 
 
+# Eager loading strategies for serializing a swap with its gamers and games:
+# a single swap is fetched with one JOIN, streams (yield_per) cannot use joined
+# collections so everything is loaded with SELECT ... IN per chunk. Lists skip
+# the ORM altogether, see get_swaps.
+SWAP_DETAIL_OPTIONS = (
+    joinedload(Swap.proposer), 
+    joinedload(Swap.acceptor), 
+    joinedload(Swap.games),
+)
+SWAP_STREAM_OPTIONS = (
+    selectinload(Swap.proposer), 
+    selectinload(Swap.acceptor), 
+    selectinload(Swap.games),
+)
+
+
 def get_swap(session: Session, swap_id: int) -> Swap:
-    swap = session.get(Swap, swap_id)
+    stmt = (
+        select(Swap)
+        .where(Swap.id == swap_id)
+        .options(*SWAP_DETAIL_OPTIONS)
+        .execution_options(populate_existing=True)
+    )
+    swap = session.execute(stmt).unique().scalar_one_or_none()
     if swap is None:
         raise SwapNotFoundError
     return swap
 
 
-def get_swaps(session: Session) -> list[Swap]:
-    swaps = session.query(Swap).all()
+def get_swap_versions(session: Session, swap_id: int) -> list[tuple[int, int, int | None, int | None]]:
+    """(proposer version, acceptor version, game id, game version) per game of
+    a swap, in id order: the rows a swap is serialized from."""
+    proposer, acceptor = aliased(Gamer), aliased(Gamer)
+    stmt = (
+        select(proposer.version, acceptor.version, Game.id, Game.version)
+        .select_from(Swap)
+        .join(proposer, proposer.id == Swap.proposer_id)
+        .join(acceptor, acceptor.id == Swap.acceptor_id)
+        .outerjoin(Game, Game.swap_id == Swap.id)
+        .where(Swap.id == swap_id)
+        .order_by(Game.id)
+    )
+    versions = [tuple(row) for row in session.execute(stmt)]
+    if not versions:
+        raise SwapNotFoundError
+    return versions
+
+
+def get_swaps(
+        session: Session, 
+        limit: int | None = None, 
+        after: int | None = None,
+        fields: Collection[str] | None = None,
+    ) -> list[dict[str, Any]]:
+    # Plain columns in the shape of the Swap schema: the swaps joined with the
+    # gamers asked for, then their games in one SELECT ... IN if asked for
+    fields = SWAP_FIELDS if fields is None else fields
+    stmt = select(Swap.id)
+    gamers = [role for role in ("proposer", "acceptor") if role in fields]
+    for role in gamers:
+        gamer = aliased(Gamer)
+        key = Swap.proposer_id if role == "proposer" else Swap.acceptor_id
+        stmt = stmt.add_columns(*_gamer_columns(gamer)).join(gamer, gamer.id == key)
+    rows = session.execute(paginate(stmt, Swap.id, limit, after)).all()
+
+    keys = [column.key for column in GAMER_COLUMNS]
+    swaps = []
+    for row in rows:
+        swap = {"id": row[0]}
+        for index, role in enumerate(gamers):
+            start = 1 + index * len(keys)
+            swap[role] = dict(zip(keys, row[start:start + len(keys)]))
+        swaps.append(swap)
+
+    if "games" in fields:
+        games = defaultdict(list)
+        if rows:
+            swap_games = session.execute(
+                select(*GAME_COLUMNS).where(Game.swap_id.in_([row[0] for row in rows])).order_by(Game.id)
+            )
+            for game in swap_games:
+                games[game.swap_id].append(game._asdict())
+        for swap in swaps:
+            swap["games"] = games[swap["id"]]
     return swaps
+
+
+def _gamer_columns(gamer: type[Gamer]) -> list:
+    return [getattr(gamer, column.key) for column in GAMER_COLUMNS]
+
+
+def stream_swaps(session: Session | AsyncSession, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Chunks:
+    stmt = select(Swap).options(*SWAP_STREAM_OPTIONS).order_by(Swap.id)
+    return stream(session, stmt, chunk_size)
     
 
-def create_swap(
-        session: Session, 
-        params: SwapCreate,
-        notification_service: NotificationService,
-    ) -> Swap:
+def create_swap(session: Session, params: SwapCreate) -> Swap:
+    game_ids = params.proposer.game_ids | params.acceptor.game_ids
+
+    # Load all games for swap in one query, locking the rows where supported
+    stmt = select(Game).where(Game.id.in_(game_ids)).with_for_update()
+    games = session.execute(stmt).scalars().all()
+    _validate_swap_games(params, games)
+
     # Initialise swap unless proposer/acceptor does not exist
     swap = Swap(proposer_id=params.proposer.id, acceptor_id=params.acceptor.id)
     session.add(swap)
     try:
-        session.commit()
+        session.flush()
     except IntegrityError as exc:
         session.rollback()
         raise InvalidSwapError(
             f"Gamer {params.proposer.id} or {params.acceptor.id} not found."
         ) from exc
-    
-    # Load games for swap unless a game does not exist
-    try:
-        games = [get_game(session, game_id) 
-                 for game_id in params.proposer.game_ids | params.acceptor.game_ids]
-    except GameNotFoundError as exc:
-        raise InvalidSwapError(str(exc)) from exc
-    
-    # Assign games to swap unless validation rules broken
-    try:
-        for game in games:
-            swap.games.append(game)
-    except ValueError as exc:
-        raise InvalidSwapError(str(exc)) from exc
-    session.commit()
-    session.refresh(swap)
 
-    notification_service.post(
-        Notification(
-            event=Event.SWAP_CREATED,
-            message=f"Swap created between {swap.proposer.name} and {swap.acceptor.name}!"
-        )
+    # Claim games only while still available, so concurrent swaps cannot share a game
+    result = session.execute(
+        update(Game)
+        .where(Game.id.in_(game_ids), Game.swap_id == None)
+        .values(swap_id=swap.id, version=Game.version + 1)
     )
-    return swap
+    if result.rowcount != len(game_ids):
+        session.rollback()
+        raise InvalidSwapError("A game in the swap was claimed by another swap.")
+
+    names = dict(session.execute(
+        select(Gamer.id, Gamer.name).where(Gamer.id.in_((swap.proposer_id, swap.acceptor_id)))
+    ).all())
+    created = swap_event(
+        Event.SWAP_CREATED,
+        swap,
+        [{**game_data(game), "swap_id": swap.id} for game in games],
+        f"Swap created between {names[swap.proposer_id]} and {names[swap.acceptor_id]}!",
+    )
+    add_messages(session, [created])
+    count_swap(session, (swap.proposer_id, swap.acceptor_id), created.data["games"])
+    bump_table_versions(session, "swap", "game")
+    swap_id = swap.id
+    session.commit()
+    invalidate_games(created.data["games"])
+    trade_graph.update_games(created.data["games"])
+    return get_swap(session, swap_id)
+
+
+def _validate_swap_games(params: SwapCreate, games: list[Game]) -> None:
+    games_by_id = {game.id: game for game in games}
+    validator = SwapGameValidator()
+    for gamer in (params.proposer, params.acceptor):
+        for game_id in sorted(gamer.game_ids):
+            game = games_by_id.get(game_id)
+            if game is None:
+                raise InvalidSwapError(f"Game {game_id} not found.")
+            try:
+                validator.add(game, (gamer.id,))
+            except ValueError as exc:
+                raise InvalidSwapError(str(exc)) from exc
     
 
 def delete_swap(session: Session, swap_id: int) -> None:    
     swap = get_swap(session, swap_id)
+    games = [game_data(game) for game in swap.games]
+    # The games are released (swap_id set to NULL) along with the swap
+    add_messages(session, [
+        swap_event(
+            Event.SWAP_DELETED,
+            swap,
+            [{**game, "swap_id": None} for game in games],
+            f"Swap between {swap.proposer.name} and {swap.acceptor.name} cancelled.",
+        )
+    ])
+    # Release the games explicitly, bumping their versions
+    session.execute(
+        update(Game)
+        .where(Game.swap_id == swap_id)
+        .values(swap_id=None, version=Game.version + 1)
+    )
+    count_swap(session, (swap.proposer_id, swap.acceptor_id), games, -1)
     session.delete(swap)
+    bump_table_versions(session, "swap", "game")
     session.commit()
+    released = [{**game, "swap_id": None} for game in games]
+    invalidate_games(games)
+    trade_graph.update_games(released)
+
+
+def swap_event(event: Event, swap: Swap, games: list[dict], message: str) -> Notification:
+    return Notification(
+        event=event,
+        message=message,
+        key=message_key(event, swap.id),
+        data={
+            "swap_id": swap.id, 
+            "proposer_id": swap.proposer_id, 
+            "acceptor_id": swap.acceptor_id, 
+            "games": games,
+        },
+    )
+
+
+# Tables the trade graph is built from: a change to any of them in another
+# process makes the refresher reload it
+TRADE_GRAPH_TABLES = ("gamer", "game", "wish")
+
+
+def get_trade_graph_versions(session: Session) -> dict[str, int]:
+    return get_table_versions(session, TRADE_GRAPH_TABLES)
+
+
+# The trade graph is built from plain columns, streamed in chunks, to keep loading it cheap
+
+def stream_trade_graph_games(session: Session | AsyncSession) -> Chunks:
+    # Available games as (id, gamer id, title, platform)
+    return stream(
+        session,
+        select(Game.id, Game.gamer_id, Game.title, Game.platform).where(Game.swap_id == None),
+        scalars=False,
+    )
+
+
+def stream_trade_graph_wishes(session: Session | AsyncSession) -> Chunks:
+    # Wishes as (gamer id, title, platform)
+    return stream(session, select(Wish.gamer_id, Wish.title, Wish.platform), scalars=False)
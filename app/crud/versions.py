@@ -0,0 +1,79 @@
+from collections import Counter
+from collections.abc import Collection
+import random
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import TableVersion
+
+
+# One statement per write on the dialects with INSERT ... ON CONFLICT
+UPSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Each table's counter is spread over this many rows: a write bumps one picked
+# at random, so concurrent writers rarely wait on the same row lock, and
+# readers sum them. Shard 0 is the row named after the table itself.
+VERSION_SHARDS = 8
+
+
+def shard_name(table: str, shard: int) -> str:
+    return table if shard == 0 else f"{table}#{shard}"
+
+
+class VersionMismatchError(Exception):
+    pass
+
+
+def bump_table_versions(session: Session, *tables: str) -> None:
+    # Part of the caller's transaction, so readers see the new data and version together
+    dialect = session.get_bind().dialect.name
+    # Rows in name order, so writers bumping several tables lock them in the same order
+    names = sorted(shard_name(table, random.randrange(VERSION_SHARDS)) for table in tables)
+    if dialect in UPSERTS:
+        stmt = UPSERTS[dialect](TableVersion).values([{"name": name, "version": 1} for name in names])
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[TableVersion.name], set_={"version": TableVersion.version + 1}
+        ))
+        return
+    for name in names:
+        result = session.execute(
+            update(TableVersion)
+            .where(TableVersion.name == name)
+            .values(version=TableVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            session.execute(insert(TableVersion).values(name=name, version=1))
+
+
+def get_table_versions(session: Session, tables: Collection[str]) -> dict[str, int]:
+    shards = {shard_name(table, shard): table for table in tables for shard in range(VERSION_SHARDS)}
+    rows = session.execute(
+        select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(shards))
+    )
+    versions = Counter()
+    for name, version in rows:
+        versions[shards[name]] += version
+    return {table: versions[table] for table in sorted(tables)}
+
+
+def update_row_version(
+        session: Session, 
+        model: type, 
+        row_id: int, 
+        versions: Collection[int] | None = None,
+        **values,
+    ) -> None:
+    """Apply `values` to a row and bump its version, in one conditional UPDATE.
+
+    With `versions` (from an If-Match header) the row is only changed while its
+    version is still one of them, so a concurrent write cannot be overwritten.
+    """
+    stmt = update(model).where(model.id == row_id)
+    if versions is not None:
+        stmt = stmt.where(model.version.in_(versions))
+    result = session.execute(stmt.values(**values, version=model.version + 1))
+    if result.rowcount == 0:
+        session.rollback()
+        raise VersionMismatchError
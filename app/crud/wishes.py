@@ -0,0 +1,99 @@
+from sqlalchemy import distinct, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.crud.gamers import get_gamer
+from app.crud.stats import count_wishes
+from app.crud.versions import bump_table_versions
+from app.cycles import trade_graph
+from app.models import Game, Gamer, Wish
+from app.schemas.wish import WishCreate
+
+
+class WishNotFoundError(Exception):
+    pass
+
+
+class DuplicateWishError(Exception):
+    pass
+
+
+def get_wishlist(session: Session, gamer_id: int) -> list[Wish]:
+    gamer = get_gamer(session, gamer_id)
+    return list(gamer.wishlist)
+
+
+def create_wish(session: Session, gamer_id: int, params: WishCreate) -> Wish:
+    get_gamer(session, gamer_id)
+    wish = Wish(gamer_id=gamer_id, **params.model_dump())
+    session.add(wish)
+    count_wishes(session, [(wish.title, wish.platform)])
+    bump_table_versions(session, "wish")
+    try:
+        session.commit()
+    except IntegrityError as exc:
+        session.rollback()
+        raise DuplicateWishError from exc
+    session.refresh(wish)
+    trade_graph.add_wish(gamer_id, (wish.title, wish.platform))
+    return wish
+
+
+def delete_wish(session: Session, gamer_id: int, wish_id: int) -> None:
+    wish = session.get(Wish, wish_id)
+    if wish is None or wish.gamer_id != gamer_id:
+        raise WishNotFoundError
+    session.delete(wish)
+    count_wishes(session, [(wish.title, wish.platform)], -1)
+    bump_table_versions(session, "wish")
+    session.commit()
+    trade_graph.remove_wishes(gamer_id, [(wish.title, wish.platform)])
+
+
+def get_matches(session: Session, gamer_id: int, limit: int) -> list[tuple[Gamer, int, int]]:
+    """Gamers with an available game on my wishlist who want an available game of mine.
+
+    Each side starts from my own wishlist or library, materialized so the planner
+    cannot begin from every available game instead, and looks up the other side
+    through the (title, platform) indexes on `game` and `wish`. The cost follows
+    how many gamers hold what I wish for or wish for what I hold, not the number
+    of gamers overall: a popular title on either side reads every copy of it.
+    """
+    get_gamer(session, gamer_id)
+
+    my_wishes = (
+        select(Wish.id, Wish.title, Wish.platform)
+        .where(Wish.gamer_id == gamer_id)
+        .cte("my_wishes")
+        .prefix_with("MATERIALIZED")
+    )
+    my_games = (
+        select(Game.id, Game.title, Game.platform)
+        .where(Game.gamer_id == gamer_id, Game.swap_id == None)
+        .cte("my_games")
+        .prefix_with("MATERIALIZED")
+    )
+    they_offer = (
+        select(Game.gamer_id.label("partner_id"), func.count(distinct(my_wishes.c.id)).label("count"))
+        .select_from(my_wishes)
+        .join(Game, (Game.title == my_wishes.c.title) & (Game.platform == my_wishes.c.platform))
+        .where(Game.gamer_id != gamer_id, Game.swap_id == None)
+        .group_by(Game.gamer_id)
+        .subquery()
+    )
+    i_offer = (
+        select(Wish.gamer_id.label("partner_id"), func.count(distinct(Wish.id)).label("count"))
+        .select_from(my_games)
+        .join(Wish, (Wish.title == my_games.c.title) & (Wish.platform == my_games.c.platform))
+        .where(Wish.gamer_id != gamer_id)
+        .group_by(Wish.gamer_id)
+        .subquery()
+    )
+    stmt = (
+        select(Gamer, they_offer.c.count, i_offer.c.count)
+        .join(they_offer, they_offer.c.partner_id == Gamer.id)
+        .join(i_offer, i_offer.c.partner_id == Gamer.id)
+        .order_by((they_offer.c.count + i_offer.c.count).desc(), Gamer.id)
+        .limit(limit)
+    )
+    return [tuple(row) for row in session.execute(stmt)]
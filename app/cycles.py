@@ -0,0 +1,318 @@
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+import threading
+from typing import Any
+from uuid import uuid4
+
+
+GameKey = tuple[str, str]
+
+
+@dataclass
+class Leg:
+    receiver_id: int
+    giver_id: int
+    title: str
+    platform: str
+
+
+@dataclass
+class TradeGraph:
+    """Want/have graph between gamers for finding multi-party swap cycles.
+
+    An edge a -> b means b has an available game that a wants. Edges are never
+    materialized: they are walked through the key -> holders and key -> wanters
+    indexes (titles interned to integer keys), so memory stays linear in games
+    plus wishes and a single game or wish changes the graph in O(1).
+    """
+    # Set once the graph is shared with readers: a change then replaces the
+    # gamer's and the title's entries instead of changing them, so snapshots
+    # taken before keep seeing the old ones
+    copy_on_write: bool = False
+
+    _key_ids: dict[GameKey, int] = field(default_factory=dict)
+    _keys: list[GameKey] = field(default_factory=list)
+    _holdings: dict[int, dict[int, int]] = field(default_factory=dict)
+    _holders: dict[int, set[int]] = field(default_factory=dict)
+    _wishes: dict[int, set[int]] = field(default_factory=dict)
+    _wanters: dict[int, set[int]] = field(default_factory=dict)
+
+    def _key(self, key: GameKey) -> int:
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            key_id = self._key_ids[key] = len(self._keys)
+            self._keys.append(key)
+        return key_id
+
+    def _entry(self, index: dict[int, Any], entry_id: int, empty: Callable[[], Any]) -> Any:
+        # The entry to change in place: a copy of it under copy-on-write
+        entry = index.get(entry_id)
+        if entry is None:
+            entry = index[entry_id] = empty()
+        elif self.copy_on_write:
+            entry = index[entry_id] = entry.copy()
+        return entry
+
+    def add_game(self, gamer_id: int, key: GameKey) -> None:
+        key_id = self._key(key)
+        copies = self._entry(self._holdings, gamer_id, dict)
+        copies[key_id] = copies.get(key_id, 0) + 1
+        self._entry(self._holders, key_id, set).add(gamer_id)
+
+    def remove_game(self, gamer_id: int, key: GameKey) -> None:
+        key_id = self._key_ids.get(key)
+        if key_id not in self._holdings.get(gamer_id, {}):
+            return
+        copies = self._entry(self._holdings, gamer_id, dict)
+        copies[key_id] -= 1
+        if copies[key_id] == 0:
+            del copies[key_id]
+            self._entry(self._holders, key_id, set).discard(gamer_id)
+
+    def add_wish(self, gamer_id: int, key: GameKey) -> None:
+        key_id = self._key(key)
+        self._entry(self._wishes, gamer_id, set).add(key_id)
+        self._entry(self._wanters, key_id, set).add(gamer_id)
+
+    def remove_wish(self, gamer_id: int, key: GameKey) -> None:
+        key_id = self._key_ids.get(key)
+        if key_id is None or key_id not in self._wishes.get(gamer_id, ()):
+            return
+        self._entry(self._wishes, gamer_id, set).discard(key_id)
+        self._entry(self._wanters, key_id, set).discard(gamer_id)
+
+    def snapshot(self) -> "TradeGraph":
+        """A copy of the indexes sharing their entries, for reading while this
+        graph changes under copy-on-write. Linear in gamers and titles, not games."""
+        return TradeGraph(
+            _key_ids=dict(self._key_ids),
+            _keys=list(self._keys),
+            _holdings=dict(self._holdings),
+            _holders=dict(self._holders),
+            _wishes=dict(self._wishes),
+            _wanters=dict(self._wanters),
+        )
+
+    def successors(self, gamer_id: int) -> Iterator[int]:
+        # Gamers holding something this gamer wants
+        seen = {gamer_id}
+        for key_id in self._wishes.get(gamer_id, ()):
+            for holder in self._holders.get(key_id, ()):
+                if holder not in seen:
+                    seen.add(holder)
+                    yield holder
+
+    def predecessors(self, gamer_id: int) -> Iterator[int]:
+        # Gamers wanting something this gamer holds
+        seen = {gamer_id}
+        for key_id in self._holdings.get(gamer_id, ()):
+            for wanter in self._wanters.get(key_id, ()):
+                if wanter not in seen:
+                    seen.add(wanter)
+                    yield wanter
+
+    def cycles(
+            self,
+            max_length: int,
+            min_length: int = 3,
+            gamer_id: int | None = None,
+            limit: int = 100,
+        ) -> list[list[int]]:
+        """Enumerate simple cycles [a, b, c, ...]: a receives from b, b from c, ..., last from a.
+
+        With `gamer_id` only cycles through that gamer are returned. Otherwise
+        each cycle is reported once, from its smallest gamer id.
+        """
+        found: list[list[int]] = []
+        if gamer_id is not None:
+            self._cycles_from(gamer_id, max_length, min_length, lambda _: True, limit, found)
+            return found
+        starts = sorted(gamer for gamer, wishes in self._wishes.items() if wishes)
+        for start in starts:
+            self._cycles_from(start, max_length, min_length, lambda v, s=start: v > s, limit, found)
+            if len(found) >= limit:
+                break
+        return found
+
+    def _cycles_from(
+            self,
+            start: int,
+            max_length: int,
+            min_length: int,
+            allowed: Callable[[int], bool],
+            limit: int,
+            found: list[list[int]],
+        ) -> None:
+        # Bounded DFS, pruned by a reverse BFS: a vertex is only entered if it
+        # can still get back to `start` within the remaining length.
+        distance = self._distances_to(start, max_length - 1, allowed)
+        path, on_path = [start], {start}
+        stack = [self.successors(start)]
+        while stack:
+            for vertex in stack[-1]:
+                if vertex == start:
+                    continue
+                if vertex not in on_path and vertex in distance and len(path) + distance[vertex] <= max_length:
+                    if distance[vertex] == 1 and len(path) + 1 >= min_length:
+                        found.append(path + [vertex])
+                        if len(found) >= limit:
+                            return
+                    if len(path) + 1 < max_length:
+                        path.append(vertex)
+                        on_path.add(vertex)
+                        stack.append(self.successors(vertex))
+                        break
+            else:
+                stack.pop()
+                on_path.discard(path.pop())
+
+    def _distances_to(self, target: int, depth: int, allowed: Callable[[int], bool]) -> dict[int, int]:
+        distance, frontier = {}, [target]
+        for level in range(1, depth + 1):
+            next_frontier = []
+            for vertex in frontier:
+                for predecessor in self.predecessors(vertex):
+                    if predecessor != target and predecessor not in distance and allowed(predecessor):
+                        distance[predecessor] = level
+                        next_frontier.append(predecessor)
+            frontier = next_frontier
+        return distance
+
+    def legs(self, cycle: list[int]) -> list[Leg]:
+        legs = []
+        for receiver, giver in zip(cycle, cycle[1:] + cycle[:1]):
+            wishes, holdings = self._wishes.get(receiver, set()), self._holdings.get(giver, {})
+            key_id = min(key_id for key_id in wishes if key_id in holdings)
+            title, platform = self._keys[key_id]
+            legs.append(Leg(receiver, giver, title, platform))
+        return legs
+
+
+def build_trade_graph(games: Iterable[tuple[int, str, str]], wishes: Iterable[tuple[int, str, str]]) -> TradeGraph:
+    graph = TradeGraph()
+    for gamer_id, title, platform in games:
+        graph.add_game(gamer_id, (title, platform))
+    for gamer_id, title, platform in wishes:
+        graph.add_wish(gamer_id, (title, platform))
+    return graph
+
+
+@dataclass
+class LiveTradeGraph:
+    """The trade graph of this process, kept warm for /swaps/suggestions.
+
+    Loaded once (at startup, or on first use), then kept up to date by the CRUD
+    writes to games and wishes after they commit; the refresher in
+    app.trades reloads it when the tables changed in other processes.
+    Available games are tracked by id, so a write only passes the games as they
+    are now.
+
+    Changes are made under a lock. Readers only take it to get a snapshot,
+    kept until the next change, and search it for cycles outside the lock:
+    loads and searches are CPU-bound, so callers on the event loop run them in
+    a worker thread (see app.trades), never on the loop.
+    """
+    # Table versions it was loaded at, None until loaded
+    versions: dict[str, int] | None = None
+    # Bumped by every change; with the instance, tells responses of different
+    # processes and graph states apart
+    generation: int = 0
+    instance: str = field(default_factory=lambda: uuid4().hex)
+
+    _graph: TradeGraph = field(default_factory=TradeGraph, repr=False)
+    _games: dict[int, tuple[int, GameKey]] = field(default_factory=dict, repr=False)
+    _snapshot: TradeGraph | None = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def loaded(self) -> bool:
+        return self.versions is not None
+
+    @property
+    def state(self) -> tuple[str, int]:
+        return self.instance, self.generation
+
+    def load(
+            self,
+            versions: dict[str, int],
+            games: Iterable[tuple[int, int, str, str]],
+            wishes: Iterable[tuple[int, str, str]],
+        ) -> None:
+        """Replace the graph with available games (id, gamer id, title, platform) and wishes."""
+        graph, available = TradeGraph(), {}
+        for game_id, gamer_id, title, platform in games:
+            graph.add_game(gamer_id, (title, platform))
+            available[game_id] = (gamer_id, (title, platform))
+        for gamer_id, title, platform in wishes:
+            graph.add_wish(gamer_id, (title, platform))
+        graph.copy_on_write = True
+        with self._lock:
+            self._graph, self._games, self.versions = graph, available, versions
+            self._changed()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._graph, self._games, self.versions = TradeGraph(), {}, None
+            self._changed()
+
+    def mark_stale(self) -> None:
+        # For writes too large to apply one by one: kept as is until the
+        # refresher reloads it, as for writes made by other processes
+        with self._lock:
+            if self.loaded:
+                self.versions = {}
+
+    def _changed(self) -> None:
+        self.generation += 1
+        self._snapshot = None
+
+    def update_games(self, games: Iterable[Mapping[str, Any]]) -> None:
+        """Apply games as written (id, gamer_id, title, platform, swap_id)."""
+        with self._lock:
+            if not self.loaded:
+                return
+            for game in games:
+                self._remove_game(game["id"])
+                if game["swap_id"] is None:
+                    key = (game["title"], game["platform"])
+                    self._graph.add_game(game["gamer_id"], key)
+                    self._games[game["id"]] = (game["gamer_id"], key)
+            self._changed()
+
+    def remove_games(self, game_ids: Iterable[int]) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            for game_id in game_ids:
+                self._remove_game(game_id)
+            self._changed()
+
+    def _remove_game(self, game_id: int) -> None:
+        held = self._games.pop(game_id, None)
+        if held is not None:
+            self._graph.remove_game(*held)
+
+    def add_wish(self, gamer_id: int, key: GameKey) -> None:
+        with self._lock:
+            if self.loaded:
+                self._graph.add_wish(gamer_id, key)
+                self._changed()
+
+    def remove_wishes(self, gamer_id: int, keys: Iterable[GameKey]) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            for key in keys:
+                self._graph.remove_wish(gamer_id, key)
+            self._changed()
+
+    def suggestions(self, max_length: int, limit: int, gamer_id: int | None = None) -> list[list[Leg]]:
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = self._graph.snapshot()
+            graph = self._snapshot
+        cycles = graph.cycles(max_length, gamer_id=gamer_id, limit=limit)
+        return [graph.legs(cycle) for cycle in cycles]
+
+
+trade_graph = LiveTradeGraph()
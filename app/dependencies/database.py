@@ -1,22 +1,99 @@
-from collections.abc import Generator
-from typing import Annotated
+from collections.abc import AsyncGenerator, Callable, Generator
+from typing import Annotated, Any, TypeVar
 
 from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import event
-from sqlalchemy.engine import create_engine
+from sqlalchemy.engine import Engine, create_engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
-from app.models import Base
+from app.config import Settings, settings
+from app.migrations import upgrade
+from app.profiling import current_profile, install_slow_query_log
 
 
-DB_FILE = "sqlite:///gameswap.db"
-engine = create_engine(DB_FILE, connect_args={"check_same_thread": False})
-event.listen(engine, 'connect', lambda c, _: c.execute('pragma foreign_keys=on'))
+T = TypeVar("T")
+
+
+def sqlite_pragmas(settings: Settings) -> dict[str, str | int]:
+    # WAL lets readers proceed while a writer commits, and synchronous=NORMAL
+    # only fsyncs at checkpoints instead of on every commit (safe under WAL).
+    return {
+        "foreign_keys": "on",
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "mmap_size": settings.sqlite_mmap_size,
+        "cache_size": settings.sqlite_cache_size,
+        "busy_timeout": settings.sqlite_busy_timeout,
+    }
+
+
+def sqlite_pragma_listener(settings: Settings) -> Callable[..., None]:
+    """A `connect` listener applying the pragmas of `settings`, not the global ones."""
+    pragmas = sqlite_pragmas(settings)
+
+    def set_sqlite_pragmas(dbapi_connection, _) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"pragma {name}={value}")
+        cursor.close()
+    return set_sqlite_pragmas
+
+
+def install_engine_hooks(engine: Engine, settings: Settings) -> None:
+    # `engine` is the sync engine, also for an AsyncEngine (its .sync_engine)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, 'connect', sqlite_pragma_listener(settings))
+    if settings.slow_query_threshold is not None:
+        install_slow_query_log(engine, settings.slow_query_threshold)
+
+
+def engine_options(url: str, settings: Settings) -> dict[str, Any]:
+    url = make_url(url)
+    options: dict[str, Any] = {
+        "pool_pre_ping": settings.pool_pre_ping,
+        "pool_recycle": settings.pool_recycle,
+    }
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            return options
+    options["pool_size"] = settings.pool_size
+    options["max_overflow"] = settings.max_overflow
+    options["pool_timeout"] = settings.pool_timeout
+    return options
+
+
+engine = create_engine(settings.database_url, **engine_options(settings.database_url, settings))
+install_engine_hooks(engine, settings)
 configured_session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The async engine is only built when enabled, so its driver (aiosqlite, asyncpg)
+# is not required for the default sync setup.
+async_engine = None
+configured_async_session = None
+if settings.async_database:
+    async_engine = create_async_engine(
+        settings.async_database_url, **engine_options(settings.async_database_url, settings)
+    )
+    install_engine_hooks(async_engine.sync_engine, settings)
+    configured_async_session = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+# Sessions for the background jobs, on whichever stack serves requests
+background_session = configured_async_session or configured_session
+
 
 def init_db() -> None:
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        upgrade(connection)
+
+
+async def init_async_db() -> None:
+    async with async_engine.begin() as connection:
+        await connection.run_sync(upgrade)
 
 
 def get_session() -> Generator[Session, None, None]:
@@ -24,4 +101,39 @@ def get_session() -> Generator[Session, None, None]:
         yield session
 
 
-SessionDep = Annotated[Session, Depends(get_session)]
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with configured_async_session() as session:
+        yield session
+
+
+async def close_session(session: Session | AsyncSession) -> None:
+    if isinstance(session, AsyncSession):
+        await session.close()
+    else:
+        session.close()
+
+
+async def run_in_session(
+        session: Session | AsyncSession,
+        fn: Callable[..., T],
+        *args: Any,
+        **kwargs: Any,
+    ) -> T:
+    """Await a sync CRUD function `fn(session, *args, **kwargs)` on either stack.
+
+    With an AsyncSession the function runs via `run_sync`, so every query goes
+    through the async driver without blocking the event loop; with a sync
+    Session it runs in the threadpool, as a plain `def` route would.
+    """
+    if isinstance(session, AsyncSession):
+        return await session.run_sync(fn, *args, **kwargs)
+    profile = current_profile()
+    if profile is not None:
+        fn = profile.wrap(fn)
+    return await run_in_threadpool(fn, session, *args, **kwargs)
+
+
+SessionDep = Annotated[
+    Session | AsyncSession,
+    Depends(get_async_session if settings.async_database else get_session),
+]
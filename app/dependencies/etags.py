@@ -0,0 +1,93 @@
+from collections.abc import Sequence
+from dataclasses import dataclass
+import hashlib
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.crud.versions import get_table_versions
+from app.dependencies.database import run_in_session
+
+
+def row_etag(kind: str, row_id: int, version: int) -> str:
+    return f'"{kind}-{row_id}-{version}"'
+
+
+def rows_etag(kind: str, row_id: int, versions: Sequence[tuple], query: str = "") -> str:
+    # For representations built from several rows, e.g. a swap with its gamers and
+    # games; the query string tells sparse fieldsets apart
+    digest = hashlib.blake2b(repr((query, list(versions))).encode(), digest_size=16)
+    return f'"{kind}-{row_id}-{digest.hexdigest()}"'
+
+
+def table_etag(url: str, versions: dict[str, int]) -> str:
+    digest = hashlib.blake2b(repr((url, sorted(versions.items()))).encode(), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def _tags(header: str, weak: bool = True) -> set[str]:
+    # Weak comparison for If-None-Match; If-Match calls for strong comparison,
+    # where a weak tag matches nothing (RFC 9110, section 13.1.1)
+    tags = {tag.strip() for tag in header.split(",")}
+    if weak:
+        return {tag.removeprefix("W/") for tag in tags}
+    return {tag for tag in tags if not tag.startswith("W/")}
+
+
+def match_versions(header: str | None, kind: str, row_id: int) -> set[int] | None:
+    """Row versions an If-Match header accepts, or None when any version will do."""
+    if header is None or header.strip() == "*":
+        return None
+    prefix = f'"{kind}-{row_id}-'
+    return {
+        int(tag[len(prefix):-1])
+        for tag in _tags(header, weak=False)
+        if tag.startswith(prefix) and tag[len(prefix):-1].isdigit()
+    }
+
+
+@dataclass
+class Conditional:
+    """Strong ETags for GET responses, checked against If-None-Match up front.
+
+    Routes compute the tag from row or table versions before running their
+    query (single resources from the versions of the rows they are built from,
+    so the tag doubles as their cache entry version); when the client already
+    has it, a 304 is raised and nothing else is loaded or serialized.
+    """
+    request: Request
+    response: Response
+    etag: str | None = None
+
+    def check(self, etag: str) -> str:
+        header = self.request.headers.get("if-none-match")
+        if header is not None and (etag in _tags(header) or header.strip() == "*"):
+            raise HTTPException(status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        self.etag = self.response.headers["ETag"] = etag
+        return etag
+
+    def tag(self, response: Response) -> Response:
+        # Responses returned directly (streams, exports) do not get the injected headers
+        response.headers["ETag"] = self.etag
+        return response
+
+    async def check_tables(self, session: Session | AsyncSession, *tables: str) -> str:
+        versions = await run_in_session(session, get_table_versions, tables)
+        url = self.request.url
+        return self.check(table_etag(f"{url.path}?{url.query}", versions))
+
+    def check_state(self, state: tuple[str, int]) -> str:
+        # In-process state such as the warm trade graph's (instance, generation)
+        url = self.request.url
+        return self.check(table_etag(f"{url.path}?{url.query}", dict([state])))
+
+    def check_row(self, kind: str, row_id: int, version: int) -> str:
+        return self.check(row_etag(kind, row_id, version))
+
+    def check_rows(self, kind: str, row_id: int, versions: Sequence[tuple]) -> str:
+        return self.check(rows_etag(kind, row_id, versions, self.request.url.query))
+
+
+ConditionalDep = Annotated[Conditional, Depends()]
@@ -0,0 +1,133 @@
+import asyncio
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Annotated, Any
+
+from fastapi import Depends, Query
+from starlette.requests import HTTPConnection
+
+from app.dependencies.notifications import Event, Notification
+
+
+@dataclass(frozen=True)
+class EventFilter:
+    events: frozenset[Event] = frozenset()
+    platform: str | None = None
+    title: str | None = None
+    gamer_id: int | None = None
+
+    def matches(self, notification: Notification) -> bool:
+        if self.events and notification.event not in self.events:
+            return False
+        data = notification.data
+        if self.platform is None and self.title is None:
+            return self.gamer_id is None or self.gamer_id in _gamer_ids(data)
+        return any(self._matches_game(game) for game in _games(data))
+
+    def _matches_game(self, game: dict[str, Any]) -> bool:
+        return (
+            (self.platform is None or game["platform"] == self.platform)
+            and (self.title is None or game["title"] == self.title)
+            and (self.gamer_id is None or game["gamer_id"] == self.gamer_id)
+        )
+
+
+def _games(data: dict[str, Any]) -> Iterable[dict[str, Any]]:
+    # Swap events carry their games, game events are a game
+    if "games" in data:
+        return data["games"]
+    return [data] if "title" in data else []
+
+
+def _gamer_ids(data: dict[str, Any]) -> set[int]:
+    return {data[key] for key in ("gamer_id", "proposer_id", "acceptor_id") if key in data}
+
+
+@dataclass(eq=False)
+class Subscriber:
+    """One live connection: a bounded buffer that drops its oldest events when full."""
+    filter: EventFilter
+    queue: asyncio.Queue
+    dropped: int = 0
+
+    def put(self, notification: Notification | None) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(notification)
+
+    async def get(self) -> Notification | None:
+        # None once the broker is closed
+        return await self.queue.get()
+
+    def take_dropped(self) -> int:
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+@dataclass
+class EventBroker:
+    """Fans notifications out to the `/events` subscribers of this process.
+
+    Subscribed to the NotificationService as a wildcard handler. Handlers may run
+    in worker threads, so events are handed to the event loop, where each
+    subscriber's filter is checked and matches are buffered. A subscriber that
+    falls behind loses its oldest events instead of slowing everyone else down.
+    """
+    buffer_size: int = 100
+
+    _subscribers: set[Subscriber] = field(default_factory=set, init=False, repr=False)
+    _loop: asyncio.AbstractEventLoop | None = field(default=None, init=False, repr=False)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, notification: Notification) -> None:
+        if not self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._fan_out(notification)
+        else:
+            self._loop.call_soon_threadsafe(self._fan_out, notification)
+
+    def _fan_out(self, notification: Notification) -> None:
+        for subscriber in list(self._subscribers):
+            if subscriber.filter.matches(notification):
+                subscriber.put(notification)
+
+    @asynccontextmanager
+    async def subscribe(self, filter: EventFilter) -> AsyncIterator[Subscriber]:
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(filter, asyncio.Queue(self.buffer_size))
+        self._subscribers.add(subscriber)
+        try:
+            yield subscriber
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def close(self) -> None:
+        for subscriber in list(self._subscribers):
+            subscriber.put(None)
+
+
+def get_event_broker(connection: HTTPConnection) -> EventBroker:
+    return connection.app.state.event_broker
+
+
+def get_event_filter(
+        event: Annotated[list[Event] | None, Query()] = None,
+        platform: str | None = None,
+        title: str | None = None,
+        gamer_id: int | None = None,
+    ) -> EventFilter:
+    return EventFilter(frozenset(event or ()), platform, title, gamer_id)
+
+
+EventBrokerDep = Annotated[EventBroker, Depends(get_event_broker)]
+EventFilterDep = Annotated[EventFilter, Depends(get_event_filter)]
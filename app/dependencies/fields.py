@@ -0,0 +1,54 @@
+from collections.abc import Callable, Collection
+from dataclasses import dataclass
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Query
+
+from app.crud.games import GAME_EXPANSIONS, GAME_FIELDS
+from app.crud.swaps import SWAP_FIELDS
+
+
+@dataclass(frozen=True)
+class FieldSelection:
+    """Sparse fieldset (`fields=`) and embedded resources (`expand=`) of a request.
+
+    `fields` is None when every field was asked for. Ids are always returned.
+    """
+    fields: frozenset[str] | None = None
+    expand: frozenset[str] = frozenset()
+
+    def is_default(self) -> bool:
+        return self.fields is None and not self.expand
+
+
+def _names(value: str | None, allowed: Collection[str], param: str) -> frozenset[str] | None:
+    if value is None:
+        return None
+    names = frozenset(name.strip() for name in value.split(",") if name.strip())
+    unknown = names - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown {param}: {', '.join(sorted(unknown))}. Choose from {', '.join(allowed)}.",
+        )
+    return names
+
+
+def field_selection(
+        fields: Collection[str],
+        expand: Collection[str] = (),
+    ) -> Callable[..., FieldSelection]:
+    def get_field_selection(
+        fields_: Annotated[str | None, Query(alias="fields")] = None,
+        expand_: Annotated[str | None, Query(alias="expand")] = None,
+    ) -> FieldSelection:
+        selected = _names(fields_, fields, "fields")
+        return FieldSelection(
+            fields=None if selected is None else selected | {"id"},
+            expand=_names(expand_, expand, "expand") or frozenset(),
+        )
+    return get_field_selection
+
+
+GameFieldsDep = Annotated[FieldSelection, Depends(field_selection(GAME_FIELDS, GAME_EXPANSIONS))]
+SwapFieldsDep = Annotated[FieldSelection, Depends(field_selection(SWAP_FIELDS))]
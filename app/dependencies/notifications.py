@@ -1,42 +1,222 @@
+import asyncio
 from dataclasses import dataclass, field
 from enum import StrEnum
-from typing import Annotated, Callable
+from fnmatch import fnmatchcase
+import inspect
+import logging
+import threading
+from typing import Any, Callable
 
-from fastapi import Depends
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
 
 
 class Event(StrEnum):
     GAMER_CREATED = "gamer_created"
+    GAME_CREATED = "game_created"
+    GAME_UPDATED = "game_updated"
+    GAME_DELETED = "game_deleted"
     SWAP_CREATED = "swap_created"
+    SWAP_DELETED = "swap_deleted"
 
 
 @dataclass
 class Notification:
     event: Event
     message: str
+    key: str | None = None  # idempotency key, stable across redeliveries
+    data: dict[str, Any] = field(default_factory=dict)
 
 
 Handler = Callable[[Notification], None]
+# A queued delivery, with the future of a dispatch() waiting for its outcome
+Delivery = tuple[Handler, Notification, asyncio.Future | None]
+
+
+class OverflowPolicy(StrEnum):
+    DROP_NEWEST = "drop_newest"
+    DROP_OLDEST = "drop_oldest"
 
 
 @dataclass
-class NotificationService:
-    handlers: dict[Event, list[Handler]] = field(default_factory=dict)
+class NotificationDispatcher:
+    """Delivers notifications off the request path.
+
+    Deliveries go onto a bounded queue drained by a pool of async workers, which
+    take up to `batch_size` deliveries at a time and retry failing handlers with
+    exponential backoff. When the queue is full the overflow policy drops either
+    the new delivery or the oldest queued one, so requests never wait on handlers.
+    `dispatch` waits for room in the queue instead, then for the outcome of the
+    delivery, so a caller holding the notification elsewhere (the outbox relay)
+    can keep it when it was not made.
+    """
+    max_queue_size: int = 1_000
+    workers: int = 4
+    batch_size: int = 50
+    max_retries: int = 3
+    retry_backoff: float = 0.5
+    overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST
+
+    delivered: int = 0
+    failed: int = 0
+    dropped: int = 0
+
+    _queue: asyncio.Queue | None = field(default=None, init=False, repr=False)
+    _loop: asyncio.AbstractEventLoop | None = field(default=None, init=False, repr=False)
+    _thread_id: int | None = field(default=None, init=False, repr=False)
+    _tasks: list[asyncio.Task] = field(default_factory=list, init=False, repr=False)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def drain(self, timeout: float | None = None) -> None:
+        """Stop accepting work, deliver what is queued (up to `timeout`), then stop the workers."""
+        tasks, self._tasks = self._tasks, []
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except TimeoutError:
+            logger.warning("Dropped %d notifications on shutdown", self._queue.qsize())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def submit(self, handler: Handler, notification: Notification) -> None:
+        # Safe to call from request threads as well as from the event loop
+        if threading.get_ident() == self._thread_id:
+            self._enqueue((handler, notification, None))
+        else:
+            self._loop.call_soon_threadsafe(self._enqueue, (handler, notification, None))
+
+    async def dispatch(self, handler: Handler, notification: Notification) -> bool | None:
+        """Queue a delivery once there is room and wait until it is made, from the dispatcher's loop.
+
+        False when the handler failed every retry; None when the delivery was
+        never attempted, evicted from the queue by a submit under DROP_OLDEST.
+        """
+        future = self._loop.create_future()
+        await self._queue.put((handler, notification, future))
+        return await future
+
+    def _enqueue(self, delivery: Delivery) -> None:
+        if self._queue.full():
+            self.dropped += 1
+            if self.overflow_policy == OverflowPolicy.DROP_NEWEST:
+                return
+            _resolve(self._queue.get_nowait()[2], None)
+            self._queue.task_done()
+        self._queue.put_nowait(delivery)
+
+    async def _work(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.gather(*(self._deliver(*delivery) for delivery in batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self, handler: Handler, notification: Notification, future: asyncio.Future | None) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                if inspect.iscoroutinefunction(handler):
+                    await handler(notification)
+                else:
+                    await asyncio.to_thread(handler, notification)
+            except Exception:
+                if attempt == self.max_retries:
+                    self.failed += 1
+                    logger.exception("Notification handler failed for %s", notification.event)
+                    _resolve(future, False)
+                    return
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+            else:
+                self.delivered += 1
+                _resolve(future, True)
+                return
+
+
+def _resolve(future: asyncio.Future | None, delivered: bool | None) -> None:
+    # The waiting dispatch() may have been cancelled meanwhile
+    if future is not None and not future.done():
+        future.set_result(delivered)
+
+
+@dataclass(frozen=True)
+class Subscription:
+    pattern: str  # an event name, or a wildcard such as "*" or "swap_*"
+    handler: Handler
+    priority: int = 0
 
-    def subscribe(self, event: Event, handler: Handler):
-        if event not in self.handlers:
-            self.handlers[event] = []
-        self.handlers[event].append(handler)
 
-    def unsubscribe(self, event: Event, handler: Handler):
-        if event not in self.handlers:
-            return
-        self.handlers[event].remove(handler)
+@dataclass
+class NotificationService:
+    """Application-scoped registry of notification handlers.
+
+    Handlers run in descending priority, then subscription order. Every
+    subscribe/unsubscribe rebuilds an immutable event -> handlers table under a
+    lock and swaps it in, so posting never takes the lock and always sees a
+    consistent table, whichever thread or task changes the subscriptions.
+    """
+    dispatcher: NotificationDispatcher | None = None
+
+    _subscriptions: tuple[Subscription, ...] = field(default=(), init=False, repr=False)
+    _routes: dict[Event, tuple[Handler, ...]] = field(default_factory=dict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def subscribe(self, event: Event | str, handler: Handler, priority: int = 0) -> None:
+        with self._lock:
+            self._update(self._subscriptions + (Subscription(event, handler, priority),))
+
+    def unsubscribe(self, event: Event | str, handler: Handler) -> None:
+        with self._lock:
+            self._update(tuple(
+                s for s in self._subscriptions if (s.pattern, s.handler) != (event, handler)
+            ))
+
+    def _update(self, subscriptions: tuple[Subscription, ...]) -> None:
+        ordered = sorted(subscriptions, key=lambda s: -s.priority)
+        self._subscriptions = subscriptions
+        self._routes = {
+            event: tuple(s.handler for s in ordered if fnmatchcase(event, s.pattern))
+            for event in Event
+        }
+
+    def handlers(self, event: Event) -> tuple[Handler, ...]:
+        return self._routes.get(event, ())
 
     def post(self, notification: Notification) -> None:
-        if notification.event not in self.handlers:
-            return
-        for handler in self.handlers[notification.event]:
+        for handler in self.handlers(notification.event):
+            if self.dispatcher is not None and self.dispatcher.running:
+                self.dispatcher.submit(handler, notification)
+            else:
+                handler(notification)
+
+    async def dispatch(self, notification: Notification) -> bool | None:
+        """Hand `notification` to the running dispatcher for every handler and
+        wait for the outcome: True once all of them succeeded, False when one
+        failed, None when one was dropped before it was attempted."""
+        outcomes = await asyncio.gather(*(
+            self.dispatcher.dispatch(handler, notification)
+            for handler in self.handlers(notification.event)
+        ))
+        if False in outcomes:
+            return False
+        return None if None in outcomes else True
+
+    def deliver(self, notification: Notification) -> None:
+        """Call every handler inline, letting a failing handler raise to the caller."""
+        for handler in self.handlers(notification.event):
             handler(notification)
 
 
@@ -48,11 +228,19 @@ def handle_create_swap(notification: Notification) -> None:
     print(notification.message)
 
 
-def get_notification_service() -> NotificationService:
-    service = NotificationService()
+dispatcher = NotificationDispatcher(
+    max_queue_size=settings.notification_queue_size,
+    workers=settings.notification_workers,
+    batch_size=settings.notification_batch_size,
+    max_retries=settings.notification_max_retries,
+    retry_backoff=settings.notification_retry_backoff,
+    overflow_policy=OverflowPolicy(settings.notification_overflow_policy),
+)
+
+
+def create_notification_service() -> NotificationService:
+    # Called once per application, from the lifespan
+    service = NotificationService(dispatcher=dispatcher)
     service.subscribe(Event.GAMER_CREATED, handle_create_gamer)
     service.subscribe(Event.SWAP_CREATED, handle_create_swap)
     return service
-    
-
-NotificationServiceDep = Annotated[NotificationService, Depends(get_notification_service)]
@@ -0,0 +1,38 @@
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Annotated, Any
+
+from fastapi import Depends, Query, Response
+
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass
+class Pagination:
+    limit: int
+    after: int | None = None
+
+    def next_cursor(self, items: Sequence[Any]) -> int | None:
+        if len(items) < self.limit:
+            return None
+        last = items[-1]
+        # Cached pages hold dicts rather than models
+        return last["id"] if isinstance(last, Mapping) else last.id
+
+    def set_next_cursor(self, response: Response, items: Sequence[Any]) -> None:
+        cursor = self.next_cursor(items)
+        if cursor is not None:
+            response.headers[NEXT_CURSOR_HEADER] = str(cursor)
+
+
+def get_pagination(
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = DEFAULT_LIMIT,
+    after: int | None = None,
+) -> Pagination:
+    return Pagination(limit=limit, after=after)
+
+
+PaginationDep = Annotated[Pagination, Depends(get_pagination)]
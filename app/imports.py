@@ -0,0 +1,48 @@
+from collections.abc import Iterator
+import csv
+import json
+from typing import Any, BinaryIO
+
+from app.responses import ExportFormat
+
+
+class ImportFormatError(ValueError):
+    """The upload itself cannot be read: not UTF-8, malformed CSV or a line that is not JSON."""
+    def __init__(self, line: int, reason: str) -> None:
+        super().__init__(f"Line {line}: {reason}")
+        self.line = line
+
+
+def read_records(file: BinaryIO, format: ExportFormat) -> Iterator[Any]:
+    # Read lazily, one record at a time, so an upload is never held in memory
+    lines = _decoded_lines(file)
+    if format == ExportFormat.CSV:
+        reader = csv.DictReader(lines)
+        try:
+            yield from reader
+        except csv.Error as exc:
+            raise ImportFormatError(reader.line_num, f"malformed CSV ({exc})") from exc
+        return
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ImportFormatError(number, f"not valid JSON ({exc.msg})") from exc
+
+
+def _decoded_lines(file: BinaryIO) -> Iterator[str]:
+    # Decoded line by line rather than through a TextIOWrapper, so a bad byte is
+    # reported on its own line and not somewhere in an 8 KiB chunk
+    for number, line in enumerate(file, start=1):
+        try:
+            yield line.decode("utf-8")
+        except UnicodeDecodeError as exc:
+            raise ImportFormatError(number, "not valid UTF-8") from exc
+
+
+def guess_format(filename: str | None, content_type: str | None) -> ExportFormat:
+    if (filename or "").lower().endswith(".csv") or content_type == "text/csv":
+        return ExportFormat.CSV
+    return ExportFormat.NDJSON
@@ -0,0 +1,42 @@
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """start()/stop() for the app's background jobs (dataclasses mixing this in).
+
+    `run_once` runs in a loop on the app's event loop and returns how many
+    seconds to wait before the next run; a run that raises is logged and
+    followed by a wait of `retry_delay`.
+    """
+    _task: asyncio.Task | None = None
+
+    async def run_once(self) -> float:
+        raise NotImplementedError
+
+    @property
+    def retry_delay(self) -> float:
+        raise NotImplementedError
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                delay = await self.run_once()
+            except Exception:
+                logger.exception("%s failed", type(self).__name__)
+                delay = self.retry_delay
+            if delay > 0:
+                await asyncio.sleep(delay)
@@ -2,8 +2,17 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 import uvicorn
 
-from app.dependencies.database import init_db
-from app.routers import games, gamers, swaps
+from app.cache import cache
+from app.config import settings
+from app.dependencies.database import async_engine, engine, init_async_db, init_db
+from app.dependencies.events import EventBroker
+from app.dependencies.notifications import create_notification_service, dispatcher
+from app.outbox import OutboxRelay, create_relay
+from app.profiling import ProfilingMiddleware
+from app.metrics import MetricsMiddleware, install_query_hooks, metrics as request_metrics
+from app.routers import events, games, gamers, metrics, stats, swaps
+from app.stats import create_reconciler
+from app.trades import create_refresher
 
 
 PROJECT_NAME = "gameswap"
@@ -12,8 +21,59 @@ PROJECT_SUMMARY = "track game swaps with friends"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_db()
+    if settings.async_database:
+        await init_async_db()
+    else:
+        init_db()
+    notification_service = create_notification_service()
+    event_broker = EventBroker(buffer_size=settings.events_buffer_size)
+    notification_service.subscribe("*", event_broker.publish)
+    relay = create_relay(notification_service)
+    reconciler = create_reconciler()
+    refresher = create_refresher()
+    app.state.notification_service = notification_service
+    app.state.event_broker = event_broker
+    app.state.relay = relay
+    app.state.reconciler = reconciler
+    app.state.trade_graph_refresher = refresher
+    register_metrics(relay, event_broker)
+    await dispatcher.start()
+    await relay.start()
+    await reconciler.start()
+    await refresher.start()
     yield
+    await refresher.stop()
+    await reconciler.stop()
+    await relay.stop()
+    event_broker.close()
+    await dispatcher.drain(timeout=settings.notification_drain_timeout)
+
+
+def register_metrics(relay: OutboxRelay, event_broker: EventBroker) -> None:
+    request_metrics.register(
+        "gameswap_outbox_lag_seconds", "Age of the oldest undelivered outbox message.", "gauge",
+        lambda: [({}, relay.lag)],
+    )
+    request_metrics.register(
+        "gameswap_outbox_messages_total", "Outbox messages relayed since startup.", "counter",
+        lambda: [({"result": "delivered"}, relay.delivered), ({"result": "failed"}, relay.failed)],
+    )
+    request_metrics.register(
+        "gameswap_outbox_dead_letters", "Outbox messages that ran out of delivery attempts.", "gauge",
+        lambda: [({}, relay.dead_letters)],
+    )
+    request_metrics.register(
+        "gameswap_event_subscribers", "Open /events streams and websockets.", "gauge",
+        lambda: [({}, event_broker.subscribers)],
+    )
+    request_metrics.register(
+        "gameswap_cache_requests_total", "Response cache lookups.", "counter",
+        lambda: [
+            ({"namespace": namespace, "result": result}, counts[key])
+            for namespace, counts in sorted(cache.stats().items())
+            for result, key in (("hit", "hits"), ("miss", "misses"))
+        ],
+    )
 
 
 app = FastAPI(
@@ -31,6 +91,18 @@ def read_root():
 app.include_router(gamers.router, tags=["gamers"])
 app.include_router(games.router, tags=["games"])
 app.include_router(swaps.router, tags=["swaps"])
+app.include_router(events.router, tags=["events"])
+app.include_router(stats.router, tags=["stats"])
+
+if settings.metrics_enabled:
+    install_query_hooks(engine)
+    if async_engine is not None:
+        install_query_hooks(async_engine.sync_engine)
+    app.add_middleware(MetricsMiddleware, server_timing=settings.metrics_server_timing)
+    app.include_router(metrics.router, tags=["metrics"])
+
+if settings.slow_query_threshold is not None or settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware, enabled=settings.profiling_enabled)
 
 
 def main():
@@ -0,0 +1,195 @@
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+NAMESPACE = "gameswap"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = tuple[tuple[str, str], ...]
+Collect = Callable[[], Iterable[tuple[dict[str, str], float]]]
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_time: float = 0.0
+
+    def server_timing(self, total: float) -> str:
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.statements} queries", '
+            f"total;dur={total * 1000:.1f}"
+        )
+
+
+# Set by the middleware for the duration of a request; copied into the
+# threadpool with the rest of the context, so CRUD queries are attributed to it
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+_QUERY_STARTS = "metrics_query_starts"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _request_stats.get() is not None:
+        conn.info.setdefault(_QUERY_STARTS, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _request_stats.get()
+    starts = conn.info.get(_QUERY_STARTS)
+    if stats is not None and starts:
+        stats.statements += 1
+        stats.db_time += time.perf_counter() - starts.pop()
+
+
+def install_query_hooks(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def remove_query_hooks(engine: Engine) -> None:
+    event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+    event.remove(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@dataclass
+class Histogram:
+    name: str
+    help: str
+    buckets: tuple[float, ...]
+    # labels -> [per-bucket counts (the last one is +Inf), sum, count]
+    series: dict[Labels, list] = field(default_factory=dict)
+
+    def observe(self, labels: Labels, value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket
+                yield f"{self.name}_bucket{_labels((*labels, ('le', str(bound))))} {cumulative}"
+            yield f"{self.name}_sum{_labels(labels)} {total}"
+            yield f"{self.name}_count{_labels(labels)} {count}"
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@dataclass
+class Metrics:
+    """Per-route request metrics plus gauges and counters read at scrape time.
+
+    Requests are labelled with the route template (`/games/{game_id}`), never the
+    raw path, so the number of series stays bounded.
+    """
+    latency: Histogram = field(default_factory=lambda: Histogram(
+        f"{NAMESPACE}_request_duration_seconds", "Request latency.", LATENCY_BUCKETS
+    ))
+    statements: Histogram = field(default_factory=lambda: Histogram(
+        f"{NAMESPACE}_request_sql_statements", "SQL statements executed per request.", STATEMENT_BUCKETS
+    ))
+    db_time: Histogram = field(default_factory=lambda: Histogram(
+        f"{NAMESPACE}_request_db_seconds", "Time spent in SQL statements per request.", LATENCY_BUCKETS
+    ))
+    collectors: dict[str, tuple[str, str, Collect]] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def observe_request(self, method: str, route: str, status: int, duration: float, stats: RequestStats) -> None:
+        labels = (("method", method), ("route", route))
+        with self._lock:
+            self.latency.observe((*labels, ("status", str(status))), duration)
+            self.statements.observe(labels, stats.statements)
+            self.db_time.observe(labels, stats.db_time)
+
+    def register(self, name: str, help: str, kind: str, collect: Collect) -> None:
+        """Export values read from `collect()` on every scrape, as a gauge or counter."""
+        self.collectors[name] = (help, kind, collect)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                *self.latency.render(),
+                *self.statements.render(),
+                *self.db_time.render(),
+            ]
+        for name, (help, kind, collect) in sorted(self.collectors.items()):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            lines += [
+                f"{name}{_labels(tuple(labels.items()))} {value}"
+                for labels, value in collect()
+            ]
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self._lock:
+            for histogram in (self.latency, self.statements, self.db_time):
+                histogram.series.clear()
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and counts its SQL statements (see install_query_hooks).
+
+    With `server_timing` the database time, statement count and time to first
+    byte are also sent back in a `Server-Timing` header.
+    """
+    def __init__(self, app: ASGIApp, registry: Metrics | None = None, server_timing: bool = False) -> None:
+        self.app = app
+        self.registry = metrics if registry is None else registry
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", stats.server_timing(time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.registry.observe_request(
+                scope["method"], route, status, time.perf_counter() - start, stats
+            )
+
+
+metrics = Metrics()
@@ -0,0 +1,44 @@
+from sqlalchemy import Connection, inspect
+
+from app import search
+from app.models import Base
+
+
+# Indexes the models no longer declare, by table: dropped so upgraded databases
+# do not keep maintaining them on every write
+LEGACY_INDEXES = {
+    "game": ("ix_game_title",),  # superseded by ix_game_title_platform
+}
+
+
+def upgrade(connection: Connection) -> None:
+    """Bring an existing database up to the current schema.
+
+    `create_all` only creates missing tables, so columns (nullable or with a
+    server default) and indexes added to existing tables are created here as
+    well, along with the title search index. Indexes in LEGACY_INDEXES are
+    dropped.
+    """
+    Base.metadata.create_all(connection)
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not (column.nullable or column.server_default):
+                continue
+            ddl = f"{preparer.format_column(column)} {column.type.compile(connection.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            connection.exec_driver_sql(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    for table_name, names in LEGACY_INDEXES.items():
+        existing = {index["name"] for index in inspector.get_indexes(table_name)}
+        for name in names:
+            if name in existing:
+                connection.exec_driver_sql(f"DROP INDEX {preparer.quote(name)}")
+    search.install(connection)
@@ -1,23 +1,47 @@
-from sqlalchemy import ForeignKey
+from collections.abc import Collection, Iterable
+from datetime import UTC, datetime
+
+from sqlalchemy import JSON, ForeignKey, Index, UniqueConstraint, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, validates
 
 
+def utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
 class Base(DeclarativeBase):
     pass
 
 
 class Game(Base):
     __tablename__ = "game"
+    __table_args__ = (
+        # Owners of a title (optionally on a platform, optionally still available),
+        # owners on a platform, and a gamer's games split by availability
+        Index("ix_game_title_platform", "title", "platform", "swap_id"),
+        Index("ix_game_platform_title", "platform", "title"),
+        Index("ix_game_gamer_id_swap_id", "gamer_id", "swap_id"),
+        # No two games in a swap share a title on a platform
+        Index(
+            "ix_game_swap_id_title_platform", "swap_id", "title", "platform",
+            unique=True,
+            sqlite_where=text("swap_id IS NOT NULL"),
+            postgresql_where=text("swap_id IS NOT NULL"),
+        ),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
-    title: Mapped[str] = mapped_column(index=True)
+    title: Mapped[str]
     platform: Mapped[str]
 
     gamer_id: Mapped[int] = mapped_column(ForeignKey("gamer.id", ondelete="CASCADE"))
     gamer: Mapped["Gamer"] = relationship(back_populates="games")
 
-    swap_id: Mapped[int | None] = mapped_column(ForeignKey("swap.id", ondelete="SET NULL"))
+    swap_id: Mapped[int | None] = mapped_column(ForeignKey("swap.id", ondelete="SET NULL"), index=True)
     swap: Mapped["Swap | None"] = relationship(back_populates="games")
 
+    # Bumped by every write that changes the row, for ETags and If-Match
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
+
     def is_available(self) -> bool:
         return self.swap_id is None
 
@@ -27,38 +51,142 @@ class Gamer(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] 
     email: Mapped[str] = mapped_column(unique=True)
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
 
     games: Mapped[list[Game]] = relationship(back_populates="gamer", cascade="all, delete-orphan")
+    wishlist: Mapped[list["Wish"]] = relationship(back_populates="gamer", cascade="all, delete-orphan")
 
     proposer_swaps: Mapped[list["Swap"]] = relationship(back_populates="proposer", foreign_keys="Swap.proposer_id")
     acceptor_swaps: Mapped[list["Swap"]] = relationship(back_populates="acceptor", foreign_keys="Swap.acceptor_id")
 
 
+class Wish(Base):
+    __tablename__ = "wish"
+    __table_args__ = (
+        UniqueConstraint("gamer_id", "title", "platform"),
+        # Gamers who want a title on a platform
+        Index("ix_wish_title_platform", "title", "platform"),
+    )
+    id: Mapped[int] = mapped_column(primary_key=True)
+    title: Mapped[str]
+    platform: Mapped[str]
+
+    gamer_id: Mapped[int] = mapped_column(ForeignKey("gamer.id", ondelete="CASCADE"))
+    gamer: Mapped[Gamer] = relationship(back_populates="wishlist")
+
+
 class Swap(Base):
     __tablename__ = "swap"
     id: Mapped[int] = mapped_column(primary_key=True)
 
     games: Mapped[list[Game]] = relationship(back_populates="swap")
 
-    proposer_id: Mapped[int] = mapped_column(ForeignKey("gamer.id"))
+    proposer_id: Mapped[int] = mapped_column(ForeignKey("gamer.id"), index=True)
     proposer: Mapped[Gamer] = relationship(back_populates="proposer_swaps", foreign_keys=proposer_id)
 
-    acceptor_id: Mapped[int] = mapped_column(ForeignKey("gamer.id"))
+    acceptor_id: Mapped[int] = mapped_column(ForeignKey("gamer.id"), index=True)
     acceptor: Mapped[Gamer] = relationship(back_populates="acceptor_swaps", foreign_keys=acceptor_id)
 
-    @validates("games")
-    def validate_game(self, _, game: Game):
-        if game.gamer_id not in (self.proposer_id, self.acceptor_id):
+    @validates("games", include_removes=True)
+    def validate_game(self, _, game: Game, is_remove: bool) -> Game:
+        validator = self._games_validator()
+        if is_remove:
+            validator.remove(game)
+        else:
+            validator.add(game, (self.proposer_id, self.acceptor_id))
+        return game
+
+    def _games_validator(self) -> "SwapGameValidator":
+        # Built once per loaded collection; a reload (after expiry) starts afresh
+        games = self.games
+        cached = getattr(self, "_games_validated", None)
+        if cached is None or cached[0] is not games:
+            cached = self._games_validated = (games, SwapGameValidator(games))
+        return cached[1]
+
+
+class SwapGameValidator:
+    """Checks games joining a swap: owned by one of its gamers, available, and
+    not sharing a title and platform with a game already in it.
+
+    The titles and platforms seen so far are kept in a set, so assembling a
+    swap of n games takes n lookups rather than n² comparisons.
+    """
+    def __init__(self, games: Iterable[Game] = ()) -> None:
+        self.keys = {(game.title, game.platform) for game in games}
+
+    def add(self, game: Game, gamer_ids: Collection[int]) -> None:
+        if game.gamer_id not in gamer_ids:
             raise ValueError(
-                f"Game {game.id} not owned by gamer {self.proposer_id} or {self.acceptor_id}."
+                f"Game {game.id} not owned by gamer {' or '.join(str(gamer_id) for gamer_id in gamer_ids)}."
             )
         if not game.is_available():
             raise ValueError(
                 f"Game {game.id} is currently in a swap."
             )
-        if any([game.title == swap_game.title and game.platform == swap_game.platform 
-                for swap_game in self.games]):
+        key = (game.title, game.platform)
+        if key in self.keys:
             raise ValueError(
                 f"Duplicate game in swap with title='{game.title}' and platform='{game.platform}'."
             )
-        return game
+        self.keys.add(key)
+
+    def remove(self, game: Game) -> None:
+        self.keys.discard((game.title, game.platform))
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # Undelivered messages in order, and delivered ones by age for pruning
+        Index("ix_outbox_delivered_at_id", "delivered_at", "id"),
+        # Dead letters, for reporting and pruning
+        Index("ix_outbox_failed_at", "failed_at"),
+    )
+    id: Mapped[int] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column(unique=True)
+    event: Mapped[str]
+    message: Mapped[str]
+    data: Mapped[dict | None] = mapped_column(JSON)
+    created_at: Mapped[datetime] = mapped_column(default=utcnow)
+    attempts: Mapped[int] = mapped_column(default=0)
+    delivered_at: Mapped[datetime | None]
+    # Set when the last attempt failed: a dead letter, kept for inspection until pruned
+    failed_at: Mapped[datetime | None]
+
+
+class TableVersion(Base):
+    """Change counter per table, bumped in the same transaction as every CRUD write.
+
+    Sharded over several rows per table, see app.crud.versions.
+    """
+    __tablename__ = "table_version"
+    name: Mapped[str] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(default=0)
+
+
+# Counters behind the /stats endpoints, kept up to date by the CRUD writes and
+# rebuilt from the tables above by the reconciliation job
+
+class PlatformStats(Base):
+    __tablename__ = "platform_stats"
+    platform: Mapped[str] = mapped_column(primary_key=True)
+    games: Mapped[int] = mapped_column(default=0)
+    available: Mapped[int] = mapped_column(default=0)
+
+
+class GamerStats(Base):
+    __tablename__ = "gamer_stats"
+    gamer_id: Mapped[int] = mapped_column(ForeignKey("gamer.id", ondelete="CASCADE"), primary_key=True)
+    swaps: Mapped[int] = mapped_column(default=0)
+
+
+class TitleStats(Base):
+    __tablename__ = "title_stats"
+    __table_args__ = (
+        # Most-wanted titles
+        Index("ix_title_stats_wishes", "wishes"),
+    )
+    title: Mapped[str] = mapped_column(primary_key=True)
+    platform: Mapped[str] = mapped_column(primary_key=True)
+    wishes: Mapped[int] = mapped_column(default=0)
@@ -0,0 +1,135 @@
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import timedelta
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import app.crud.outbox as outbox
+from app.config import settings
+from app.dependencies.database import background_session, close_session, run_in_session
+from app.dependencies.notifications import Event, Notification, NotificationService
+from app.jobs import PeriodicJob
+from app.models import utcnow
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OutboxRelay(PeriodicJob):
+    """Delivers notifications written to the outbox by CRUD writes.
+
+    Pending messages are read in id order, `batch_size` at a time, handed to the
+    notification handlers and only then marked delivered, so a crash in between
+    delivers them again (at-least-once); handlers can use `Notification.key` to
+    ignore repeats. While the service's dispatcher runs, its workers make the
+    deliveries (with their retries and backoff) and a message counts as
+    delivered once every handler succeeded; otherwise the handlers run inline.
+    A delivery the dispatcher dropped for backpressure is not an attempt: the
+    message stays pending as it was. Failing messages are retried on later polls until they have had
+    `max_attempts`, then kept as dead letters for `dead_letter_retention`.
+    `lag` is the age in seconds of the oldest pending message, `dead_letters`
+    the number of dead letters.
+    """
+    session_factory: Callable[[], Session | AsyncSession]
+    service: NotificationService
+    batch_size: int = 100
+    poll_interval: float = 1.0
+    max_attempts: int = 10
+    retention: float = 24 * 60 * 60
+    dead_letter_retention: float = 7 * 24 * 60 * 60
+
+    delivered: int = 0
+    failed: int = 0
+    lag: float = 0.0
+    dead_letters: int = 0
+
+    async def run_once(self) -> float:
+        # Straight on to the next batch while there is a backlog
+        relayed = await self.relay_batch()
+        return 0 if relayed >= self.batch_size else self.poll_interval
+
+    @property
+    def retry_delay(self) -> float:
+        return self.poll_interval
+
+    async def relay_batch(self) -> int:
+        """Deliver one batch of pending messages, returning how many were read."""
+        session = self.session_factory()
+        try:
+            messages = await run_in_session(
+                session, outbox.get_pending_messages, self.batch_size, self.max_attempts
+            )
+            if messages:
+                delivered, failed = await self._deliver(messages)
+                dead = []
+                for message in messages:
+                    if message.id in failed and message.attempts + 1 >= self.max_attempts:
+                        logger.error("Outbox message %s failed %d times, giving up", message.key, self.max_attempts)
+                        dead.append(message.id)
+                await run_in_session(session, outbox.mark_messages, delivered, failed, dead)
+                self.delivered += len(delivered)
+                self.failed += len(failed)
+            else:
+                now = utcnow()
+                await run_in_session(
+                    session, 
+                    outbox.prune_messages, 
+                    now - timedelta(seconds=self.retention), 
+                    now - timedelta(seconds=self.dead_letter_retention),
+                )
+            self.lag = await run_in_session(session, outbox.get_relay_lag, self.max_attempts)
+            self.dead_letters = await run_in_session(session, outbox.count_dead_letters)
+            return len(messages)
+        finally:
+            await close_session(session)
+
+    async def _deliver(self, messages: list[Row]) -> tuple[list[int], list[int]]:
+        notifications = [
+            Notification(
+                event=Event(message.event), 
+                message=message.message, 
+                key=message.key, 
+                data=message.data or {},
+            )
+            for message in messages
+        ]
+        dispatcher = self.service.dispatcher
+        if dispatcher is not None and dispatcher.running:
+            outcomes = await asyncio.gather(*(self.service.dispatch(n) for n in notifications))
+        else:
+            outcomes = await run_in_threadpool(self._deliver_inline, notifications)
+        delivered, failed = [], []
+        for message, outcome in zip(messages, outcomes):
+            if outcome is not None:
+                (delivered if outcome else failed).append(message.id)
+        return delivered, failed
+
+    def _deliver_inline(self, notifications: list[Notification]) -> list[bool]:
+        outcomes = []
+        for notification in notifications:
+            try:
+                self.service.deliver(notification)
+            except Exception:
+                logger.exception("Failed to deliver outbox message %s", notification.key)
+                outcomes.append(False)
+            else:
+                outcomes.append(True)
+        return outcomes
+
+
+def create_relay(service: NotificationService) -> OutboxRelay:
+    return OutboxRelay(
+        session_factory=background_session,
+        service=service,
+        batch_size=settings.outbox_batch_size,
+        poll_interval=settings.outbox_poll_interval,
+        max_attempts=settings.outbox_max_attempts,
+        retention=settings.outbox_retention,
+        dead_letter_retention=settings.outbox_dead_letter_retention,
+    )
@@ -0,0 +1,180 @@
+import asyncio
+from collections.abc import Callable, Mapping, Sequence
+import cProfile
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import io
+import logging
+import pstats
+import sys
+import time
+from typing import Any, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PROFILE_HEADER = "x-profile"
+PROFILE_PARAM = "profile"
+REPORT_LIMIT = 40
+
+_QUERY_STARTS = "slow_query_starts"
+
+# Set by ProfilingMiddleware: the request being served, for the slow-query log,
+# and its profile when one was asked for
+_request_scope: ContextVar[Scope | None] = ContextVar("request_scope", default=None)
+_request_profile: ContextVar["RequestProfile | None"] = ContextVar("request_profile", default=None)
+
+
+def parameter_shape(parameters: Any) -> Any:
+    """Types of the bound parameters, so slow statements are logged without their values."""
+    if isinstance(parameters, Mapping):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, Sequence) and not isinstance(parameters, (str, bytes)):
+        if parameters and isinstance(parameters[0], (Mapping, tuple, list)):
+            # executemany
+            return f"{len(parameters)} x {parameter_shape(parameters[0])}"
+        return tuple(type(value).__name__ for value in parameters)
+    return type(parameters).__name__
+
+
+def _crud_caller() -> str | None:
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("app.crud."):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _current_route() -> str | None:
+    scope = _request_scope.get()
+    if scope is None:
+        return None
+    route = getattr(scope.get("route"), "path", scope.get("path"))
+    return f"{scope['method']} {route}"
+
+
+def install_slow_query_log(engine: Engine, threshold: float) -> None:
+    """Log every statement that runs for `threshold` seconds or longer.
+
+    Each entry names the CRUD function and the route it came from, and the
+    bound parameters by type only.
+    """
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault(_QUERY_STARTS, []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        starts = conn.info.get(_QUERY_STARTS)
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        if elapsed >= threshold:
+            logger.warning(
+                "Slow query (%.1f ms) in %s during %s: %s; parameters: %s",
+                elapsed * 1000,
+                _crud_caller() or "<unknown>",
+                _current_route() or "<no request>",
+                " ".join(statement.split()),
+                parameter_shape(parameters),
+            )
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+@dataclass
+class RequestProfile:
+    """cProfile data of one request, across the event loop and threadpool threads."""
+    profiles: list[cProfile.Profile] = field(default_factory=list)
+
+    def wrap(self, fn: Callable[..., T]) -> Callable[..., T]:
+        # cProfile only sees the thread it is enabled in, so work sent to the
+        # threadpool gets a profile of its own, merged into the report
+        def profiled(*args: Any, **kwargs: Any) -> T:
+            profile = cProfile.Profile()
+            self.profiles.append(profile)
+            return profile.runcall(fn, *args, **kwargs)
+        return profiled
+
+    def report(self, limit: int = REPORT_LIMIT) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(*self.profiles, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return stream.getvalue()
+
+
+def current_profile() -> RequestProfile | None:
+    return _request_profile.get()
+
+
+def wants_profile(scope: Scope) -> bool:
+    if Headers(scope=scope).get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return QueryParams(scope.get("query_string", b"")).get(PROFILE_PARAM, "").lower() in ("1", "true", "yes")
+
+
+class ProfilingMiddleware:
+    """Makes the current request known to the slow-query log and, with
+    `enabled`, profiles requests sent with `X-Profile: 1` (or `?profile=1`).
+
+    A profiled request is served as usual but answered with the cProfile report
+    (text/plain) instead of its response; `X-Profiled-Status` carries the status
+    it would have had. Profiled requests run one at a time, and anything else
+    the event loop runs meanwhile shows up in the report, so this is meant for
+    development and staging, not production.
+    """
+    def __init__(self, app: ASGIApp, enabled: bool = False) -> None:
+        self.app = app
+        self.enabled = enabled
+        self._lock = asyncio.Lock()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        try:
+            if self.enabled and wants_profile(scope):
+                await self._profile(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        status = 500
+
+        async def discard(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        request_profile = RequestProfile()
+        async with self._lock:
+            token = _request_profile.set(request_profile)
+            profile = cProfile.Profile()
+            request_profile.profiles.append(profile)
+            start = time.perf_counter()
+            profile.enable()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                profile.disable()
+                _request_profile.reset(token)
+        elapsed = time.perf_counter() - start
+
+        report = f"{scope['method']} {scope['path']}: {status} in {elapsed * 1000:.1f} ms\n\n"
+        response = PlainTextResponse(
+            report + request_profile.report(),
+            headers={"X-Profiled-Status": str(status)},
+        )
+        await response(scope, receive, send)
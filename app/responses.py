@@ -0,0 +1,91 @@
+from collections.abc import AsyncIterator, Collection, Mapping, Sequence
+import csv
+from enum import StrEnum
+import io
+from typing import Any
+
+from fastapi.concurrency import iterate_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+from sqlalchemy import Row
+
+from app.crud.pagination import Chunks
+
+
+class ExportFormat(StrEnum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class RowsJSONResponse(Response):
+    """JSON array of rows that are already in the shape of the response schema.
+
+    List endpoints select just the schema's columns and return this directly,
+    skipping ORM instances and the per-item `response_model` validation; rows
+    go straight to pydantic-core's JSON encoder.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Sequence[Row | Mapping[str, Any]]) -> bytes:
+        return to_json([row._asdict() if isinstance(row, Row) else row for row in content])
+
+
+class NDJSONResponse(StreamingResponse):
+    media_type = "application/x-ndjson"
+
+
+class CSVResponse(StreamingResponse):
+    media_type = "text/csv"
+
+
+class EventStreamResponse(StreamingResponse):
+    media_type = "text/event-stream"
+
+
+def _as_async(chunks: Chunks) -> AsyncIterator:
+    if isinstance(chunks, AsyncIterator):
+        return chunks
+    return iterate_in_threadpool(chunks)
+
+
+async def ndjson_lines(
+        chunks: Chunks,
+        schema: type[BaseModel],
+        fields: Collection[str] | None = None,
+    ) -> AsyncIterator[bytes]:
+    # `fields` is a sparse fieldset, as in the paged responses; None is every field
+    include = None if fields is None else set(fields)
+    async for chunk in _as_async(chunks):
+        yield b"".join(
+            schema.model_validate(item, from_attributes=True).model_dump_json(include=include).encode() + b"\n"
+            for item in chunk
+        )
+
+
+async def csv_lines(chunks: Chunks, schema: type[BaseModel]) -> AsyncIterator[bytes]:
+    columns = list(schema.model_fields)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for chunk in _as_async(chunks):
+        for item in chunk:
+            row = schema.model_validate(item, from_attributes=True).model_dump(mode="json")
+            writer.writerow(row[column] for column in columns)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def export_response(
+        chunks: Chunks, 
+        schema: type[BaseModel], 
+        format: ExportFormat, 
+        filename: str,
+    ) -> StreamingResponse:
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    if format == ExportFormat.CSV:
+        return CSVResponse(csv_lines(chunks, schema), headers=headers)
+    return NDJSONResponse(ndjson_lines(chunks, schema), headers=headers)
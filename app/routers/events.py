@@ -0,0 +1,83 @@
+import asyncio
+from collections.abc import AsyncIterator
+import json
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from app.config import settings
+from app.dependencies.events import EventBroker, EventBrokerDep, EventFilter, EventFilterDep, Subscriber
+from app.dependencies.notifications import Notification
+from app.responses import EventStreamResponse
+
+
+router = APIRouter()
+
+
+def event_payload(notification: Notification) -> dict:
+    return {
+        "event": notification.event, 
+        "key": notification.key, 
+        "message": notification.message, 
+        "data": notification.data,
+    }
+
+
+async def sse_events(
+        subscriber: Subscriber, 
+        keepalive: float = settings.events_keepalive,
+    ) -> AsyncIterator[str]:
+    while True:
+        try:
+            notification = await asyncio.wait_for(subscriber.get(), keepalive)
+        except TimeoutError:
+            # Comment line: keeps proxies from closing an idle connection
+            yield ": keepalive\n\n"
+            continue
+        if notification is None:
+            return
+        if dropped := subscriber.take_dropped():
+            # The client missed events and should refetch what it displays
+            yield f"event: overflow\ndata: {json.dumps({'dropped': dropped})}\n\n"
+        yield (
+            f"id: {notification.key}\nevent: {notification.event}\n"
+            f"data: {json.dumps(event_payload(notification))}\n\n"
+        )
+
+
+async def _subscribed_events(broker: EventBroker, filter: EventFilter) -> AsyncIterator[str]:
+    async with broker.subscribe(filter) as subscriber:
+        async for event in sse_events(subscriber):
+            yield event
+
+
+@router.get("/events", response_class=EventStreamResponse)
+async def get_events(broker: EventBrokerDep, filter: EventFilterDep):
+    """Server-Sent Events feed of gamer, game and swap changes, optionally filtered.
+
+    `event` may be repeated; `platform`, `title` and `gamer_id` match the games
+    of game and swap events, and `gamer_id` alone also matches gamers and swap parties.
+    """
+    return EventStreamResponse(_subscribed_events(broker, filter))
+
+
+@router.websocket("/events/ws")
+async def events_websocket(websocket: WebSocket, broker: EventBrokerDep, filter: EventFilterDep):
+    async with broker.subscribe(filter) as subscriber:
+        await websocket.accept()
+
+        async def forward() -> None:
+            while (notification := await subscriber.get()) is not None:
+                if dropped := subscriber.take_dropped():
+                    await websocket.send_json({"event": "overflow", "data": {"dropped": dropped}})
+                await websocket.send_json(event_payload(notification))
+            await websocket.close()
+
+        sender = asyncio.create_task(forward())
+        try:
+            # Clients only listen; receiving is how a disconnect is noticed
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            sender.cancel()
@@ -1,67 +1,198 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Annotated, Any
 
+from fastapi import APIRouter, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+
+from app.cache import cache, gamer_games_key, to_cached
 import app.crud.gamers as gamers
-from app.dependencies.database import SessionDep
-from app.dependencies.notifications import NotificationServiceDep
+import app.crud.games as games
+import app.crud.wishes as wishes
+from app.crud.versions import VersionMismatchError
+from app.dependencies.database import SessionDep, run_in_session
+from app.dependencies.etags import ConditionalDep, match_versions, row_etag
+from app.dependencies.fields import GameFieldsDep
+from app.dependencies.pagination import DEFAULT_LIMIT, MAX_LIMIT, PaginationDep
+from app.responses import ExportFormat, NDJSONResponse, RowsJSONResponse, export_response, ndjson_lines
+from app.schemas.bulk import BulkResult, bulk_result, validate_items
 from app.schemas.game import Game
 from app.schemas.gamer import Gamer, GamerCreate, GamerUpdate
+from app.schemas.wish import Match, Wish, WishCreate
 
 
 router = APIRouter()
 
 
 @router.post("/gamers", response_model=Gamer)
-def create_gamer(
-    gamer: GamerCreate, 
-    session: SessionDep,
-    notification_service: NotificationServiceDep):
+async def create_gamer(gamer: GamerCreate, session: SessionDep):
     try:
-        return gamers.create_gamer(session, gamer, notification_service)
+        return await run_in_session(session, gamers.create_gamer, gamer)
     except gamers.DuplicateGamerError as exc:
         raise HTTPException(status_code=422) from exc
 
 
+@router.post("/gamers/bulk", response_model=BulkResult[Gamer])
+async def create_gamers(items: list[dict[str, Any]], session: SessionDep):
+    valid, invalid = validate_items(items, GamerCreate)
+    try:
+        created, errors = await run_in_session(session, gamers.create_gamers, valid)
+    except gamers.DuplicateGamerError as exc:
+        raise HTTPException(status_code=422) from exc
+    return bulk_result(created, invalid, errors)
+
+
 @router.get("/gamers", response_model=list[Gamer]) 
-def get_gamers(
+async def get_gamers(
+    response: Response,
     session: SessionDep,
+    pagination: PaginationDep,
+    conditional: ConditionalDep,
     title: str | None = None, 
     platform: str | None = None,
+    stream: bool = False,
 ):
+    await conditional.check_tables(session, "gamer", *(("game",) if title or platform else ()))
+    if stream:
+        chunks = gamers.stream_gamers(session, title, platform)
+        return conditional.tag(NDJSONResponse(ndjson_lines(chunks, Gamer)))
     if title or platform:
-        return gamers.get_gamers_who_own_game(session, title, platform)
-    return gamers.get_gamers(session)
+        items = await run_in_session(
+            session, gamers.get_gamers_who_own_game, 
+            title, platform, pagination.limit, pagination.after,
+        )
+    else:
+        items = await run_in_session(session, gamers.get_gamers, pagination.limit, pagination.after)
+    pagination.set_next_cursor(response, items)
+    return RowsJSONResponse(items, headers=response.headers)
 
 
 @router.get("/gamers/{gamer_id}", response_model=Gamer) 
-def get_gamer(gamer_id: int, session: SessionDep):
+async def get_gamer(gamer_id: int, session: SessionDep, conditional: ConditionalDep):
     try:
-        return gamers.get_gamer(session, gamer_id)
+        version = await run_in_session(session, gamers.get_gamer_version, gamer_id)
+        conditional.check_row("gamer", gamer_id, version)
+        return await run_in_session(session, gamers.get_gamer, gamer_id)
     except gamers.GamerNotFoundError as exc:
         raise HTTPException(status_code=404) from exc
     
 
 @router.patch("/gamers/{gamer_id}", response_model=Gamer)
-def update_gamer(gamer_id: int, params: GamerUpdate, session: SessionDep):
+async def update_gamer(
+    gamer_id: int, 
+    params: GamerUpdate, 
+    session: SessionDep,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
+):
+    versions = match_versions(if_match, "gamer", gamer_id)
     try:
-        return gamers.update_gamer(session, gamer_id, params)
+        gamer = await run_in_session(session, gamers.update_gamer, gamer_id, params, versions)
     except gamers.GamerNotFoundError as exc:
         raise HTTPException(status_code=404) from exc
     except gamers.DuplicateGamerError as exc:
         raise HTTPException(status_code=422) from exc
+    except VersionMismatchError as exc:
+        raise HTTPException(status_code=412) from exc
+    response.headers["ETag"] = row_etag("gamer", gamer.id, gamer.version)
+    return gamer
     
 
 @router.delete("/gamers/{gamer_id}", status_code=status.HTTP_204_NO_CONTENT) 
-def delete_gamer(gamer_id: int, session: SessionDep):
+async def delete_gamer(
+    gamer_id: int, 
+    session: SessionDep,
+    if_match: Annotated[str | None, Header()] = None,
+):
+    versions = match_versions(if_match, "gamer", gamer_id)
     try:
-        gamers.delete_gamer(session, gamer_id)
+        await run_in_session(session, gamers.delete_gamer, gamer_id, versions)
     except gamers.GamerNotFoundError as exc:
         raise HTTPException(status_code=404) from exc
+    except VersionMismatchError as exc:
+        raise HTTPException(status_code=412) from exc
     
 
 @router.get("/gamers/{gamer_id}/games", response_model=list[Game]) 
-def get_games_owned_by_gamer(gamer_id: int, session: SessionDep):
+async def get_games_owned_by_gamer(
+    gamer_id: int, 
+    response: Response, 
+    session: SessionDep, 
+    conditional: ConditionalDep,
+    selection: GameFieldsDep,
+):
+    async def load():
+        return to_cached(Game, await run_in_session(session, games.get_gamer_games, gamer_id))
+
+    try:
+        versions = await run_in_session(session, games.get_gamer_game_versions, gamer_id)
+        etag = conditional.check_rows("gamer-games", gamer_id, versions)
+        if selection.is_default():
+            items = await cache.get_or_load(gamer_games_key(gamer_id), load, etag)
+        else:
+            # Only the full representation is cached
+            items = await run_in_session(
+                session, games.get_gamer_games, gamer_id, selection.fields, selection.expand
+            )
+    except gamers.GamerNotFoundError as exc:
+        raise HTTPException(status_code=404) from exc
+    return RowsJSONResponse(items, headers=response.headers)
+
+
+@router.get("/gamers/{gamer_id}/games/export", response_class=StreamingResponse)
+async def export_games_owned_by_gamer(
+    gamer_id: int, 
+    session: SessionDep, 
+    conditional: ConditionalDep,
+    format: ExportFormat = ExportFormat.CSV,
+):
+    await conditional.check_tables(session, "gamer", "game")
+    try:
+        await run_in_session(session, gamers.get_gamer, gamer_id)
+    except gamers.GamerNotFoundError as exc:
+        raise HTTPException(status_code=404) from exc
+    chunks = games.stream_games(session, gamer_id=gamer_id)
+    return conditional.tag(export_response(chunks, Game, format, f"gamer-{gamer_id}-games"))
+
+
+@router.get("/gamers/{gamer_id}/wishlist", response_model=list[Wish])
+async def get_wishlist(gamer_id: int, session: SessionDep, conditional: ConditionalDep):
+    await conditional.check_tables(session, "gamer", "wish")
+    try:
+        return await run_in_session(session, wishes.get_wishlist, gamer_id)
+    except gamers.GamerNotFoundError as exc:
+        raise HTTPException(status_code=404) from exc
+
+
+@router.post("/gamers/{gamer_id}/wishlist", response_model=Wish)
+async def create_wish(gamer_id: int, wish: WishCreate, session: SessionDep):
+    try:
+        return await run_in_session(session, wishes.create_wish, gamer_id, wish)
+    except gamers.GamerNotFoundError as exc:
+        raise HTTPException(status_code=404) from exc
+    except wishes.DuplicateWishError as exc:
+        raise HTTPException(status_code=422) from exc
+
+
+@router.delete("/gamers/{gamer_id}/wishlist/{wish_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_wish(gamer_id: int, wish_id: int, session: SessionDep):
+    try:
+        await run_in_session(session, wishes.delete_wish, gamer_id, wish_id)
+    except wishes.WishNotFoundError as exc:
+        raise HTTPException(status_code=404) from exc
+
+
+@router.get("/gamers/{gamer_id}/matches", response_model=list[Match])
+async def get_matches(
+    gamer_id: int, 
+    session: SessionDep,
+    conditional: ConditionalDep,
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = DEFAULT_LIMIT,
+):
+    await conditional.check_tables(session, "gamer", "game", "wish")
     try:
-        gamer = gamers.get_gamer(session, gamer_id)
+        matches = await run_in_session(session, wishes.get_matches, gamer_id, limit)
     except gamers.GamerNotFoundError as exc:
         raise HTTPException(status_code=404) from exc
-    return gamer.games
+    return [
+        {"gamer": gamer, "they_offer": they_offer, "i_offer": i_offer} 
+        for gamer, they_offer, i_offer in matches
+    ]
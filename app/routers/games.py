@@ -1,50 +1,172 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Annotated, Any
 
+from fastapi import APIRouter, Body, Header, HTTPException, Query, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+
+from app.cache import GAMES, cache, game_key, to_cached
 import app.crud.gamers as gamers
 import app.crud.games as games
-from app.dependencies.database import SessionDep
-from app.schemas.game import Game, GameCreate, GameUpdate
+from app.crud.versions import VersionMismatchError
+from app.dependencies.database import SessionDep, run_in_session
+from app.dependencies.etags import ConditionalDep, match_versions, row_etag
+from app.dependencies.pagination import DEFAULT_LIMIT, MAX_LIMIT, PaginationDep
+from app.imports import ImportFormatError, guess_format, read_records
+from app.responses import ExportFormat, NDJSONResponse, RowsJSONResponse, export_response, ndjson_lines
+from app.schemas.bulk import BulkResult, ImportResult, bulk_errors, bulk_result, validate_items
+from app.schemas.game import Game, GameBulkUpdate, GameCreate, GameUpdate
+from app.search import MIN_QUERY_LENGTH
 
 
 router = APIRouter()
 
 
 @router.post("/games", response_model=Game)
-def create_game(game: GameCreate, session: SessionDep):
+async def create_game(game: GameCreate, session: SessionDep):
     try:
-        return games.create_game(session, game)
+        return await run_in_session(session, games.create_game, game)
     except gamers.GamerNotFoundError as exc:
         raise HTTPException(status_code=422) from exc
 
 
 @router.get("/games", response_model=list[Game]) 
-def get_games(session: SessionDep, only_available: bool = False):
-    if only_available:
-        return games.get_available_games(session)
-    return games.get_games(session)
+async def get_games(
+    response: Response,
+    session: SessionDep,
+    pagination: PaginationDep,
+    conditional: ConditionalDep,
+    only_available: bool = False,
+    stream: bool = False,
+):
+    etag = await conditional.check_tables(session, "game")
+    if stream:
+        chunks = games.stream_games(session, only_available)
+        return conditional.tag(NDJSONResponse(ndjson_lines(chunks, Game)))
+
+    async def load():
+        get = games.get_available_games if only_available else games.get_games
+        return to_cached(Game, await run_in_session(session, get, pagination.limit, pagination.after))
+
+    key = cache.list_key(GAMES, only_available, pagination.limit, pagination.after)
+    items = await cache.get_or_load(key, load, etag)
+    pagination.set_next_cursor(response, items)
+    return RowsJSONResponse(items, headers=response.headers)
+
+
+@router.post("/games/bulk", response_model=BulkResult[Game])
+async def create_games(items: list[dict[str, Any]], session: SessionDep):
+    valid, invalid = validate_items(items, GameCreate)
+    try:
+        created, errors = await run_in_session(session, games.create_games, valid)
+    except gamers.GamerNotFoundError as exc:
+        raise HTTPException(status_code=422) from exc
+    return bulk_result(created, invalid, errors)
+
+
+@router.patch("/games/bulk", response_model=BulkResult[Game])
+async def update_games(items: list[dict[str, Any]], session: SessionDep):
+    valid, invalid = validate_items(items, GameBulkUpdate)
+    try:
+        updated, errors = await run_in_session(session, games.update_games, valid)
+    except games.GameUnavailableError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return bulk_result(updated, invalid, errors)
+
+
+@router.delete("/games/bulk", response_model=BulkResult[int])
+async def delete_games(game_ids: Annotated[list[int], Body()], session: SessionDep):
+    deleted, errors = await run_in_session(session, games.delete_games, game_ids)
+    return bulk_result(deleted, errors)
+
+
+@router.get("/games/search", response_model=list[Game])
+async def search_games(
+    session: SessionDep,
+    conditional: ConditionalDep,
+    q: Annotated[str, Query(min_length=MIN_QUERY_LENGTH)],
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = DEFAULT_LIMIT,
+    offset: Annotated[int, Query(ge=0)] = 0,
+):
+    await conditional.check_tables(session, "game")
+    return await run_in_session(session, games.search_games, q, limit, offset)
+
+
+@router.get("/games/export", response_class=StreamingResponse)
+async def export_games(
+    session: SessionDep,
+    conditional: ConditionalDep,
+    format: ExportFormat = ExportFormat.CSV,
+    only_available: bool = False,
+):
+    await conditional.check_tables(session, "game")
+    chunks = games.stream_games(session, only_available)
+    return conditional.tag(export_response(chunks, Game, format, "games"))
+
+
+@router.post("/games/import", response_model=ImportResult)
+async def import_games(
+    file: UploadFile, 
+    session: SessionDep, 
+    format: ExportFormat | None = None,
+):
+    format = format or guess_format(file.filename, file.content_type)
+    try:
+        created, errors = await run_in_session(
+            session, games.import_games, read_records(file.file, format)
+        )
+    except gamers.GamerNotFoundError as exc:
+        raise HTTPException(status_code=422) from exc
+    except ImportFormatError as exc:
+        # The import runs in one transaction, so nothing was imported
+        raise HTTPException(status_code=422, detail=f"{exc}; no games were imported.") from exc
+    return ImportResult(created=created, errors=bulk_errors(errors))
 
 
 @router.get("/games/{game_id}", response_model=Game) 
-def get_game(game_id: int, session: SessionDep):
+async def get_game(game_id: int, session: SessionDep, conditional: ConditionalDep):
+    async def load():
+        return to_cached(Game, await run_in_session(session, games.get_game, game_id))
+
     try:
-        return games.get_game(session, game_id)
+        version = await run_in_session(session, games.get_game_version, game_id)
+        etag = conditional.check_row("game", game_id, version)
+        return await cache.get_or_load(game_key(game_id), load, etag)
     except games.GameNotFoundError as exc:
         raise HTTPException(status_code=404) from exc
     
 
 @router.patch("/games/{game_id}", response_model=Game)
-def update_game(game_id: int, params: GameUpdate, session: SessionDep):
+async def update_game(
+    game_id: int, 
+    params: GameUpdate, 
+    session: SessionDep,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
+):
+    versions = match_versions(if_match, "game", game_id)
     try:
-        return games.update_game(session, game_id, params)
+        game = await run_in_session(session, games.update_game, game_id, params, versions)
     except games.GameNotFoundError as exc:
         raise HTTPException(status_code=404) from exc
+    except games.GameUnavailableError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    except VersionMismatchError as exc:
+        raise HTTPException(status_code=412) from exc
+    response.headers["ETag"] = row_etag("game", game.id, game.version)
+    return game
     
 
 @router.delete("/games/{game_id}", status_code=status.HTTP_204_NO_CONTENT) 
-def delete_game(game_id: int, session: SessionDep):
+async def delete_game(
+    game_id: int, 
+    session: SessionDep,
+    if_match: Annotated[str | None, Header()] = None,
+):
+    versions = match_versions(if_match, "game", game_id)
     try:
-        games.delete_game(session, game_id)
+        await run_in_session(session, games.delete_game, game_id, versions)
     except games.GameNotFoundError as exc:
         raise HTTPException(status_code=404) from exc
     except games.GameUnavailableError as exc:
         raise HTTPException(status_code=422) from exc
+    except VersionMismatchError as exc:
+        raise HTTPException(status_code=412) from exc
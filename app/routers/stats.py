@@ -0,0 +1,43 @@
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query
+
+import app.crud.stats as stats
+from app.dependencies.database import SessionDep, run_in_session
+from app.dependencies.etags import ConditionalDep
+from app.dependencies.pagination import DEFAULT_LIMIT, MAX_LIMIT
+from app.schemas.stats import GamerStats, GameTotals, PlatformStats, TitleStats
+
+
+router = APIRouter()
+
+
+@router.get("/stats/games", response_model=GameTotals)
+async def get_game_totals(session: SessionDep, conditional: ConditionalDep):
+    await conditional.check_tables(session, "game", "swap")
+    return await run_in_session(session, stats.get_game_totals)
+
+
+@router.get("/stats/platforms", response_model=list[PlatformStats])
+async def get_platform_stats(session: SessionDep, conditional: ConditionalDep):
+    await conditional.check_tables(session, "game", "swap")
+    return await run_in_session(session, stats.get_platform_stats)
+
+
+@router.get("/stats/gamers/{gamer_id}", response_model=GamerStats)
+async def get_gamer_stats(gamer_id: int, session: SessionDep, conditional: ConditionalDep):
+    await conditional.check_tables(session, "gamer", "swap")
+    gamer_stats = await run_in_session(session, stats.get_gamer_stats, gamer_id)
+    if gamer_stats is None:
+        raise HTTPException(status_code=404)
+    return gamer_stats
+
+
+@router.get("/stats/most-wanted", response_model=list[TitleStats])
+async def get_most_wanted(
+    session: SessionDep,
+    conditional: ConditionalDep,
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = DEFAULT_LIMIT,
+):
+    await conditional.check_tables(session, "wish")
+    return await run_in_session(session, stats.get_most_wanted, limit)
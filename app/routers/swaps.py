@@ -1,44 +1,93 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Annotated
 
+from fastapi import APIRouter, HTTPException, Query, Response, status
+
+from app.cache import cache, swap_key, to_cached
+import app.crud.gamers as gamers
 import app.crud.swaps as swaps
-from app.dependencies.database import SessionDep
-from app.dependencies.notifications import NotificationServiceDep
+from app.dependencies.database import SessionDep, run_in_session
+from app.dependencies.etags import ConditionalDep
+from app.dependencies.fields import SwapFieldsDep
+from app.dependencies.pagination import DEFAULT_LIMIT, MAX_LIMIT, PaginationDep
+from app.responses import NDJSONResponse, RowsJSONResponse, ndjson_lines
+import app.trades as trades
 
-from app.schemas.swap import Swap, SwapCreate
+from app.schemas.swap import Swap, SwapCreate, SwapSuggestion
 
 
 router = APIRouter()
 
+SWAP_TABLES = ("swap", "game", "gamer")
+
 
 @router.post("/swaps", response_model=Swap)
-def create_swap(
-    swap: SwapCreate, 
-    session: SessionDep,
-    notification_service: NotificationServiceDep,
-    ):
+async def create_swap(swap: SwapCreate, session: SessionDep):
     try:
-        return swaps.create_swap(session, swap, notification_service)
+        return await run_in_session(session, swaps.create_swap, swap)
     except swaps.InvalidSwapError as exc:
         raise HTTPException(status_code=422, detail=str(exc)) from exc
 
 
 @router.get("/swaps", response_model=list[Swap]) 
-def get_swaps(session: SessionDep):
-    return swaps.get_swaps(session)
+async def get_swaps(
+    response: Response,
+    session: SessionDep,
+    pagination: PaginationDep,
+    conditional: ConditionalDep,
+    selection: SwapFieldsDep,
+    stream: bool = False,
+):
+    await conditional.check_tables(session, *SWAP_TABLES)
+    if stream:
+        chunks = swaps.stream_swaps(session)
+        return conditional.tag(NDJSONResponse(ndjson_lines(chunks, Swap, selection.fields)))
+    items = await run_in_session(
+        session, swaps.get_swaps, pagination.limit, pagination.after, selection.fields
+    )
+    pagination.set_next_cursor(response, items)
+    return RowsJSONResponse(items, headers=response.headers)
+
+
+@router.get("/swaps/suggestions", response_model=list[SwapSuggestion])
+async def get_swap_suggestions(
+    session: SessionDep,
+    conditional: ConditionalDep,
+    gamer_id: int | None = None,
+    max_length: Annotated[int, Query(ge=3, le=6)] = 4,
+    limit: Annotated[int, Query(ge=1, le=MAX_LIMIT)] = DEFAULT_LIMIT,
+):
+    # Served from the process's warm trade graph, so tagged by its state: the
+    # tables may have moved on before it caught up
+    if gamer_id is not None:
+        try:
+            await run_in_session(session, gamers.get_gamer_version, gamer_id)
+        except gamers.GamerNotFoundError as exc:
+            raise HTTPException(status_code=404) from exc
+    conditional.check_state(await trades.get_trade_graph_state(session))
+    suggestions = await trades.get_swap_suggestions(session, max_length, limit, gamer_id)
+    return [
+        {"gamer_ids": [leg.receiver_id for leg in legs], "legs": legs}
+        for legs in suggestions
+    ]
 
 
 @router.get("/swaps/{swap_id}", response_model=Swap) 
-def get_swap(swap_id: int, session: SessionDep):
+async def get_swap(swap_id: int, session: SessionDep, conditional: ConditionalDep):
+    async def load():
+        return to_cached(Swap, await run_in_session(session, swaps.get_swap, swap_id))
+
+    # A swap embeds its gamers and games, so it is tagged by their row versions
     try:
-        return swaps.get_swap(session, swap_id)
+        versions = await run_in_session(session, swaps.get_swap_versions, swap_id)
+        etag = conditional.check_rows("swap", swap_id, versions)
+        return await cache.get_or_load(swap_key(swap_id), load, etag)
     except swaps.SwapNotFoundError as exc:
         raise HTTPException(status_code=404) from exc
     
 
 @router.delete("/swaps/{swap_id}", status_code=status.HTTP_204_NO_CONTENT) 
-def delete_swap(swap_id: int, session: SessionDep):
+async def delete_swap(swap_id: int, session: SessionDep):
     try:
-        swaps.delete_swap(session, swap_id)
+        await run_in_session(session, swaps.delete_swap, swap_id)
     except swaps.SwapNotFoundError as exc:
         raise HTTPException(status_code=404) from exc
-    
\ No newline at end of file
@@ -0,0 +1,49 @@
+from collections.abc import Sequence
+from typing import Any, Generic, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+
+T = TypeVar("T")
+S = TypeVar("S", bound=BaseModel)
+
+
+class BulkError(BaseModel):
+    index: int
+    detail: str
+
+
+class BulkResult(BaseModel, Generic[T]):
+    items: list[T] = []
+    errors: list[BulkError] = []
+
+
+class ImportResult(BaseModel):
+    created: int = 0
+    errors: list[BulkError] = []
+
+
+def validate_items(
+        items: Sequence[Any], 
+        schema: type[S], 
+        start: int = 0,
+    ) -> tuple[dict[int, S], dict[int, str]]:
+    # Validate each item on its own, so one bad item does not reject the whole batch
+    valid, errors = {}, {}
+    for index, item in enumerate(items, start):
+        try:
+            valid[index] = schema.model_validate(item)
+        except ValidationError as exc:
+            errors[index] = "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors()
+            )
+    return valid, errors
+
+
+def bulk_errors(*errors: dict[int, str]) -> list[BulkError]:
+    merged = {index: detail for batch in errors for index, detail in batch.items()}
+    return [BulkError(index=index, detail=detail) for index, detail in sorted(merged.items())]
+
+
+def bulk_result(items: Sequence[Any], *errors: dict[int, str]) -> dict[str, Any]:
+    return {"items": items, "errors": bulk_errors(*errors)}
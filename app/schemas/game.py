@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 
 
 class GameBase(BaseModel):
@@ -15,6 +15,18 @@ class GameUpdate(BaseModel):
     title: str | None = None
     platform: str | None = None
 
+    @field_validator("title", "platform")
+    @classmethod
+    def not_null(cls, value: str | None) -> str:
+        # Leave a field out to keep it; null would clear a required column
+        if value is None:
+            raise ValueError("may be omitted, but not null")
+        return value
+
+
+class GameBulkUpdate(GameUpdate):
+    id: int
+
 
 class Game(GameBase):
     id: int
@@ -0,0 +1,26 @@
+from pydantic import BaseModel, computed_field
+
+
+class GameTotals(BaseModel):
+    games: int
+    available: int
+
+    @computed_field
+    @property
+    def in_swap(self) -> int:
+        return self.games - self.available
+
+
+class PlatformStats(GameTotals):
+    platform: str
+
+
+class GamerStats(BaseModel):
+    gamer_id: int
+    swaps: int
+
+
+class TitleStats(BaseModel):
+    title: str
+    platform: str
+    wishes: int
@@ -28,3 +28,15 @@ class Swap(BaseModel):
     proposer: Gamer
     acceptor: Gamer
     games: list[Game]
+
+
+class SuggestionLeg(BaseModel):
+    receiver_id: int
+    giver_id: int
+    title: str
+    platform: str
+
+
+class SwapSuggestion(BaseModel):
+    gamer_ids: list[int]
+    legs: list[SuggestionLeg]
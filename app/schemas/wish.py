@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+
+from app.schemas.gamer import Gamer
+
+
+class WishBase(BaseModel):
+    title: str
+    platform: str
+
+
+class WishCreate(WishBase):
+    pass
+
+
+class Wish(WishBase):
+    id: int
+    gamer_id: int
+
+
+class Match(BaseModel):
+    gamer: Gamer
+    they_offer: int
+    i_offer: int
@@ -0,0 +1,95 @@
+import re
+
+from sqlalchemy import Connection, Select, column, event, false, func, inspect, literal_column, select, table
+
+from app.models import Game
+
+
+# SQLite: an external-content FTS5 table over game titles with the trigram 
+# tokenizer, kept in sync with `game` by triggers. Matching any trigram of the
+# query tolerates typos, and the bm25 rank puts titles sharing more trigrams first.
+SQLITE_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS game_fts USING fts5(
+        title, content='game', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS game_fts_insert AFTER INSERT ON game BEGIN
+        INSERT INTO game_fts(rowid, title) VALUES (new.id, new.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS game_fts_delete AFTER DELETE ON game BEGIN
+        INSERT INTO game_fts(game_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS game_fts_update AFTER UPDATE OF title ON game BEGIN
+        INSERT INTO game_fts(game_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO game_fts(rowid, title) VALUES (new.id, new.title);
+    END""",
+)
+SQLITE_REBUILD = "INSERT INTO game_fts(game_fts) VALUES ('rebuild')"
+
+# Postgres: a trigram GIN index answers both similarity and ILIKE lookups.
+POSTGRESQL_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_game_title_trgm ON game USING gin (title gin_trgm_ops)",
+)
+
+MIN_QUERY_LENGTH = 3
+
+game_fts = table("game_fts", column("rowid"), column("rank"))
+
+
+def install(connection: Connection) -> None:
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        rebuild = not inspect(connection).has_table("game_fts")
+        for statement in SQLITE_DDL:
+            connection.exec_driver_sql(statement)
+        if rebuild:
+            connection.exec_driver_sql(SQLITE_REBUILD)
+    elif dialect == "postgresql":
+        for statement in POSTGRESQL_DDL:
+            connection.exec_driver_sql(statement)
+
+
+def drop(connection: Connection) -> None:
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS game_fts")
+
+
+event.listen(Game.__table__, "after_create", lambda target, connection, **kw: install(connection))
+event.listen(Game.__table__, "before_drop", lambda target, connection, **kw: drop(connection))
+
+
+def trigrams(query: str) -> list[str]:
+    grams = []
+    for word in re.findall(r"\w+", query.lower()):
+        for i in range(len(word) - MIN_QUERY_LENGTH + 1):
+            gram = word[i:i + MIN_QUERY_LENGTH]
+            if gram not in grams:
+                grams.append(gram)
+    return grams
+
+
+def like_escaped(query: str) -> str:
+    # The query is matched literally: its own % and _ are not wildcards
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_statement(dialect: str, query: str) -> Select:
+    if dialect == "postgresql":
+        similarity = func.similarity(Game.title, query)
+        contains = Game.title.ilike(f"%{like_escaped(query)}%", escape="\\")
+        return (
+            select(Game)
+            .where(Game.title.op("%")(query) | contains)
+            .order_by(similarity.desc(), Game.id)
+        )
+
+    grams = trigrams(query)
+    if not grams:
+        return select(Game).where(false())
+    match = " OR ".join(f'"{gram}"' for gram in grams)
+    return (
+        select(Game)
+        .join(game_fts, game_fts.c.rowid == Game.id)
+        .where(literal_column("game_fts").op("MATCH")(match))
+        .order_by(game_fts.c.rank, Game.id)
+    )
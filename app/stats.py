@@ -0,0 +1,47 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import app.crud.stats as stats
+from app.config import settings
+from app.dependencies.database import background_session, close_session, run_in_session
+from app.jobs import PeriodicJob
+
+
+@dataclass
+class StatsReconciler(PeriodicJob):
+    """Rebuilds the /stats counters from the base tables every `interval` seconds.
+
+    The write paths keep the counters exact; this bounds how long any drift can
+    last and fills them in for databases created before they existed, which is
+    why the first run happens at startup.
+    """
+    session_factory: Callable[[], Session | AsyncSession]
+    interval: float = 60 * 60
+
+    runs: int = 0
+
+    async def run_once(self) -> float:
+        await self.reconcile()
+        return self.interval
+
+    @property
+    def retry_delay(self) -> float:
+        return self.interval
+
+    async def reconcile(self) -> None:
+        session = self.session_factory()
+        try:
+            await run_in_session(session, stats.reconcile_stats)
+            self.runs += 1
+        finally:
+            await close_session(session)
+
+
+def create_reconciler() -> StatsReconciler:
+    return StatsReconciler(
+        session_factory=background_session,
+        interval=settings.stats_reconcile_interval,
+    )
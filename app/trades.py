@@ -0,0 +1,97 @@
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import app.crud.swaps as swaps
+from app.config import settings
+from app.crud.pagination import Chunks
+from app.cycles import Leg, trade_graph
+from app.dependencies.database import background_session, close_session, run_in_session
+from app.jobs import PeriodicJob
+
+
+# Building and searching the warm trade graph is CPU-bound: it runs in the
+# threadpool, never on the event loop (nor through AsyncSession.run_sync)
+
+async def _collect(chunks: Chunks) -> list[Any]:
+    # Async streams give the loop back between chunks; sync ones are read in a worker
+    if isinstance(chunks, AsyncIterator):
+        return [row async for chunk in chunks for row in chunk]
+    return await run_in_threadpool(lambda: [row for chunk in chunks for row in chunk])
+
+
+async def load_trade_graph(session: Session | AsyncSession) -> None:
+    # Versions first: a write committing while the rows are read bumps them
+    # again, so the refresher reloads rather than missing it
+    versions = await run_in_session(session, swaps.get_trade_graph_versions)
+    games = await _collect(swaps.stream_trade_graph_games(session))
+    wishes = await _collect(swaps.stream_trade_graph_wishes(session))
+    await run_in_threadpool(trade_graph.load, versions, games, wishes)
+
+
+async def refresh_trade_graph(session: Session | AsyncSession) -> bool:
+    """Reload the trade graph when its tables changed since it was loaded."""
+    if await run_in_session(session, swaps.get_trade_graph_versions) == trade_graph.versions:
+        return False
+    await load_trade_graph(session)
+    return True
+
+
+async def get_trade_graph_state(session: Session | AsyncSession) -> tuple[str, int]:
+    """The state of the warm trade graph, loaded if need be, for ETags."""
+    if not trade_graph.loaded:
+        await load_trade_graph(session)
+    return trade_graph.state
+
+
+async def get_swap_suggestions(
+        session: Session | AsyncSession,
+        max_length: int,
+        limit: int,
+        gamer_id: int | None = None,
+    ) -> list[list[Leg]]:
+    # Read from the warm graph; the database is only read when it was not loaded yet
+    if not trade_graph.loaded:
+        await load_trade_graph(session)
+    return await run_in_threadpool(trade_graph.suggestions, max_length, limit, gamer_id)
+
+
+@dataclass
+class TradeGraphRefresher(PeriodicJob):
+    """Loads the warm trade graph at startup and reloads it every `interval`
+    seconds when its tables changed since.
+
+    Writes made by this process update the graph as they commit; the reloads
+    pick up the writes of other processes (workers) sharing the database.
+    """
+    session_factory: Callable[[], Session | AsyncSession]
+    interval: float = 60.0
+
+    reloads: int = 0
+
+    async def run_once(self) -> float:
+        await self.refresh()
+        return self.interval
+
+    @property
+    def retry_delay(self) -> float:
+        return self.interval
+
+    async def refresh(self) -> None:
+        session = self.session_factory()
+        try:
+            if await refresh_trade_graph(session):
+                self.reloads += 1
+        finally:
+            await close_session(session)
+
+
+def create_refresher() -> TradeGraphRefresher:
+    return TradeGraphRefresher(
+        session_factory=background_session,
+        interval=settings.trade_graph_refresh_interval,
+    )
@@ -0,0 +1,59 @@
+"""Benchmark the swap cycle engine on a synthetic catalogue.
+
+    python -m benchmarks.bench_cycles --gamers 100000 --games 1000000
+"""
+import argparse
+import random
+import time
+
+from app.cycles import build_trade_graph
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gamers", type=int, default=100_000)
+    parser.add_argument("--games", type=int, default=1_000_000)
+    parser.add_argument("--wishes-per-gamer", type=int, default=5)
+    parser.add_argument("--titles", type=int, default=200_000)
+    parser.add_argument("--max-length", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keys = [(f"title{n}", f"platform{n % 10}") for n in range(args.titles)]
+    games = [(rng.randrange(args.gamers), *rng.choice(keys)) for _ in range(args.games)]
+    wishes = [
+        (gamer_id, *rng.choice(keys))
+        for gamer_id in range(args.gamers)
+        for _ in range(args.wishes_per_gamer)
+    ]
+
+    graph = timed(f"build ({args.games} games, {len(wishes)} wishes)", lambda: build_trade_graph(games, wishes))
+    cycles = timed("global cycles (limit 100)", lambda: graph.cycles(args.max_length, limit=100))
+    print(f"{'':<40} {len(cycles)} cycles")
+
+    gamer_ids = [rng.randrange(args.gamers) for _ in range(args.queries)]
+    found = timed(
+        f"cycles through {args.queries} gamers",
+        lambda: sum(len(graph.cycles(args.max_length, gamer_id=gamer_id, limit=10)) for gamer_id in gamer_ids),
+    )
+    print(f"{'':<40} {found} cycles")
+
+    changes = [(rng.randrange(args.gamers), rng.choice(keys)) for _ in range(10_000)]
+    def update() -> None:
+        for gamer_id, key in changes:
+            graph.add_game(gamer_id, key)
+            graph.remove_game(gamer_id, key)
+    timed("10k single-game updates (add + remove)", update)
+
+
+if __name__ == "__main__":
+    main()
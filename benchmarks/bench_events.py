@@ -0,0 +1,88 @@
+"""Benchmark idle /events subscribers on a single uvicorn worker.
+
+Opens `--subscribers` SSE connections to an in-process server backed by a
+temporary database, then creates one game and times its delivery to everyone.
+
+    python -m benchmarks.bench_events --subscribers 2000
+"""
+import argparse
+import asyncio
+import os
+import resource
+import tempfile
+import time
+
+
+def rss_mib() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() / 2**20
+
+
+async def run(subscribers: int, port: int) -> None:
+    import httpx
+    import uvicorn
+
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        gamer = (await client.post("/gamers", json={"name": "bench", "email": "bench@example.com"})).json()
+
+        connected, received = asyncio.Event(), asyncio.Event()
+        opened, delivered = 0, 0
+
+        async def subscribe() -> None:
+            nonlocal opened, delivered
+            params = {"event": "game_created", "platform": "SEGA Mega Drive"}
+            async with client.stream("GET", "/events", params=params) as response:
+                opened += 1
+                if opened == subscribers:
+                    connected.set()
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        delivered += 1
+                        if delivered == subscribers:
+                            received.set()
+                        return
+
+        rss_before = rss_mib()
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(subscribe()) for _ in range(subscribers)]
+        await connected.wait()
+        while app.state.event_broker.subscribers < subscribers:
+            await asyncio.sleep(0.01)
+        print(f"{f'connect {subscribers} subscribers':<40} {time.perf_counter() - start:8.3f}s")
+        print(f"{'RSS per idle subscriber (client + server)':<40} {(rss_mib() - rss_before) * 1024 / subscribers:8.1f}KiB")
+
+        start = time.perf_counter()
+        game = {"title": "Ristar", "platform": "SEGA Mega Drive", "gamer_id": gamer["id"]}
+        await client.post("/games", json=game)
+        await received.wait()
+        print(f"{'create game -> delivered to all':<40} {time.perf_counter() - start:8.3f}s")
+        await asyncio.gather(*tasks)
+
+    server.should_exit = True
+    await serving
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=2_000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    # Settings are read on import, so point the app at a scratch database first
+    directory = tempfile.mkdtemp()
+    os.environ.setdefault("GAMESWAP_DATABASE_URL", f"sqlite:///{directory}/bench.db")
+    os.environ.setdefault("GAMESWAP_OUTBOX_POLL_INTERVAL", "0.05")
+    asyncio.run(run(args.subscribers, args.port))
+
+
+if __name__ == "__main__":
+    main()
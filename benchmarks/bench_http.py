@@ -0,0 +1,293 @@
+"""Load-test the HTTP API with a mixed read/write workload.
+
+Seeds a temporary database with `--gamers`, `--games-per-gamer` and `--swaps`,
+then replays the same seeded request mix against the app in-process (ASGI
+transport) and over a local uvicorn server, reporting req/s and latency
+percentiles per operation.
+
+    python -m benchmarks.bench_http --requests 2000 --concurrency 16
+    python -m benchmarks.bench_http --save-baseline     # after an intended change
+    python -m benchmarks.bench_http --check             # exit 1 on regression
+
+The baseline (benchmarks/baseline_http.json) only compares runs on the same
+machine with the same volumes; re-record it when either changes.
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+import contextlib
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+import random
+import tempfile
+import time
+from typing import Any
+
+
+BASELINE = Path(__file__).with_name("baseline_http.json")
+PLATFORMS = ("SEGA Mega Drive", "Nintendo GAME BOY", "Super Nintendo", "PlayStation", "Neo Geo")
+
+# Operation -> weight, modelled on production traffic: mostly catalogue reads
+WORKLOAD = {
+    "list games": 35,
+    "list available games": 10,
+    "get game": 15,
+    "gamers by title": 15,
+    "gamers by platform": 10,
+    "stats by platform": 5,
+    "create swap": 10,
+}
+
+
+@dataclass
+class Request:
+    operation: str
+    method: str
+    url: str
+    json: Any = None
+
+
+@dataclass
+class Catalogue:
+    titles: list[str]
+    game_ids: list[int]
+    # gamer id -> available games as (id, title, platform), consumed by swaps
+    available: dict[int, list[tuple[int, str, str]]]
+
+
+def seed(gamers: int, games_per_gamer: int, swaps: int, rng: random.Random) -> Catalogue:
+    from sqlalchemy import insert, select, update
+
+    import app.crud.stats as stats
+    from app.dependencies.database import configured_session, init_db
+    from app.models import Game, Gamer, Swap
+
+    init_db()
+    titles = [f"Title {n}" for n in range(max(gamers * games_per_gamer // 20, 1))]
+    with configured_session() as session:
+        session.execute(insert(Gamer), [
+            {"name": f"gamer{n}", "email": f"gamer{n}@retro.com"} for n in range(gamers)
+        ])
+        gamer_ids = session.execute(select(Gamer.id)).scalars().all()
+        session.execute(insert(Game), [
+            {"title": rng.choice(titles), "platform": rng.choice(PLATFORMS), "gamer_id": gamer_id}
+            for gamer_id in gamer_ids
+            for _ in range(games_per_gamer)
+        ])
+        games = session.execute(select(Game.id, Game.title, Game.platform, Game.gamer_id)).all()
+        available = defaultdict(list)
+        for game in games:
+            available[game.gamer_id].append((game.id, game.title, game.platform))
+
+        for _ in range(swaps):
+            picked = _pick_swap(available, rng)
+            if picked is None:
+                break
+            (proposer_id, proposer_game), (acceptor_id, acceptor_game) = picked
+            swap_id = session.execute(
+                insert(Swap).values(proposer_id=proposer_id, acceptor_id=acceptor_id).returning(Swap.id)
+            ).scalar_one()
+            session.execute(
+                update(Game).where(Game.id.in_((proposer_game[0], acceptor_game[0]))).values(swap_id=swap_id)
+            )
+        session.commit()
+        stats.reconcile_stats(session)
+    return Catalogue(titles, [game.id for game in games], available)
+
+
+def _pick_swap(available: dict[int, list], rng: random.Random):
+    # Two gamers with an available game each, not sharing title and platform
+    gamers = [gamer_id for gamer_id, games in available.items() if games]
+    if len(gamers) < 2:
+        return None
+    proposer_id, acceptor_id = rng.sample(gamers, 2)
+    proposer_game = available[proposer_id].pop(rng.randrange(len(available[proposer_id])))
+    acceptor_game = available[acceptor_id].pop(rng.randrange(len(available[acceptor_id])))
+    if proposer_game[1:] == acceptor_game[1:]:
+        available[acceptor_id].append(acceptor_game)
+        return _pick_swap(available, rng)
+    return (proposer_id, proposer_game), (acceptor_id, acceptor_game)
+
+
+def plan(catalogue: Catalogue, requests: int, rng: random.Random) -> list[Request]:
+    operations = rng.choices(list(WORKLOAD), weights=list(WORKLOAD.values()), k=requests)
+    planned = []
+    for operation in operations:
+        if operation == "list games":
+            planned.append(Request(operation, "GET", f"/games?after={rng.choice(catalogue.game_ids)}"))
+        elif operation == "list available games":
+            planned.append(Request(operation, "GET", "/games?only_available=true"))
+        elif operation == "get game":
+            planned.append(Request(operation, "GET", f"/games/{rng.choice(catalogue.game_ids)}"))
+        elif operation == "gamers by title":
+            planned.append(Request(operation, "GET", f"/gamers?title={rng.choice(catalogue.titles)}"))
+        elif operation == "gamers by platform":
+            planned.append(Request(operation, "GET", f"/gamers?platform={rng.choice(PLATFORMS)}"))
+        elif operation == "stats by platform":
+            planned.append(Request(operation, "GET", "/stats/platforms"))
+        elif (picked := _pick_swap(catalogue.available, rng)) is not None:
+            (proposer_id, proposer_game), (acceptor_id, acceptor_game) = picked
+            planned.append(Request(operation, "POST", "/swaps", {
+                "proposer": {"id": proposer_id, "game_ids": [proposer_game[0]]},
+                "acceptor": {"id": acceptor_id, "game_ids": [acceptor_game[0]]},
+            }))
+    return planned
+
+
+async def drive(client, requests: list[Request], concurrency: int) -> dict[str, Any]:
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    pending = iter(requests)
+
+    async def worker() -> None:
+        for request in pending:
+            start = time.perf_counter()
+            response = await client.request(request.method, request.url, json=request.json)
+            latencies[request.operation].append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors[request.operation] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    results = {
+        operation: summarize(samples, elapsed, errors[operation])
+        for operation, samples in sorted(latencies.items())
+    }
+    results["total"] = summarize(
+        [sample for samples in latencies.values() for sample in samples], elapsed, sum(errors.values())
+    )
+    return results
+
+
+def summarize(samples: list[float], elapsed: float, errors: int) -> dict[str, float]:
+    samples = sorted(samples)
+
+    def percentile(q: float) -> float:
+        return samples[min(int(q * len(samples)), len(samples) - 1)] * 1000
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(0.50), 2),
+        "p95_ms": round(percentile(0.95), 2),
+        "p99_ms": round(percentile(0.99), 2),
+    }
+
+
+async def run_in_process(requests: list[Request], concurrency: int) -> dict[str, Any]:
+    import httpx
+
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await drive(client, requests, concurrency)
+
+
+async def run_uvicorn(requests: list[Request], concurrency: int, port: int) -> dict[str, Any]:
+    import httpx
+    import uvicorn
+
+    from app.main import app
+
+    # Server and load generator share one event loop, so absolute numbers are
+    # pessimistic; compare them with runs of this same harness
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            return await drive(client, requests, concurrency)
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def report(mode: str, results: dict[str, Any]) -> None:
+    print(f"\n{mode}")
+    print(f"{'operation':<24} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for operation, result in results.items():
+        print(
+            f"{operation:<24} {result['requests']:>8} {result['errors']:>6} {result['rps']:>8} "
+            f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8}"
+        )
+
+
+def regressions(results: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    found = []
+    for mode, operations in results.items():
+        for operation, result in operations.items():
+            expected = baseline.get(mode, {}).get(operation)
+            if expected is None:
+                continue
+            if result["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+                found.append(f"{mode} / {operation}: p95 {result['p95_ms']}ms vs {expected['p95_ms']}ms")
+            if operation == "total" and result["rps"] < expected["rps"] * (1 - tolerance):
+                found.append(f"{mode} / total: {result['rps']} req/s vs {expected['rps']} req/s")
+    return found
+
+
+def benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    rng = random.Random(args.seed)
+    catalogue = seed(args.gamers, args.games_per_gamer, args.swaps, rng)
+    results = {}
+    # The default notifier prints every swap; keep that out of the report
+    with open(os.devnull, "w") as devnull:
+        if args.mode in ("in-process", "both"):
+            requests = plan(catalogue, args.requests, rng)
+            with contextlib.redirect_stdout(devnull):
+                results["in-process"] = asyncio.run(run_in_process(requests, args.concurrency))
+            report("in-process", results["in-process"])
+        if args.mode in ("uvicorn", "both"):
+            requests = plan(catalogue, args.requests, rng)
+            with contextlib.redirect_stdout(devnull):
+                results["uvicorn"] = asyncio.run(run_uvicorn(requests, args.concurrency, args.port))
+            report("uvicorn", results["uvicorn"])
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gamers", type=int, default=1_000)
+    parser.add_argument("--games-per-gamer", type=int, default=10)
+    parser.add_argument("--swaps", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mode", choices=("in-process", "uvicorn", "both"), default="both")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit 1 when slower than the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    # Settings are read on import, so point the app at a scratch database first.
+    # Always: seeding writes to it, so a database URL from the environment is
+    # never used (nor is it left behind)
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["GAMESWAP_DATABASE_URL"] = f"sqlite:///{directory}/bench.db"
+        os.environ["GAMESWAP_ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{directory}/bench.db"
+        results = benchmark(args)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nSaved baseline to {args.baseline}")
+    elif args.check:
+        found = regressions(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            raise SystemExit(1)
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Benchmark notification service resolution and posting.
+
+    python -m benchmarks.bench_notifications --requests 100000
+"""
+import argparse
+from types import SimpleNamespace
+
+from app.dependencies.notifications import (
+    Event,
+    Notification,
+    NotificationService,
+    create_notification_service,
+)
+from benchmarks.bench_cycles import timed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100_000)
+    args = parser.parse_args()
+    n = args.requests
+
+    def per_request() -> None:
+        # What every create request paid before: build and subscribe a new service
+        for _ in range(n):
+            create_notification_service()
+
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(
+        notification_service=create_notification_service()
+    )))
+    def app_scoped() -> None:
+        for _ in range(n):
+            request.app.state.notification_service
+
+    timed(f"{n} x build service per request", per_request)
+    timed(f"{n} x resolve app-scoped service", app_scoped)
+
+    notification = Notification(event=Event.GAMER_CREATED, message="Welcome!")
+    for label, patterns in (
+        ("exact", [Event.GAMER_CREATED] * 2),
+        ("wildcards", ["*", "gamer_*", Event.GAMER_CREATED]),
+    ):
+        service = NotificationService()
+        for priority, pattern in enumerate(patterns):
+            service.subscribe(pattern, lambda _: None, priority=priority)
+        timed(f"{n} x post ({label}, {len(patterns)} handlers)", lambda: [service.post(notification) for _ in range(n)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark CPU per list response: ORM + response_model validation vs plain rows.
+
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import json
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+import app.crud.games as games
+import app.crud.swaps as swaps
+from app.models import Base, Game, Gamer, Swap
+from app.responses import RowsJSONResponse
+from app.schemas.game import Game as GameSchema
+from app.schemas.swap import Swap as SwapSchema
+
+
+def cpu_timed(label: str, fn, repeat: int):
+    start = time.process_time()
+    for _ in range(repeat):
+        result = fn()
+    print(f"{label:<40} {(time.process_time() - start) / repeat * 1000:8.1f}ms cpu")
+    return result
+
+
+def populate(session: Session, rows: int) -> None:
+    gamers = [Gamer(name=f"gamer{n}", email=f"gamer{n}@retro.com") for n in range(rows * 2)]
+    session.add_all(gamers)
+    session.flush()
+    for n in range(rows):
+        proposer, acceptor = gamers[2 * n], gamers[2 * n + 1]
+        swap = Swap(proposer_id=proposer.id, acceptor_id=acceptor.id)
+        swap.games = [
+            Game(title=f"title{n}", platform="SEGA Mega Drive", gamer_id=proposer.id),
+            Game(title=f"title{n}", platform="Nintendo GAME BOY", gamer_id=acceptor.id),
+        ]
+        session.add(swap)
+    session.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    n, repeat = args.rows, args.repeat
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        populate(session, n)
+
+    game_list = TypeAdapter(list[GameSchema])
+    swap_list = TypeAdapter(list[SwapSchema])
+
+    def response_model(adapter: TypeAdapter, load):
+        # What FastAPI does with a returned list: validate, dump to JSON-able, json.dumps
+        def render() -> bytes:
+            with Session(engine) as session:
+                items = adapter.validate_python(load(session), from_attributes=True)
+                return json.dumps(adapter.dump_python(items, mode="json")).encode()
+        return render
+
+    def rows(load):
+        def render() -> bytes:
+            with Session(engine) as session:
+                return RowsJSONResponse(load(session)).body
+        return render
+
+    orm_games = lambda session: session.scalars(select(Game).order_by(Game.id).limit(n)).all()
+    orm_swaps = lambda session: session.scalars(
+        select(Swap)
+        .options(joinedload(Swap.proposer), joinedload(Swap.acceptor), selectinload(Swap.games))
+        .order_by(Swap.id).limit(n)
+    ).unique().all()
+
+    before = cpu_timed(f"{n} games, ORM + response_model", response_model(game_list, orm_games), repeat)
+    after = cpu_timed(f"{n} games, rows + RowsJSONResponse", rows(lambda s: games.get_games(s, n)), repeat)
+    assert json.loads(before) == json.loads(after)
+
+    before = cpu_timed(f"{n} swaps, ORM + response_model", response_model(swap_list, orm_swaps), repeat)
+    after = cpu_timed(f"{n} swaps, rows + RowsJSONResponse", rows(lambda s: swaps.get_swaps(s, n)), repeat)
+    assert json.loads(before) == json.loads(after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark validating swaps of hundreds of games: ORM appends and create_swap.
+
+    python -m benchmarks.bench_swap_validation --games 100 300 1000
+"""
+import argparse
+import time
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+import app.crud.swaps as swaps
+from app.models import Base, Game, Gamer, Swap
+from app.schemas.swap import GamerWithGames, SwapCreate
+
+
+def cpu_timed(label: str, fn, repeat: int):
+    start = time.process_time()
+    for _ in range(repeat):
+        result = fn()
+    print(f"{label:<40} {(time.process_time() - start) / repeat * 1000:8.1f}ms cpu")
+    return result
+
+
+def populate(session: Session, games: int) -> tuple[int, int]:
+    # Each gamer owns `games` distinct titles
+    proposer = Gamer(name="Player One", email="press@start.com")
+    acceptor = Gamer(name="Player Two", email="insert@coin.com")
+    session.add_all([proposer, acceptor])
+    session.flush()
+    session.execute(insert(Game), [
+        {"title": f"title{n}", "platform": platform, "gamer_id": gamer.id}
+        for gamer, platform in ((proposer, "SEGA Mega Drive"), (acceptor, "Nintendo GAME BOY"))
+        for n in range(games)
+    ])
+    session.commit()
+    return proposer.id, acceptor.id
+
+
+def scan_for_duplicates(swap: Swap, games: list[Game]) -> None:
+    # The previous validator: every append compared the game with the whole swap
+    for game in games:
+        if any([game.title == swap_game.title and game.platform == swap_game.platform
+                for swap_game in swap.games]):
+            raise ValueError(game.id)
+        swap.games.append(game)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, nargs="+", default=[100, 300, 1000], help="games per gamer")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for n in args.games:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            proposer_id, acceptor_id = populate(session, n)
+            games = session.execute(select(Game).order_by(Game.id)).scalars().all()
+
+            def append():
+                swap = Swap(proposer_id=proposer_id, acceptor_id=acceptor_id)
+                for game in games:
+                    swap.games.append(game)
+                swap.games.clear()
+
+            def scan():
+                # The hook still runs on each append, so this is the list scan on top of it
+                swap = Swap(proposer_id=proposer_id, acceptor_id=acceptor_id)
+                scan_for_duplicates(swap, games)
+                swap.games.clear()
+
+            print(f"\n{2 * n} games per swap")
+            cpu_timed("ORM appends (set)", append, args.repeat)
+            cpu_timed("ORM appends (set + previous list scan)", scan, args.repeat)
+
+        params = SwapCreate(
+            proposer=GamerWithGames(id=proposer_id, game_ids=[game.id for game in games[:n]]),
+            acceptor=GamerWithGames(id=acceptor_id, game_ids=[game.id for game in games[n:]]),
+        )
+
+        def create():
+            with Session(engine) as session:
+                swap = swaps.create_swap(session, params)
+                swaps.delete_swap(session, swap.id)
+
+        cpu_timed("create_swap + delete_swap", create, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
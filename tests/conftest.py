@@ -1,29 +1,47 @@
-from collections.abc import Generator
+from collections.abc import Generator, Iterator
+from contextlib import contextmanager
 import pytest
 
 from fastapi.testclient import TestClient
-from sqlalchemy import StaticPool, create_engine, event
+from sqlalchemy import Engine, StaticPool, create_engine, event
 from sqlalchemy.orm import Session
 
+from app.cache import cache
+from app.cycles import trade_graph
 from app.dependencies.database import get_session
-from app.dependencies.notifications import Notification, get_notification_service
 from app.main import app
 from app.models import Base, Game, Gamer, Swap
 
 
-class NotificationServiceMock:
-    def post(self, notification: Notification) -> None:
-        pass
-    
-
-@pytest.fixture(name="session")
-def session_fixture() -> Generator[Session, None, None]:
+def create_test_engine() -> Engine:
     engine = create_engine(
         "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
     )
     event.listen(engine, 'connect', lambda c, _: c.execute('pragma foreign_keys=on'))
     Base.metadata.create_all(engine)
+    return engine
+
+
+@contextmanager
+def count_statements(session: Session) -> Iterator[list[str]]:
+    # Every statement the session's engine runs while inside the block
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
 
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(name="session")
+def session_fixture() -> Generator[Session, None, None]:
+    engine = create_test_engine()
+    # The warm trade graph belongs to the previous test's database
+    trade_graph.clear()
     with Session(engine, autocommit=False, autoflush=False) as session:
         yield session
 
@@ -33,15 +51,14 @@ def client_fixture(session: Session) -> Generator[TestClient, None, None]:
     def get_session_override():  
         return session
     
-    def get_notification_service_override():
-        return NotificationServiceMock()
-    
     app.dependency_overrides[get_session] = get_session_override  
-    app.dependency_overrides[get_notification_service] = get_notification_service_override
 
+    # Every test starts from an empty database, so nothing cached may carry over
+    cache.clear()
     client = TestClient(app)  
     yield client  
     app.dependency_overrides.clear()  
+    cache.clear()
 
 
 @pytest.fixture
@@ -0,0 +1,177 @@
+from collections.abc import Generator
+import fnmatch
+import time
+import pytest
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.cache import MISSING, LRUCache, RedisCache, cache
+from app.models import Game, Gamer, Swap
+from tests.conftest import count_statements
+
+
+class FakeRedis:
+    """The slice of the redis-py client the shared backend uses."""
+    def __init__(self) -> None:
+        self.data: dict[str, tuple[float | None, bytes]] = {}
+
+    def get(self, key: str) -> bytes | None:
+        expires, value = self.data.get(key, (None, None))
+        if expires is not None and expires < time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def set(self, key: str, value: str, px: int | None = None) -> None:
+        expires = time.monotonic() + px / 1000 if px is not None else None
+        self.data[key] = (expires, value.encode())
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        value = int(self.get(key) or 0) + 1
+        self.data[key] = (None, str(value).encode())
+        return value
+
+    def scan_iter(self, match: str):
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+
+
+@pytest.fixture(name="backend", params=["memory", "shared"], autouse=True)
+def backend_fixture(request: pytest.FixtureRequest) -> Generator[None, None, None]:
+    original = cache.backend
+    cache.backend = LRUCache() if request.param == "memory" else RedisCache(FakeRedis())
+    cache.clear()
+    yield cache.backend
+    cache.backend = original
+    cache.clear()
+
+
+def test_lru_evicts_least_recently_used() -> None:
+    lru = LRUCache(max_entries=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+
+    assert [lru.get(key) for key in "abc"] == [1, MISSING, 3]
+
+
+def test_entries_expire_after_ttl(backend) -> None:
+    backend.ttl = 0.01
+    backend.set("a", {"id": 1})
+    assert backend.get("a") == {"id": 1}
+
+    time.sleep(0.02)
+
+    assert backend.get("a") is MISSING
+
+
+def test_repeated_read_is_served_from_cache(swap: Swap, session: Session, client: TestClient) -> None:
+    swap_id = swap.id
+    first = client.get(f"/swaps/{swap_id}")
+    with count_statements(session) as statements:
+        second = client.get(f"/swaps/{swap_id}")
+
+    assert second.json() == first.json()
+    # Only the row versions for the ETag are read
+    assert len(statements) == 1 and "game.version" in statements[0]
+    assert cache.stats()["swap"] == {"hits": 1, "misses": 1}
+
+
+def test_not_found_is_not_cached(session: Session, client: TestClient) -> None:
+    assert client.get("/games/1").status_code == 404
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+    client.post("/games", json={"title": "Ristar", "platform": "SEGA Mega Drive", "gamer_id": gamer.id})
+
+    assert client.get("/games/1").status_code == 200
+
+
+def test_no_stale_reads_after_writes(swap: Swap, session: Session, client: TestClient) -> None:
+    swap_id, proposer_id, acceptor_id = swap.id, swap.proposer_id, swap.acceptor_id
+    game_id = next(game.id for game in swap.games if game.gamer_id == proposer_id)
+
+    def reads() -> dict:
+        # Each read twice, so the second one comes from the cache
+        urls = [
+            "/games", "/games?only_available=true", f"/games/{game_id}",
+            f"/gamers/{proposer_id}/games", f"/swaps/{swap_id}",
+        ]
+        for url in urls:
+            client.get(url)
+        return {url: client.get(url) for url in urls}
+
+    def assert_fresh(**expected) -> dict:
+        responses = reads()
+        for url, response in responses.items():
+            assert response.status_code == expected.get(url, 200), url
+        return {url: response.json() for url, response in responses.items()}
+
+    before = assert_fresh()
+    assert before["/games?only_available=true"] == []
+
+    client.patch(f"/gamers/{proposer_id}", json={"name": "Player Uno"})
+    after = assert_fresh()
+    assert after[f"/swaps/{swap_id}"]["proposer"]["name"] == "Player Uno"
+
+    client.patch(f"/games/{game_id}", json={"title": "Sonic 2"})
+    after = assert_fresh()
+    assert after[f"/games/{game_id}"]["title"] == "Sonic 2"
+    assert after[f"/gamers/{proposer_id}/games"][0]["title"] == "Sonic 2"
+    assert {game["title"] for game in after[f"/swaps/{swap_id}"]["games"]} >= {"Sonic 2"}
+    assert "Sonic 2" in {game["title"] for game in after["/games"]}
+
+    client.patch("/games/bulk", json=[{"id": game_id, "platform": "SEGA Game Gear"}])
+    after = assert_fresh()
+    assert after[f"/games/{game_id}"]["platform"] == "SEGA Game Gear"
+
+    assert client.delete(f"/swaps/{swap_id}").status_code == 204
+    after = assert_fresh(**{f"/swaps/{swap_id}": 404})
+    assert after[f"/games/{game_id}"]["swap_id"] is None
+    assert {game["id"] for game in after["/games?only_available=true"]} >= {game_id}
+
+    new_game = client.post(
+        "/games", json={"title": "Ristar", "platform": "SEGA Mega Drive", "gamer_id": proposer_id}
+    ).json()
+    after = assert_fresh(**{f"/swaps/{swap_id}": 404})
+    assert new_game in after[f"/gamers/{proposer_id}/games"]
+    assert new_game in after["/games"]
+
+    swap_data = {
+        "proposer": {"id": proposer_id, "game_ids": [game_id]},
+        "acceptor": {"id": acceptor_id, "game_ids": [game["id"] for game in after["/games"] if game["gamer_id"] == acceptor_id]},
+    }
+    # SQLite may hand the deleted swap's id to the new one, which must not be served stale either
+    swap_id = client.post("/swaps", json=swap_data).json()["id"]
+    after = assert_fresh()
+    assert after[f"/games/{game_id}"]["swap_id"] == swap_id
+    assert game_id in {game["id"] for game in after[f"/swaps/{swap_id}"]["games"]}
+    assert game_id not in {game["id"] for game in after["/games?only_available=true"]}
+
+    client.delete(f"/games/{new_game['id']}")
+    after = assert_fresh()
+    assert new_game not in after["/games"]
+    assert new_game not in after[f"/gamers/{proposer_id}/games"]
+
+
+def test_delete_gamer_invalidates_their_games(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+    game = Game(title="Ristar", platform="SEGA Mega Drive", gamer_id=gamer.id)
+    session.add(game)
+    session.commit()
+    gamer_id, game_id = gamer.id, game.id
+    for url in (f"/games/{game_id}", f"/gamers/{gamer_id}/games", "/games"):
+        assert client.get(url).status_code == 200
+
+    client.delete(f"/gamers/{gamer_id}")
+
+    assert client.get(f"/games/{game_id}").status_code == 404
+    assert client.get(f"/gamers/{gamer_id}/games").status_code == 404
+    assert client.get("/games").json() == []
@@ -0,0 +1,79 @@
+from app.cycles import TradeGraph, build_trade_graph
+
+
+SONIC = ("Sonic The Hedgehog", "SEGA Mega Drive")
+MARIO = ("Super Mario Land", "Nintendo GAME BOY")
+ZELDA = ("The Legend of Zelda", "NES")
+TETRIS = ("Tetris", "Nintendo GAME BOY")
+
+
+def three_way_graph() -> TradeGraph:
+    # 1 wants what 2 has, 2 wants what 3 has, 3 wants what 1 has
+    return build_trade_graph(
+        games=[(1, *SONIC), (2, *MARIO), (3, *ZELDA)],
+        wishes=[(1, *MARIO), (2, *ZELDA), (3, *SONIC)],
+    )
+
+
+def test_finds_each_cycle_once() -> None:
+    graph = three_way_graph()
+    assert graph.cycles(max_length=4) == [[1, 2, 3]]
+    assert graph.cycles(max_length=4, gamer_id=3) == [[3, 1, 2]]
+    assert [(leg.receiver_id, leg.giver_id, leg.title) for leg in graph.legs([1, 2, 3])] == [
+        (1, 2, MARIO[0]),
+        (2, 3, ZELDA[0]),
+        (3, 1, SONIC[0]),
+    ]
+
+
+def test_respects_length_bounds() -> None:
+    graph = three_way_graph()
+    graph.remove_game(3, ZELDA)
+    graph.add_game(4, ZELDA)
+    graph.add_wish(4, TETRIS)
+    graph.add_game(3, TETRIS)
+
+    # 1 <- 2 <- 4 <- 3 <- 1 has four gamers
+    assert graph.cycles(max_length=3) == []
+    assert graph.cycles(max_length=4) == [[1, 2, 4, 3]]
+
+    # Two-party swaps are left to matches
+    graph.add_wish(1, TETRIS)
+    graph.add_wish(3, SONIC)
+    assert [cycle for cycle in graph.cycles(max_length=4) if len(cycle) < 3] == []
+
+
+def test_incremental_updates() -> None:
+    graph = three_way_graph()
+    graph.add_game(2, MARIO)
+    graph.remove_game(2, MARIO)
+    assert graph.cycles(max_length=3) == [[1, 2, 3]]
+
+    graph.remove_game(2, MARIO)
+    assert graph.cycles(max_length=3) == []
+
+    graph.add_game(2, MARIO)
+    graph.remove_wish(3, SONIC)
+    assert graph.cycles(max_length=3) == []
+
+
+def test_limit() -> None:
+    graph = three_way_graph()
+    for gamer_id in (4, 5, 6):
+        graph.add_game(gamer_id, MARIO)
+        graph.add_wish(gamer_id, ZELDA)
+    assert len(graph.cycles(max_length=3)) == 4
+    assert len(graph.cycles(max_length=3, limit=2)) == 2
+
+
+def test_snapshot_keeps_its_state_under_copy_on_write() -> None:
+    graph = three_way_graph()
+    graph.copy_on_write = True
+    snapshot = graph.snapshot()
+
+    graph.remove_game(2, MARIO)
+    graph.remove_wish(3, SONIC)
+    graph.add_game(4, MARIO)
+    assert graph.cycles(max_length=3) == []
+    assert snapshot.cycles(max_length=3) == [[1, 2, 3]]
+    assert [leg.title for leg in snapshot.legs([1, 2, 3])] == [MARIO[0], ZELDA[0], SONIC[0]]
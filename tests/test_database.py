@@ -0,0 +1,111 @@
+import asyncio
+from collections.abc import AsyncGenerator, Generator
+import json
+import pytest
+
+from fastapi.testclient import TestClient
+from sqlalchemy import StaticPool, create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from app.cache import cache
+from app.config import Settings
+from app.dependencies.database import engine_options, get_session, sqlite_pragma_listener
+from app.main import app
+from app.models import Base
+
+
+@pytest.fixture(name="async_engine")
+def async_engine_fixture() -> Generator[AsyncEngine, None, None]:
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    event.listen(engine.sync_engine, 'connect', sqlite_pragma_listener(Settings()))
+
+    async def create_all() -> None:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_all())
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture(name="async_client")
+def async_client_fixture(async_engine: AsyncEngine) -> Generator[TestClient, None, None]:
+    async def get_session_override() -> AsyncGenerator[AsyncSession, None]:
+        async with AsyncSession(async_engine, autoflush=False, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+
+    cache.clear()
+    client = TestClient(app)
+    yield client
+    app.dependency_overrides.clear()
+    cache.clear()
+
+
+def test_async_session_round_trip(async_client: TestClient) -> None:
+    proposer = async_client.post("/gamers", json={"name": "Player One", "email": "press@start.com"}).json()
+    acceptor = async_client.post("/gamers", json={"name": "Player Two", "email": "insert@coin.com"}).json()
+
+    proposer_game = async_client.post(
+        "/games", json={"title": "Sonic The Hedgehog", "platform": "SEGA Mega Drive", "gamer_id": proposer["id"]}
+    ).json()
+    acceptor_game = async_client.post(
+        "/games", json={"title": "Super Mario Land", "platform": "Nintendo GAME BOY", "gamer_id": acceptor["id"]}
+    ).json()
+
+    swap_data = {
+        "proposer": {"id": proposer["id"], "game_ids": [proposer_game["id"]]},
+        "acceptor": {"id": acceptor["id"], "game_ids": [acceptor_game["id"]]},
+    }
+    response = async_client.post("/swaps", json=swap_data)
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert (
+        len(data["games"]) == 2
+        and data["proposer"]["name"] == proposer["name"]
+        and data["acceptor"]["name"] == acceptor["name"]
+    )
+
+    response = async_client.get(f"/gamers/{proposer['id']}/games")
+    assert response.status_code == 200, response.text
+    assert [game["swap_id"] for game in response.json()] == [data["id"]]
+
+    response = async_client.get("/swaps?stream=true")
+    lines = response.text.splitlines()
+    assert response.status_code == 200, response.text
+    assert len(lines) == 1 and len(json.loads(lines[0])["games"]) == 2
+
+
+def test_async_session_not_found(async_client: TestClient) -> None:
+    response = async_client.get(f"/swaps/{0}")
+    assert response.status_code == 404, response.text
+
+
+def test_engine_options() -> None:
+    settings = Settings(pool_size=20, max_overflow=0, pool_pre_ping=True)
+
+    options = engine_options("postgresql+asyncpg://localhost/gameswap", settings)
+    assert (
+        options["pool_size"] == 20 
+        and options["max_overflow"] == 0
+        and options["pool_pre_ping"] is True
+    )
+    assert "pool_size" not in engine_options("sqlite://", settings)
+
+
+def test_sqlite_pragmas(tmp_path) -> None:
+    url = f"sqlite:///{tmp_path / 'gameswap.db'}"
+    settings = Settings(sqlite_synchronous="FULL", sqlite_busy_timeout=1_000)
+    engine = create_engine(url, **engine_options(url, settings))
+    event.listen(engine, 'connect', sqlite_pragma_listener(settings))
+
+    with engine.connect() as connection:
+        pragma = lambda name: connection.execute(text(f"pragma {name}")).scalar()
+        assert pragma("journal_mode") == "wal"
+        # The engine's own settings, not the global ones
+        assert pragma("synchronous") == 2
+        assert pragma("foreign_keys") == 1
+        assert pragma("busy_timeout") == 1_000
+    engine.dispose()
@@ -0,0 +1,170 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.crud.versions import bump_table_versions, get_table_versions
+from app.models import Game, Gamer, Swap
+from tests.conftest import count_statements
+
+
+def add_game(session: Session) -> Game:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    game = Game(title="Tetris", platform="Game Boy", gamer=gamer)
+    session.add(game)
+    session.commit()
+    return game
+
+
+def test_get_game_returns_row_etag(session: Session, client: TestClient) -> None:
+    game = add_game(session)
+
+    response = client.get(f"/games/{game.id}")
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"game-{game.id}-1"'
+
+
+def test_if_none_match_skips_the_query(session: Session, client: TestClient) -> None:
+    game = add_game(session)
+    etag = client.get(f"/games/{game.id}").headers["ETag"]
+
+    with count_statements(session) as statements:
+        response = client.get(f"/games/{game.id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    assert len(statements) == 1 and "game.version" in statements[0]
+
+
+def test_list_etag_changes_on_write(session: Session, client: TestClient) -> None:
+    game = add_game(session)
+    etag = client.get("/games").headers["ETag"]
+    assert client.get("/games", headers={"If-None-Match": etag}).status_code == 304
+    # Other query strings are tagged separately
+    assert client.get("/games?limit=1", headers={"If-None-Match": etag}).status_code == 200
+
+    client.patch(f"/games/{game.id}", json={"title": "Tetris DX"})
+
+    response = client.get("/games", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["title"] == "Tetris DX"
+
+
+def test_swap_etag_changes_when_a_gamer_is_renamed(swap: Swap, session: Session, client: TestClient) -> None:
+    swap_id, proposer_id = swap.id, swap.proposer_id
+    etag = client.get(f"/swaps/{swap_id}").headers["ETag"]
+
+    client.patch(f"/gamers/{proposer_id}", json={"name": "Player Three"})
+
+    response = client.get(f"/swaps/{swap_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["proposer"]["name"] == "Player Three"
+
+
+def test_stream_carries_etag(session: Session, client: TestClient) -> None:
+    add_game(session)
+    etag = client.get("/games?stream=true").headers["ETag"]
+
+    response = client.get("/games?stream=true", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+
+
+def test_update_game_with_stale_if_match_fails(session: Session, client: TestClient) -> None:
+    game = add_game(session)
+    stale = client.get(f"/games/{game.id}").headers["ETag"]
+    current = client.patch(
+        f"/games/{game.id}", json={"title": "Tetris DX"}, headers={"If-Match": stale}
+    ).headers["ETag"]
+    assert current == f'"game-{game.id}-2"'
+
+    response = client.patch(
+        f"/games/{game.id}", json={"title": "Tetris Plus"}, headers={"If-Match": stale}
+    )
+
+    assert response.status_code == 412
+    assert client.get(f"/games/{game.id}").json()["title"] == "Tetris DX"
+
+
+def test_update_gamer_with_if_match(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+    etag = client.get(f"/gamers/{gamer.id}").headers["ETag"]
+
+    response = client.patch(f"/gamers/{gamer.id}", json={"name": "Player Two"}, headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"gamer-{gamer.id}-2"'
+
+    response = client.patch(f"/gamers/{gamer.id}", json={"name": "Player Three"}, headers={"If-Match": etag})
+    assert response.status_code == 412
+
+
+def test_delete_game_with_if_match(session: Session, client: TestClient) -> None:
+    game = add_game(session)
+    game_id = game.id
+    client.patch(f"/games/{game_id}", json={"title": "Tetris DX"})
+
+    assert client.delete(f"/games/{game_id}", headers={"If-Match": f'"game-{game_id}-1"'}).status_code == 412
+    assert client.delete(f"/games/{game_id}", headers={"If-Match": f'"game-{game_id}-2"'}).status_code == 204
+    assert client.get(f"/games/{game_id}").status_code == 404
+
+
+def test_swap_bumps_game_versions(session: Session, client: TestClient) -> None:
+    game = add_game(session)
+    other = Game(title="Super Mario Land", platform="Game Boy", gamer=Gamer(name="Player Two", email="insert@coin.com"))
+    session.add(other)
+    session.commit()
+    swap_data = {
+        "proposer": {"id": game.gamer_id, "game_ids": [game.id]},
+        "acceptor": {"id": other.gamer_id, "game_ids": [other.id]},
+    }
+    swap_id = client.post("/swaps", json=swap_data).json()["id"]
+    assert client.get(f"/games/{game.id}").headers["ETag"] == f'"game-{game.id}-2"'
+
+    client.delete(f"/swaps/{swap_id}")
+
+    assert client.get(f"/games/{game.id}").headers["ETag"] == f'"game-{game.id}-3"'
+
+
+def test_unrelated_writes_keep_swap_and_gamer_games_etags(swap: Swap, session: Session, client: TestClient) -> None:
+    swap_id, proposer_id = swap.id, swap.proposer_id
+    swap_etag = client.get(f"/swaps/{swap_id}").headers["ETag"]
+    games_etag = client.get(f"/gamers/{proposer_id}/games").headers["ETag"]
+
+    gamer_id = client.post("/gamers", json={"name": "Player Three", "email": "continue@retro.com"}).json()["id"]
+    client.post("/games", json={"title": "Tetris", "platform": "Game Boy", "gamer_id": gamer_id})
+
+    assert client.get(f"/swaps/{swap_id}", headers={"If-None-Match": swap_etag}).status_code == 304
+    assert client.get(f"/gamers/{proposer_id}/games", headers={"If-None-Match": games_etag}).status_code == 304
+
+
+def test_gamer_games_etag_changes_when_a_game_is_added(session: Session, client: TestClient) -> None:
+    game = add_game(session)
+    gamer_id = game.gamer_id
+    etag = client.get(f"/gamers/{gamer_id}/games").headers["ETag"]
+
+    client.post("/games", json={"title": "Tetris DX", "platform": "Game Boy Color", "gamer_id": gamer_id})
+
+    response = client.get(f"/gamers/{gamer_id}/games", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+def test_weak_if_match_fails(session: Session, client: TestClient) -> None:
+    game = add_game(session)
+
+    response = client.patch(
+        f"/games/{game.id}", json={"title": "Tetris DX"}, headers={"If-Match": f'W/"game-{game.id}-1"'}
+    )
+
+    assert response.status_code == 412
+
+
+def test_table_versions_count_writes_across_shards(session: Session) -> None:
+    for _ in range(20):
+        bump_table_versions(session, "game", "swap")
+    bump_table_versions(session, "game")
+
+    assert get_table_versions(session, ("game", "swap", "wish")) == {"game": 21, "swap": 20, "wish": 0}
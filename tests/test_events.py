@@ -0,0 +1,193 @@
+import asyncio
+from collections.abc import Generator
+import json
+import pytest
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.dependencies.events import EventBroker, EventFilter, get_event_broker
+from app.dependencies.notifications import Event, Notification
+from app.main import app
+from app.models import Game, Gamer, OutboxMessage, Swap
+from app.routers.events import sse_events
+from tests.test_outbox import relay_for
+
+
+SONIC = {"id": 1, "title": "Sonic The Hedgehog", "platform": "SEGA Mega Drive", "gamer_id": 1, "swap_id": None}
+MARIO = {"id": 2, "title": "Super Mario Land", "platform": "Nintendo GAME BOY", "gamer_id": 2, "swap_id": None}
+
+
+def game_created(game: dict) -> Notification:
+    return Notification(Event.GAME_CREATED, f"{game['title']} added.", f"game_created:{game['id']}", game)
+
+
+def swap_created() -> Notification:
+    data = {"swap_id": 1, "proposer_id": 1, "acceptor_id": 2, "games": [SONIC, MARIO]}
+    return Notification(Event.SWAP_CREATED, "Swap created!", "swap_created:1", data)
+
+
+@pytest.fixture(name="broker")
+def broker_fixture() -> Generator[EventBroker, None, None]:
+    broker = EventBroker(buffer_size=10)
+    app.dependency_overrides[get_event_broker] = lambda: broker
+    yield broker
+    app.dependency_overrides.pop(get_event_broker, None)
+
+
+@pytest.mark.parametrize(("filter", "matches"), [
+    (EventFilter(), [True, True, True]),
+    (EventFilter(events=frozenset({Event.SWAP_CREATED})), [False, False, True]),
+    (EventFilter(platform="SEGA Mega Drive"), [True, False, True]),
+    (EventFilter(title="Super Mario Land"), [False, True, True]),
+    (EventFilter(title="Super Mario Land", gamer_id=1), [False, False, False]),
+    (EventFilter(gamer_id=1), [True, False, True]),
+    (EventFilter(gamer_id=3), [False, False, False]),
+])
+def test_event_filter(filter: EventFilter, matches: list[bool]) -> None:
+    notifications = [game_created(SONIC), game_created(MARIO), swap_created()]
+    assert [filter.matches(n) for n in notifications] == matches
+
+
+def test_slow_subscriber_drops_oldest_events(broker: EventBroker) -> None:
+    async def main():
+        async with broker.subscribe(EventFilter()) as subscriber:
+            for n in range(15):
+                broker.publish(game_created({**SONIC, "id": n}))
+            received = [(await subscriber.get()).data["id"] for _ in range(10)]
+            return received, subscriber.take_dropped()
+
+    received, dropped = asyncio.run(main())
+
+    assert received == list(range(5, 15))
+    assert dropped == 5
+
+
+def test_sse_events() -> None:
+    broker = EventBroker()
+
+    async def main():
+        async with broker.subscribe(EventFilter(platform="SEGA Mega Drive")) as subscriber:
+            events = sse_events(subscriber, keepalive=0.01)
+            keepalive = await anext(events)
+            broker.publish(game_created(MARIO))
+            broker.publish(game_created(SONIC))
+            event = await anext(events)
+            broker.close()
+            return keepalive, event, [e async for e in events]
+
+    keepalive, event, rest = asyncio.run(main())
+
+    assert keepalive == ": keepalive\n\n"
+    lines = event.splitlines()
+    assert lines[:2] == ["id: game_created:1", "event: game_created"]
+    assert json.loads(lines[2].removeprefix("data: "))["data"] == SONIC
+    assert rest == []
+
+
+def test_sse_events_reports_overflow() -> None:
+    broker = EventBroker(buffer_size=1)
+
+    async def main():
+        async with broker.subscribe(EventFilter()) as subscriber:
+            events = sse_events(subscriber)
+            broker.publish(game_created(MARIO))
+            broker.publish(game_created(SONIC))
+            return await anext(events), await anext(events)
+
+    overflow, event = asyncio.run(main())
+
+    assert overflow == 'event: overflow\ndata: {"dropped": 1}\n\n'
+    assert event.startswith("id: game_created:1\n")
+
+
+def test_events_websocket(broker: EventBroker, client: TestClient) -> None:
+    with client.websocket_connect("/events/ws?platform=SEGA Mega Drive") as websocket:
+        broker.publish(game_created(MARIO))
+        broker.publish(game_created(SONIC))
+        assert websocket.receive_json() == {
+            "event": "game_created", 
+            "key": "game_created:1", 
+            "message": "Sonic The Hedgehog added.", 
+            "data": SONIC,
+        }
+    assert broker.subscribers == 0
+
+
+def test_game_changes_reach_websocket_through_outbox(
+        broker: EventBroker, 
+        session: Session, 
+        client: TestClient,
+    ) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+    relay = relay_for(session, broker.publish)
+
+    with client.websocket_connect(f"/events/ws?gamer_id={gamer.id}&event=game_created") as websocket:
+        game = {"title": "Ristar", "platform": "SEGA Mega Drive", "gamer_id": gamer.id}
+        game_id = client.post("/games", json=game).json()["id"]
+        client.patch(f"/games/{game_id}", json={"platform": "SEGA Game Gear"})
+        asyncio.run(relay.relay_batch())
+
+        message = websocket.receive_json()
+        assert message["event"] == "game_created"
+        assert message["data"] == {**game, "id": game_id, "swap_id": None}
+
+
+def outbox_events(session: Session) -> list[tuple[str, dict]]:
+    messages = session.execute(select(OutboxMessage).order_by(OutboxMessage.id)).scalars()
+    return [(message.event, message.data) for message in messages]
+
+
+def test_game_writes_record_events(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+    game = {"title": "Ristar", "platform": "SEGA Mega Drive", "gamer_id": gamer.id}
+
+    game_id = client.post("/games", json=game).json()["id"]
+    client.patch(f"/games/{game_id}", json={"title": "Ristar: The Shooting Star"})
+    [other_id] = [g["id"] for g in client.post("/games/bulk", json=[game]).json()["items"]]
+    client.patch("/games/bulk", json=[{"id": other_id, "platform": "SEGA Game Gear"}])
+    client.delete(f"/games/{game_id}")
+    client.request("DELETE", "/games/bulk", json=[other_id])
+
+    renamed = {**game, "id": game_id, "swap_id": None, "title": "Ristar: The Shooting Star"}
+    other = {**game, "id": other_id, "swap_id": None, "platform": "SEGA Game Gear"}
+    assert outbox_events(session) == [
+        ("game_created", {**game, "id": game_id, "swap_id": None}),
+        ("game_updated", renamed),
+        ("game_created", {**game, "id": other_id, "swap_id": None}),
+        ("game_updated", other),
+        ("game_deleted", renamed),
+        ("game_deleted", other),
+    ]
+
+
+def test_delete_gamer_records_deleted_games(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+    game = {"title": "Ristar", "platform": "SEGA Mega Drive", "gamer_id": gamer.id}
+    game_ids = [g["id"] for g in client.post("/games/bulk", json=[game, game]).json()["items"]]
+
+    response = client.delete(f"/gamers/{gamer.id}")
+    assert response.status_code == 204, response.text
+
+    assert outbox_events(session)[2:] == [
+        ("game_deleted", {**game, "id": game_id, "swap_id": None}) for game_id in game_ids
+    ]
+
+def test_delete_swap_records_released_games(swap: Swap, session: Session, client: TestClient) -> None:
+    swap_id, game_ids = swap.id, sorted(game.id for game in swap.games)
+
+    response = client.delete(f"/swaps/{swap_id}")
+    assert response.status_code == 204, response.text
+
+    [(event, data)] = outbox_events(session)
+    assert event == "swap_deleted"
+    assert data["swap_id"] == swap_id
+    assert sorted(game["id"] for game in data["games"]) == game_ids
+    assert all(game["swap_id"] is None for game in data["games"])
@@ -1,7 +1,9 @@
+import json
+
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from app.models import Game, Gamer
+from app.models import Game, Gamer, Wish
 
 
 def test_create_gamer(client: TestClient) -> None:
@@ -155,3 +157,149 @@ def test_get_games_for_given_gamer(session: Session, client: TestClient) -> None
 
     assert response.status_code == 200, response.text
     assert len(data) == 2
+
+
+
+def test_get_games_for_given_gamer_sparse_and_expanded(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    gamer.games = [Game(title="Sonic The Hedgehog", platform="SEGA Mega Drive")]
+    session.add(gamer)
+    session.commit()
+
+    response = client.get(f"/gamers/{gamer.id}/games", params={"fields": "title", "expand": "gamer"})
+
+    assert response.status_code == 200, response.text
+    assert response.json() == [{
+        "id": gamer.games[0].id,
+        "title": "Sonic The Hedgehog",
+        "gamer": {"id": gamer.id, "name": "Player One", "email": "press@start.com"},
+    }]
+
+
+def test_get_games_for_given_gamer_unknown_field(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+
+    assert client.get(f"/gamers/{gamer.id}/games", params={"fields": "price"}).status_code == 422
+    assert client.get(f"/gamers/{gamer.id}/games", params={"expand": "swap"}).status_code == 422
+
+def test_get_gamers_paginated(session: Session, client: TestClient) -> None:
+    gamers = [Gamer(name=f"gamer{n}", email=f"gamer{n}@retro.com") for n in range(3)]
+    session.add_all(gamers)
+    session.commit()
+
+    response = client.get("/gamers?limit=2")
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 2
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(f"/gamers?limit=2&after={cursor}")
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert [gamer["id"] for gamer in data] == [gamers[2].id]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_create_gamers_bulk(session: Session, client: TestClient) -> None:
+    session.add(Gamer(name="Player One", email="press@start.com"))
+    session.commit()
+
+    items = [
+        {"name": "Player One", "email": "press@start.com"},
+        {"name": "Player Two", "email": "insert@coin.com"},
+        {"name": "Player Two Again", "email": "insert@coin.com"},
+        {"name": "Player Zero", "email": "gameover.com"},
+    ]
+    response = client.post("/gamers/bulk", json=items)
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert [gamer["name"] for gamer in data["items"]] == ["Player Two"]
+    assert [error["index"] for error in data["errors"]] == [0, 2, 3]
+    assert session.query(Gamer).count() == 2
+
+
+def test_export_games_for_given_gamer(session: Session, client: TestClient) -> None:
+    gamer1 = Gamer(name="Player One", email="press@start.com")
+    gamer2 = Gamer(name="Player Two", email="insert@coin.com")
+    session.add_all([gamer1, gamer2])
+    session.commit()
+
+    game1 = Game(title="Sonic The Hedgehog", platform="SEGA Mega Drive", gamer_id=gamer1.id)
+    game2 = Game(title="Super Mario Land", platform="Nintendo GAME BOY", gamer_id=gamer2.id)
+    session.add_all([game1, game2])
+    session.commit()
+
+    response = client.get(f"/gamers/{gamer1.id}/games/export?format=ndjson")
+    lines = response.text.splitlines()
+
+    assert response.status_code == 200, response.text
+    assert len(lines) == 1 and json.loads(lines[0])["id"] == game1.id
+
+    response = client.get(f"/gamers/{0}/games/export")
+    assert response.status_code == 404, response.text
+
+
+def test_wishlist(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+
+    wish_data = {"title": "Ristar", "platform": "SEGA Mega Drive"}
+    response = client.post(f"/gamers/{gamer.id}/wishlist", json=wish_data)
+    wish = response.json()
+
+    assert response.status_code == 200, response.text
+    assert wish["gamer_id"] == gamer.id and wish["title"] == wish_data["title"]
+
+    response = client.post(f"/gamers/{gamer.id}/wishlist", json=wish_data)
+    assert response.status_code == 422, response.text
+
+    response = client.get(f"/gamers/{gamer.id}/wishlist")
+    assert response.status_code == 200, response.text
+    assert [item["id"] for item in response.json()] == [wish["id"]]
+
+    response = client.delete(f"/gamers/{gamer.id}/wishlist/{wish['id']}")
+    assert response.status_code == 204, response.text
+    assert client.get(f"/gamers/{gamer.id}/wishlist").json() == []
+
+    response = client.post(f"/gamers/{0}/wishlist", json=wish_data)
+    assert response.status_code == 404, response.text
+
+
+def test_get_matches(session: Session, client: TestClient) -> None:
+    me, best, good, one_sided = gamers = [
+        Gamer(name=f"gamer{n}", email=f"gamer{n}@retro.com") for n in range(4)
+    ]
+    session.add_all(gamers)
+    session.commit()
+
+    session.add_all([
+        Game(title="Sonic The Hedgehog", platform="SEGA Mega Drive", gamer_id=me.id),
+        Game(title="Ristar", platform="SEGA Mega Drive", gamer_id=me.id),
+        Game(title="Super Mario Land", platform="Nintendo GAME BOY", gamer_id=best.id),
+        Game(title="Tetris", platform="Nintendo GAME BOY", gamer_id=best.id),
+        Game(title="Tetris", platform="Nintendo GAME BOY", gamer_id=good.id),
+        Game(title="Tetris", platform="Nintendo GAME BOY", gamer_id=one_sided.id),
+        Wish(title="Super Mario Land", platform="Nintendo GAME BOY", gamer_id=me.id),
+        Wish(title="Tetris", platform="Nintendo GAME BOY", gamer_id=me.id),
+        Wish(title="Sonic The Hedgehog", platform="SEGA Mega Drive", gamer_id=best.id),
+        Wish(title="Ristar", platform="SEGA Mega Drive", gamer_id=best.id),
+        Wish(title="Ristar", platform="SEGA Mega Drive", gamer_id=good.id),
+        Wish(title="Ristar", platform="SEGA Master System", gamer_id=one_sided.id),
+    ])
+    session.commit()
+
+    response = client.get(f"/gamers/{me.id}/matches")
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert [(match["gamer"]["id"], match["they_offer"], match["i_offer"]) for match in data] == [
+        (best.id, 2, 2),
+        (good.id, 1, 1),
+    ]
+
+    response = client.get(f"/gamers/{0}/matches")
+    assert response.status_code == 404, response.text
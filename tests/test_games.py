@@ -1,7 +1,18 @@
+import asyncio
+import io
+import json
+import pytest
+
 from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Session
 
+import app.crud.games as games
+from app.imports import ImportFormatError, read_records
 from app.models import Game, Gamer, Swap
+from app.responses import ExportFormat
+from app.search import search_statement
+import app.trades as trades
 
 
 def test_create_game(session: Session, client: TestClient) -> None:
@@ -134,3 +145,299 @@ def test_delete_game_not_exists(client: TestClient) -> None:
 def test_cannot_delete_game_if_in_swap(swap: Swap, client: TestClient) -> None:
     response = client.delete(f"/games/{swap.games[0].id}")
     assert response.status_code == 422, response.text
+
+
+def test_get_games_paginated(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+
+    games = [Game(title=f"game{n}", platform="platform", gamer_id=gamer.id) for n in range(5)]
+    session.add_all(games)
+    session.commit()
+
+    response = client.get("/games?limit=2")
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert [game["id"] for game in data] == [games[0].id, games[1].id]
+    assert response.headers["X-Next-Cursor"] == str(games[1].id)
+
+    response = client.get(f"/games?limit=2&after={games[3].id}")
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert [game["id"] for game in data] == [games[4].id]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_games_stream(swap: Swap, session: Session, client: TestClient) -> None:
+    new_game = Game(title="Ristar", platform="SEGA Mega Drive", gamer_id=swap.proposer.id)
+    session.add(new_game)
+    session.commit()
+
+    response = client.get("/games?stream=true")
+    lines = response.text.splitlines()
+
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert len(lines) == 3
+
+    response = client.get("/games?stream=true&only_available=true")
+    lines = response.text.splitlines()
+
+    assert response.status_code == 200, response.text
+    assert len(lines) == 1
+    assert json.loads(lines[0])["id"] == new_game.id
+
+
+def test_create_games_bulk(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+
+    items = [
+        {"title": "Sonic The Hedgehog", "platform": "SEGA Mega Drive", "gamer_id": gamer.id},
+        {"title": "Ristar"},
+        {"title": "Super Mario Land", "platform": "Nintendo GAME BOY", "gamer_id": gamer.id + 1},
+        {"title": "Streets of Rage", "platform": "SEGA Mega Drive", "gamer_id": gamer.id},
+    ]
+    response = client.post("/games/bulk", json=items)
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert [game["title"] for game in data["items"]] == ["Sonic The Hedgehog", "Streets of Rage"]
+    assert [error["index"] for error in data["errors"]] == [1, 2]
+    assert session.query(Game).count() == 2
+
+
+def test_update_games_bulk(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+
+    game1 = Game(title="Sonic The Hedgehog", platform="SEGA Mega Drive", gamer_id=gamer.id)
+    game2 = Game(title="Ristar", platform="SEGA Mega Drive", gamer_id=gamer.id)
+    session.add_all([game1, game2])
+    session.commit()
+
+    items = [
+        {"id": game1.id, "platform": "SEGA Master System"},
+        {"id": game2.id, "title": "Ristar The Shooting Star"},
+        {"id": 0, "title": "Missing"},
+    ]
+    response = client.patch("/games/bulk", json=items)
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert [(game["title"], game["platform"]) for game in data["items"]] == [
+        ("Sonic The Hedgehog", "SEGA Master System"),
+        ("Ristar The Shooting Star", "SEGA Mega Drive"),
+    ]
+    assert [error["index"] for error in data["errors"]] == [2]
+
+
+def test_delete_games_bulk(swap: Swap, session: Session, client: TestClient) -> None:
+    new_game = Game(title="Ristar", platform="SEGA Mega Drive", gamer_id=swap.proposer_id)
+    session.add(new_game)
+    session.commit()
+
+    game_ids = [new_game.id, swap.games[0].id, 0]
+    response = client.request("DELETE", "/games/bulk", json=game_ids)
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert data["items"] == [game_ids[0]]
+    assert [error["index"] for error in data["errors"]] == [1, 2]
+    assert session.query(Game).count() == 2
+
+
+def test_export_games(swap: Swap, client: TestClient) -> None:
+    response = client.get("/games/export")
+    lines = response.text.splitlines()
+
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/csv")
+    assert lines[0] == "title,platform,gamer_id,id,swap_id"
+    assert len(lines) == 3
+
+    response = client.get("/games/export?format=ndjson")
+    lines = response.text.splitlines()
+
+    assert response.status_code == 200, response.text
+    assert [json.loads(line)["swap_id"] for line in lines] == [swap.id, swap.id]
+
+
+def test_import_games(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+
+    csv_file = (
+        "title,platform,gamer_id\n"
+        f"Sonic The Hedgehog,SEGA Mega Drive,{gamer.id}\n"
+        f"Ristar,SEGA Mega Drive,{gamer.id + 1}\n"
+        f"Streets of Rage,SEGA Mega Drive,not-an-id\n"
+        f"Super Mario Land,Nintendo GAME BOY,{gamer.id}\n"
+    )
+    response = client.post("/games/import", files={"file": ("games.csv", csv_file, "text/csv")})
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert data["created"] == 2
+    assert [error["index"] for error in data["errors"]] == [1, 2]
+
+    ndjson_file = (
+        json.dumps({"title": "Ristar", "platform": "SEGA Mega Drive", "gamer_id": gamer.id}) 
+        + "\n" + json.dumps({"title": "Ristar", "platform": "SEGA Mega Drive"}) + "\n"
+    )
+    response = client.post("/games/import", files={"file": ("games.ndjson", ndjson_file)})
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert data["created"] == 1
+    assert [error["index"] for error in data["errors"]] == [1]
+    assert session.query(Game).count() == 3
+
+
+def test_import_games_unreadable_upload_imports_nothing(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+
+    game = json.dumps({"title": "Ristar", "platform": "SEGA Mega Drive", "gamer_id": gamer.id})
+    uploads = {
+        "games.ndjson": (f"{game}\n{{not json\n".encode(), "Line 2: not valid JSON"),
+        "games.csv": (
+            f"title,platform,gamer_id\nRistar,SEGA Mega Drive,{gamer.id}\n".encode() + b"Pok\xe9mon,GAME BOY,1\n",
+            "Line 3: not valid UTF-8",
+        ),
+    }
+    for filename, (content, detail) in uploads.items():
+        response = client.post("/games/import", files={"file": (filename, content)})
+
+        assert response.status_code == 422, response.text
+        assert response.json()["detail"].startswith(detail)
+    assert session.query(Game).count() == 0
+
+    # Batches inserted before the failure are rolled back with it
+    content = io.BytesIO(f"{game}\n{game}\n\xff\n".encode("latin-1"))
+    with pytest.raises(ImportFormatError):
+        games.import_games(session, read_records(content, ExportFormat.NDJSON), batch_size=1)
+    assert session.query(Game).count() == 0
+
+
+def test_import_games_reloads_gamer_games_and_trade_graph(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+    asyncio.run(trades.load_trade_graph(session))
+    assert client.get(f"/gamers/{gamer.id}/games").json() == []
+
+    csv_file = f"title,platform,gamer_id\nRistar,SEGA Mega Drive,{gamer.id}\n"
+    client.post("/games/import", files={"file": ("games.csv", csv_file, "text/csv")})
+
+    assert [game["title"] for game in client.get(f"/gamers/{gamer.id}/games").json()] == ["Ristar"]
+    assert asyncio.run(trades.refresh_trade_graph(session))
+
+def test_search_games(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+
+    titles = ["Super Mario Land", "Mario Kart 64", "The Legend of Zelda", "Sonic The Hedgehog"]
+    session.add_all([Game(title=title, platform="platform", gamer_id=gamer.id) for title in titles])
+    session.commit()
+
+    response = client.get("/games/search?q=mario")
+    assert response.status_code == 200, response.text
+    assert {game["title"] for game in response.json()} == {"Super Mario Land", "Mario Kart 64"}
+
+    response = client.get("/games/search?q=super mario")
+    assert response.status_code == 200, response.text
+    assert response.json()[0]["title"] == "Super Mario Land"
+
+    response = client.get("/games/search?q=zelad")
+    assert response.status_code == 200, response.text
+    assert [game["title"] for game in response.json()] == ["The Legend of Zelda"]
+
+    response = client.get("/games/search?q=mario&limit=1&offset=1")
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 1
+
+    response = client.get("/games/search?q=ma")
+    assert response.status_code == 422, response.text
+
+
+def test_search_games_follows_writes(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+
+    game = Game(title="Sonic The Hedgehog", platform="SEGA Mega Drive", gamer_id=gamer.id)
+    session.add(game)
+    session.commit()
+
+    response = client.patch(f"/games/{game.id}", json={"title": "Ristar"})
+    assert response.status_code == 200, response.text
+    assert client.get("/games/search?q=sonic").json() == []
+    assert len(client.get("/games/search?q=ristar").json()) == 1
+
+    response = client.delete(f"/gamers/{gamer.id}")
+    assert response.status_code == 204, response.text
+    assert client.get("/games/search?q=ristar").json() == []
+
+
+def test_postgres_search_matches_wildcards_literally() -> None:
+    stmt = search_statement("postgresql", "100%_mario")
+    compiled = stmt.compile(dialect=postgresql.dialect())
+
+    assert "ESCAPE" in str(compiled)
+    assert "%100\\%\\_mario%" in compiled.params.values()
+
+def test_update_game_in_swap_to_duplicate_title(swap: Swap, client: TestClient) -> None:
+    sonic, mario = sorted(swap.games, key=lambda game: game.title)
+
+    response = client.patch(f"/games/{mario.id}", json={"title": sonic.title, "platform": sonic.platform})
+    assert response.status_code == 422, response.text
+
+    response = client.get(f"/games/{mario.id}")
+    assert response.json()["title"] == mario.title
+
+
+def test_update_games_bulk_reports_duplicate_in_swap_per_item(swap: Swap, client: TestClient) -> None:
+    sonic, mario = sorted(swap.games, key=lambda game: game.title)
+
+    items = [
+        {"id": mario.id, "title": sonic.title, "platform": sonic.platform},
+        {"id": sonic.id, "title": "Sonic The Hedgehog 2"},
+        # Free since the previous item renamed Sonic
+        {"id": mario.id, "title": "Sonic The Hedgehog", "platform": sonic.platform},
+    ]
+    response = client.patch("/games/bulk", json=items)
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert [error["index"] for error in data["errors"]] == [0]
+    assert "cannot share its title and platform" in data["errors"][0]["detail"]
+    assert sorted((game["title"], game["platform"]) for game in data["items"]) == [
+        ("Sonic The Hedgehog", "SEGA Mega Drive"),
+        ("Sonic The Hedgehog 2", "SEGA Mega Drive"),
+    ]
+
+
+def test_update_game_rejects_null_fields(session: Session, client: TestClient) -> None:
+    gamer = Gamer(name="Player One", email="press@start.com")
+    session.add(gamer)
+    session.commit()
+    game = Game(title="Sonic The Hedgehog", platform="SEGA Mega Drive", gamer_id=gamer.id)
+    session.add(game)
+    session.commit()
+
+    response = client.patch(f"/games/{game.id}", json={"title": None})
+    assert response.status_code == 422, response.text
+    assert "swap" not in response.text
+
+    response = client.patch("/games/bulk", json=[{"id": game.id, "platform": None}])
+    assert response.status_code == 200, response.text
+    assert [error["index"] for error in response.json()["errors"]] == [0]
@@ -0,0 +1,67 @@
+from collections.abc import Generator
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy.orm import Session
+
+from app.main import app
+from app.metrics import Metrics, MetricsMiddleware, install_query_hooks, remove_query_hooks
+from app.models import Swap
+
+
+@pytest.fixture
+def registry(session: Session, client: TestClient) -> Generator[Metrics, None, None]:
+    engine = session.get_bind()
+    install_query_hooks(engine)
+    yield Metrics()
+    remove_query_hooks(engine)
+
+
+@pytest.fixture
+def metered(registry: Metrics) -> TestClient:
+    return TestClient(MetricsMiddleware(app, registry, server_timing=True))
+
+
+def test_requests_are_recorded_by_route_template(swap: Swap, registry: Metrics, metered: TestClient) -> None:
+    swap_id = swap.id
+    metered.get(f"/swaps/{swap_id}")
+    metered.get(f"/swaps/{swap_id}")
+    metered.get("/swaps/0")
+    metered.get("/nowhere")
+
+    text = registry.render()
+
+    assert 'gameswap_request_duration_seconds_count{method="GET",route="/swaps/{swap_id}",status="200"} 2' in text
+    assert 'gameswap_request_duration_seconds_count{method="GET",route="/swaps/{swap_id}",status="404"} 1' in text
+    assert 'gameswap_request_duration_seconds_count{method="GET",route="unmatched",status="404"} 1' in text
+    assert f"/swaps/{swap_id}" not in text
+    # Versions and swap for each read (the cache is off by default); a missing
+    # swap stops at the versions
+    assert 'gameswap_request_sql_statements_sum{method="GET",route="/swaps/{swap_id}"} 5' in text
+    assert 'gameswap_request_sql_statements_bucket{method="GET",route="/swaps/{swap_id}",le="+Inf"} 3' in text
+
+
+def test_server_timing_header(swap: Swap, metered: TestClient) -> None:
+    response = metered.get("/swaps")
+
+    db, total = response.headers["Server-Timing"].split(", ")
+    assert db.startswith("db;dur=") and db.endswith('desc="3 queries"')
+    assert total.startswith("total;dur=")
+
+
+def test_queries_outside_requests_are_not_counted(session: Session, registry: Metrics) -> None:
+    session.execute(Swap.__table__.select()).all()
+
+    assert "sql_statements_sum" not in registry.render()
+
+
+def test_registered_collectors_are_read_on_render() -> None:
+    registry = Metrics()
+    lag = [0.5]
+    registry.register("gameswap_lag_seconds", "Lag.", "gauge", lambda: [({"queue": 'a"b'}, lag[0])])
+    lag[0] = 2.0
+
+    text = registry.render()
+
+    assert "# TYPE gameswap_lag_seconds gauge" in text
+    assert 'gameswap_lag_seconds{queue="a\\"b"} 2.0' in text
@@ -0,0 +1,243 @@
+import asyncio
+import threading
+
+from app.dependencies.notifications import (
+    Event,
+    Notification,
+    NotificationDispatcher,
+    NotificationService,
+    OverflowPolicy,
+)
+
+
+def notification(message: str = "hello") -> Notification:
+    return Notification(event=Event.GAMER_CREATED, message=message)
+
+
+def test_post_without_running_dispatcher_delivers_inline():
+    received = []
+    service = NotificationService(dispatcher=NotificationDispatcher())
+    service.subscribe(Event.GAMER_CREATED, received.append)
+
+    service.post(notification())
+
+    assert received == [notification()]
+
+
+def test_post_is_delivered_by_workers():
+    received = []
+
+    async def main():
+        dispatcher = NotificationDispatcher(workers=2, batch_size=10)
+        service = NotificationService(dispatcher=dispatcher)
+        service.subscribe(Event.GAMER_CREATED, received.append)
+        await dispatcher.start()
+        for i in range(25):
+            service.post(notification(str(i)))
+        await dispatcher.drain(timeout=5)
+        return dispatcher
+
+    dispatcher = asyncio.run(main())
+
+    assert sorted(int(n.message) for n in received) == list(range(25))
+    assert dispatcher.delivered == 25
+    assert not dispatcher.running
+
+
+def test_post_from_another_thread():
+    received = []
+
+    async def main():
+        dispatcher = NotificationDispatcher()
+        service = NotificationService(dispatcher=dispatcher)
+        service.subscribe(Event.GAMER_CREATED, received.append)
+        await dispatcher.start()
+        await asyncio.to_thread(service.post, notification())
+        await dispatcher.drain(timeout=5)
+
+    asyncio.run(main())
+
+    assert received == [notification()]
+
+
+def test_failing_handler_is_retried_with_backoff():
+    attempts = []
+
+    def flaky(n: Notification) -> None:
+        attempts.append(n)
+        if len(attempts) < 3:
+            raise RuntimeError
+
+    async def main():
+        dispatcher = NotificationDispatcher(max_retries=3, retry_backoff=0.001)
+        await dispatcher.start()
+        dispatcher.submit(flaky, notification())
+        await dispatcher.drain(timeout=5)
+        return dispatcher
+
+    dispatcher = asyncio.run(main())
+
+    assert len(attempts) == 3
+    assert dispatcher.delivered == 1
+    assert dispatcher.failed == 0
+
+
+def test_handler_failing_every_retry_is_counted():
+    def broken(n: Notification) -> None:
+        raise RuntimeError
+
+    async def main():
+        dispatcher = NotificationDispatcher(max_retries=2, retry_backoff=0.001)
+        await dispatcher.start()
+        dispatcher.submit(broken, notification())
+        await dispatcher.drain(timeout=5)
+        return dispatcher
+
+    dispatcher = asyncio.run(main())
+
+    assert dispatcher.failed == 1
+    assert dispatcher.delivered == 0
+
+
+def overflow(policy: OverflowPolicy) -> tuple[list[str], NotificationDispatcher]:
+    received = []
+    release = threading.Event()
+
+    def blocking(n: Notification) -> None:
+        release.wait()
+        received.append(n.message)
+
+    async def main():
+        dispatcher = NotificationDispatcher(
+            max_queue_size=2, workers=1, batch_size=1, overflow_policy=policy
+        )
+        await dispatcher.start()
+        dispatcher.submit(blocking, notification("0"))
+        await asyncio.sleep(0.01)  # let the worker pick up the first delivery
+        for i in range(1, 5):
+            dispatcher.submit(blocking, notification(str(i)))
+        release.set()
+        await dispatcher.drain(timeout=5)
+        return dispatcher
+
+    return received, asyncio.run(main())
+
+
+def test_full_queue_drops_oldest():
+    received, dispatcher = overflow(OverflowPolicy.DROP_OLDEST)
+
+    assert received == ["0", "3", "4"]
+    assert dispatcher.dropped == 2
+
+
+def test_full_queue_drops_newest():
+    received, dispatcher = overflow(OverflowPolicy.DROP_NEWEST)
+
+    assert received == ["0", "1", "2"]
+    assert dispatcher.dropped == 2
+
+
+def test_handlers_run_by_priority_then_subscription_order():
+    calls = []
+    service = NotificationService()
+    service.subscribe(Event.GAMER_CREATED, lambda n: calls.append("low"), priority=-1)
+    service.subscribe(Event.GAMER_CREATED, lambda n: calls.append("first"))
+    service.subscribe(Event.GAMER_CREATED, lambda n: calls.append("high"), priority=10)
+    service.subscribe(Event.GAMER_CREATED, lambda n: calls.append("second"))
+
+    service.post(notification())
+
+    assert calls == ["high", "first", "second", "low"]
+
+
+def test_wildcard_subscriptions():
+    everything, swaps = [], []
+    service = NotificationService()
+    service.subscribe("*", everything.append)
+    service.subscribe("swap_*", swaps.append)
+
+    service.post(notification())
+    service.post(Notification(event=Event.SWAP_CREATED, message="swap"))
+
+    assert [n.event for n in everything] == [Event.GAMER_CREATED, Event.SWAP_CREATED]
+    assert [n.event for n in swaps] == [Event.SWAP_CREATED]
+
+
+def test_unsubscribe():
+    received = []
+    service = NotificationService()
+    service.subscribe("*", received.append)
+    service.unsubscribe("*", received.append)
+    service.unsubscribe(Event.GAMER_CREATED, received.append)  # not subscribed: no-op
+
+    service.post(notification())
+
+    assert received == []
+
+
+def test_concurrent_subscribe_keeps_every_handler():
+    service = NotificationService()
+    handlers = [lambda n, i=i: None for i in range(400)]
+
+    def subscribe(chunk):
+        for handler in chunk:
+            service.subscribe(Event.GAMER_CREATED, handler)
+
+    threads = [threading.Thread(target=subscribe, args=(handlers[i::8],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(service.handlers(Event.GAMER_CREATED)) == set(handlers)
+
+
+def test_dispatch_waits_for_room_in_full_queue():
+    received = []
+    release = threading.Event()
+
+    def blocking(n: Notification) -> None:
+        release.wait()
+        received.append(n.message)
+
+    async def main():
+        dispatcher = NotificationDispatcher(
+            max_queue_size=1, workers=1, batch_size=1, overflow_policy=OverflowPolicy.DROP_NEWEST
+        )
+        await dispatcher.start()
+        dispatcher.submit(blocking, notification("0"))
+        await asyncio.sleep(0.01)  # let the worker pick up the first delivery
+        dispatcher.submit(blocking, notification("1"))
+        asyncio.get_running_loop().call_later(0.01, release.set)
+        delivered = await dispatcher.dispatch(blocking, notification("2"))
+        await dispatcher.drain(timeout=5)
+        return delivered, dispatcher
+
+    delivered, dispatcher = asyncio.run(main())
+    assert delivered is True
+    assert received == ["0", "1", "2"]
+    assert dispatcher.dropped == 0
+
+
+def test_dispatch_reports_evicted_delivery_as_unattempted():
+    release = threading.Event()
+
+    def blocking(n: Notification) -> None:
+        release.wait()
+
+    async def main():
+        dispatcher = NotificationDispatcher(
+            max_queue_size=1, workers=1, batch_size=1, overflow_policy=OverflowPolicy.DROP_OLDEST
+        )
+        await dispatcher.start()
+        dispatcher.submit(blocking, notification("0"))
+        await asyncio.sleep(0.01)  # let the worker pick up the first delivery
+        dispatched = asyncio.create_task(dispatcher.dispatch(blocking, notification("1")))
+        await asyncio.sleep(0.01)
+        dispatcher.submit(blocking, notification("2"))
+        outcome = await dispatched
+        release.set()
+        await dispatcher.drain(timeout=5)
+        return outcome
+
+    assert asyncio.run(main()) is None
@@ -0,0 +1,238 @@
+import asyncio
+from datetime import timedelta
+import threading
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.dependencies.notifications import (
+    Event,
+    Notification,
+    NotificationDispatcher,
+    NotificationService,
+    OverflowPolicy,
+)
+from app.models import Game, Gamer, OutboxMessage, utcnow
+from app.outbox import OutboxRelay
+
+
+def relay_for(session: Session, *handlers, dispatcher: NotificationDispatcher | None = None) -> OutboxRelay:
+    service = NotificationService(dispatcher=dispatcher)
+    for event in Event:
+        for handler in handlers:
+            service.subscribe(event, handler)
+    return OutboxRelay(session_factory=sessionmaker(bind=session.get_bind()), service=service)
+
+
+def outbox(session: Session) -> list[OutboxMessage]:
+    session.expire_all()
+    return session.execute(select(OutboxMessage).order_by(OutboxMessage.id)).scalars().all()
+
+
+def test_create_gamer_writes_outbox_message(session: Session, client: TestClient) -> None:
+    response = client.post("/gamers", json={"name": "Dr. Ivo Robotnik", "email": "eggman@robotnik.com"})
+    assert response.status_code == 200, response.text
+
+    [message] = outbox(session)
+    assert message.event == Event.GAMER_CREATED
+    assert message.key.startswith(f"gamer_created:{response.json()['id']}:")
+    assert message.delivered_at is None
+
+
+def test_failed_create_gamer_writes_no_outbox_message(session: Session, client: TestClient) -> None:
+    gamer = {"name": "Dr. Ivo Robotnik", "email": "eggman@robotnik.com"}
+    client.post("/gamers", json=gamer)
+    response = client.post("/gamers", json=gamer)
+    assert response.status_code == 422
+
+    assert len(outbox(session)) == 1
+
+
+def test_create_gamers_bulk_writes_outbox_messages(session: Session, client: TestClient) -> None:
+    gamers = [{"name": f"gamer{n}", "email": f"gamer{n}@retro.com"} for n in range(3)]
+    response = client.post("/gamers/bulk", json=gamers)
+    assert response.status_code == 200, response.text
+
+    ids = [message.data["gamer_id"] for message in outbox(session)]
+    assert ids == [gamer["id"] for gamer in response.json()["items"]]
+
+
+def test_create_swap_writes_outbox_message(session: Session, client: TestClient) -> None:
+    proposer = Gamer(name="Player One", email="press@start.com")
+    acceptor = Gamer(name="Player Two", email="insert@coin.com")
+    session.add_all([proposer, acceptor])
+    session.commit()
+    proposer_game = Game(title="Sonic The Hedgehog", platform="SEGA Mega Drive", gamer_id=proposer.id)
+    acceptor_game = Game(title="Super Mario Land", platform="Nintendo GAME BOY", gamer_id=acceptor.id)
+    session.add_all([proposer_game, acceptor_game])
+    session.commit()
+
+    swap_data = {
+        "proposer": {"id": proposer.id, "game_ids": [proposer_game.id]},
+        "acceptor": {"id": acceptor.id, "game_ids": [acceptor_game.id]},
+    }
+    response = client.post("/swaps", json=swap_data)
+    assert response.status_code == 200, response.text
+
+    [message] = outbox(session)
+    assert message.event == Event.SWAP_CREATED
+    assert message.key.startswith(f"swap_created:{response.json()['id']}:")
+    assert message.message == "Swap created between Player One and Player Two!"
+
+
+def test_relay_delivers_pending_messages(session: Session, client: TestClient) -> None:
+    for n in range(3):
+        client.post("/gamers", json={"name": f"gamer{n}", "email": f"gamer{n}@retro.com"})
+    received: list[Notification] = []
+    relay = relay_for(session, received.append)
+
+    assert asyncio.run(relay.relay_batch()) == 3
+    assert [n.message for n in received] == ["Welcome gamer0!", "Welcome gamer1!", "Welcome gamer2!"]
+    assert all(message.delivered_at is not None for message in outbox(session))
+    assert asyncio.run(relay.relay_batch()) == 0
+    assert len(received) == 3
+    assert relay.lag == 0.0
+
+
+def test_relay_retries_failed_messages(session: Session, client: TestClient) -> None:
+    client.post("/gamers", json={"name": "Dr. Ivo Robotnik", "email": "eggman@robotnik.com"})
+    received: list[Notification] = []
+
+    def flaky(notification: Notification) -> None:
+        received.append(notification)
+        if len(received) == 1:
+            raise RuntimeError
+
+    relay = relay_for(session, flaky)
+    asyncio.run(relay.relay_batch())
+    [message] = outbox(session)
+    assert (message.attempts, message.delivered_at) == (1, None)
+    assert relay.failed == 1
+
+    asyncio.run(relay.relay_batch())
+    [message] = outbox(session)
+    assert message.attempts == 2 and message.delivered_at is not None
+    # Redelivered with the same idempotency key
+    assert received[0].key == received[1].key == message.key
+
+
+def test_relay_gives_up_after_max_attempts(session: Session, client: TestClient) -> None:
+    client.post("/gamers", json={"name": "Dr. Ivo Robotnik", "email": "eggman@robotnik.com"})
+    def broken(notification: Notification) -> None:
+        raise RuntimeError
+
+    relay = relay_for(session, broken)
+    relay.max_attempts = 2
+    for _ in range(3):
+        asyncio.run(relay.relay_batch())
+
+    [message] = outbox(session)
+    assert message.attempts == 2
+    assert message.failed_at is not None
+    assert relay.lag == 0.0
+    assert relay.dead_letters == 1
+
+
+def test_relay_prunes_old_dead_letters(session: Session, client: TestClient) -> None:
+    client.post("/gamers", json={"name": "Dr. Ivo Robotnik", "email": "eggman@robotnik.com"})
+    def broken(notification: Notification) -> None:
+        raise RuntimeError
+
+    relay = relay_for(session, broken)
+    relay.max_attempts = 1
+    asyncio.run(relay.relay_batch())
+    asyncio.run(relay.relay_batch())
+    assert len(outbox(session)) == 1
+
+    session.execute(update(OutboxMessage).values(failed_at=utcnow() - timedelta(days=8)))
+    session.commit()
+    asyncio.run(relay.relay_batch())
+
+    assert outbox(session) == []
+    assert relay.dead_letters == 0
+
+
+def test_relay_delivers_through_running_dispatcher(session: Session, client: TestClient) -> None:
+    for n in range(2):
+        client.post("/gamers", json={"name": f"gamer{n}", "email": f"gamer{n}@retro.com"})
+    received: list[Notification] = []
+
+    def flaky(notification: Notification) -> None:
+        # gamer1 fails every retry of the dispatcher
+        if notification.message == "Welcome gamer1!":
+            raise RuntimeError
+        received.append(notification)
+
+    async def main() -> OutboxRelay:
+        dispatcher = NotificationDispatcher(max_retries=1, retry_backoff=0.001)
+        relay = relay_for(session, flaky, dispatcher=dispatcher)
+        await dispatcher.start()
+        await relay.relay_batch()
+        await dispatcher.drain(timeout=5)
+        return relay
+
+    relay = asyncio.run(main())
+
+    assert [n.message for n in received] == ["Welcome gamer0!"]
+    assert [(message.attempts, message.delivered_at is not None) for message in outbox(session)] == [
+        (1, True), (1, False)
+    ]
+    assert (relay.delivered, relay.failed) == (1, 1)
+
+
+def test_relay_leaves_messages_dropped_for_backpressure_pending(session: Session, client: TestClient) -> None:
+    client.post("/gamers", json={"name": "Dr. Ivo Robotnik", "email": "eggman@robotnik.com"})
+    received: list[Notification] = []
+    release = threading.Event()
+
+    def blocking(notification: Notification) -> None:
+        release.wait()
+
+    async def main() -> OutboxRelay:
+        dispatcher = NotificationDispatcher(
+            max_queue_size=1, workers=1, batch_size=1, overflow_policy=OverflowPolicy.DROP_OLDEST
+        )
+        relay = relay_for(session, received.append, dispatcher=dispatcher)
+        await dispatcher.start()
+        dispatcher.submit(blocking, Notification(Event.GAMER_CREATED, "busy"))
+        await asyncio.sleep(0.01)  # the worker is busy, the relay's delivery queued
+        relayed = asyncio.create_task(relay.relay_batch())
+        await asyncio.sleep(0.05)
+        # A request's notification evicts it
+        dispatcher.submit(blocking, Notification(Event.GAMER_CREATED, "request"))
+        release.set()
+        await relayed
+        await dispatcher.drain(timeout=5)
+        return relay
+
+    relay = asyncio.run(main())
+
+    [message] = outbox(session)
+    assert received == []
+    assert (message.attempts, message.delivered_at) == (0, None)
+    assert (relay.delivered, relay.failed) == (0, 0)
+
+def test_relay_lag_is_age_of_oldest_pending_message(session: Session, client: TestClient) -> None:
+    client.post("/gamers", json={"name": "Dr. Ivo Robotnik", "email": "eggman@robotnik.com"})
+    session.execute(update(OutboxMessage).values(created_at=utcnow() - timedelta(minutes=5)))
+    session.commit()
+    def broken(notification: Notification) -> None:
+        raise RuntimeError
+
+    relay = relay_for(session, broken)
+    asyncio.run(relay.relay_batch())
+
+    assert 300 <= relay.lag < 310
+
+
+def test_relay_prunes_old_delivered_messages(session: Session, client: TestClient) -> None:
+    client.post("/gamers", json={"name": "Dr. Ivo Robotnik", "email": "eggman@robotnik.com"})
+    relay = relay_for(session)
+    asyncio.run(relay.relay_batch())
+    session.execute(update(OutboxMessage).values(delivered_at=utcnow() - timedelta(days=2)))
+    session.commit()
+
+    asyncio.run(relay.relay_batch())
+
+    assert outbox(session) == []
@@ -0,0 +1,56 @@
+import logging
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy.orm import Session
+
+from app.main import app
+from app.models import Swap
+from app.profiling import ProfilingMiddleware, install_slow_query_log, parameter_shape
+
+
+def test_parameter_shape_hides_values() -> None:
+    assert parameter_shape(("press@start.com", 1)) == ("str", "int")
+    assert parameter_shape({"email": "press@start.com"}) == {"email": "str"}
+    assert parameter_shape([("a", 1), ("b", 2)]) == "2 x ('str', 'int')"
+
+
+def test_slow_queries_name_crud_function_and_route(
+        swap: Swap, 
+        session: Session, 
+        client: TestClient, 
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+    install_slow_query_log(session.get_bind(), threshold=0)
+    swap_id = swap.id
+
+    with caplog.at_level(logging.WARNING, logger="app.profiling"):
+        TestClient(ProfilingMiddleware(app)).get(f"/swaps/{swap_id}")
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(
+        "in app.crud.swaps.get_swap during GET /swaps/{swap_id}: SELECT" in message 
+        and "parameters: ('int',)" in message
+        for message in messages
+    ), messages
+    assert not any(str(swap_id) in message.split("parameters:")[1] for message in messages)
+
+
+def test_profiled_request_returns_report(swap: Swap, client: TestClient) -> None:
+    profiled = TestClient(ProfilingMiddleware(app, enabled=True))
+
+    response = profiled.get("/swaps", headers={"X-Profile": "1"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.headers["X-Profiled-Status"] == "200"
+    assert response.text.startswith("GET /swaps: 200 in ")
+    # CRUD work runs in the threadpool and is profiled there
+    assert "get_swaps" in response.text
+
+
+def test_profiling_needs_to_be_enabled(swap: Swap, client: TestClient) -> None:
+    response = TestClient(ProfilingMiddleware(app)).get("/swaps", params={"profile": "1"})
+
+    assert response.headers["content-type"] == "application/json"
+    assert len(response.json()) == 1
@@ -0,0 +1,171 @@
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+import re
+import pytest
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import Session
+
+import app.crud.gamers as gamers
+import app.crud.games as games
+import app.crud.outbox as outbox
+import app.crud.stats as stats
+import app.crud.swaps as swaps
+import app.crud.wishes as wishes
+from app.migrations import upgrade
+from app.models import Base, Gamer, Swap, utcnow
+from app.schemas.swap import GamerWithGames, SwapCreate
+
+
+FULL_SCAN = re.compile(r"\bSCAN (game|gamer|swap|outbox|title_stats)\b")
+
+
+@contextmanager
+def captured_statements(session: Session) -> Iterator[list[tuple[str, tuple]]]:
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def full_scans(session: Session, fn: Callable[[], object]) -> list[str]:
+    with captured_statements(session) as statements:
+        fn()
+    connection = session.connection()
+    scans = []
+    for statement, parameters in statements:
+        plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        scans.extend(f"{row[3]} <- {statement}" for row in plan if FULL_SCAN.search(row[3]))
+    return scans
+
+
+# Called as the endpoints call them: first pages have no cursor
+HOT_QUERIES = {
+    "get_games": lambda s, ids: games.get_games(s, 100),
+    "get_games(after)": lambda s, ids: games.get_games(s, 100, ids["proposer"]),
+    "get_available_games": lambda s, ids: games.get_available_games(s, 100),
+    "get_available_games(after)": lambda s, ids: games.get_available_games(s, 100, ids["proposer"]),
+    "get_gamers": lambda s, ids: gamers.get_gamers(s, 100),
+    "get_gamers(after)": lambda s, ids: gamers.get_gamers(s, 100, ids["proposer"]),
+    "get_gamers_who_own_game(title)": lambda s, ids: gamers.get_gamers_who_own_game(s, "Ristar", None, 100),
+    "get_gamers_who_own_game(platform)": lambda s, ids: gamers.get_gamers_who_own_game(s, None, "SEGA Mega Drive", 100),
+    "get_gamers_who_own_game(title, platform)": lambda s, ids: gamers.get_gamers_who_own_game(s, "Ristar", "SEGA Mega Drive"),
+    "search_games": lambda s, ids: games.search_games(s, "sonic", 100),
+    "get_gamer_games": lambda s, ids: games.get_gamer_games(s, ids["proposer"]),
+    "get_gamer_stats": lambda s, ids: stats.get_gamer_stats(s, ids["proposer"]),
+    "get_most_wanted": lambda s, ids: stats.get_most_wanted(s, 100),
+    "get_matches": lambda s, ids: wishes.get_matches(s, ids["proposer"], 100),
+    "get_swap": lambda s, ids: swaps.get_swap(s, ids["swap"]),
+    "get_swaps": lambda s, ids: swaps.get_swaps(s, 100),
+    "get_swaps(after)": lambda s, ids: swaps.get_swaps(s, 100, ids["swap"]),
+    "proposer_swaps": lambda s, ids: s.get(Gamer, ids["proposer"]).proposer_swaps,
+    "acceptor_swaps": lambda s, ids: s.get(Gamer, ids["acceptor"]).acceptor_swaps,
+    "delete_swap": lambda s, ids: swaps.delete_swap(s, ids["swap"]),
+    "get_pending_messages": lambda s, ids: outbox.get_pending_messages(s, 100, 10),
+    "get_relay_lag": lambda s, ids: outbox.get_relay_lag(s, 10),
+    "count_dead_letters": lambda s, ids: outbox.count_dead_letters(s),
+    "prune_messages": lambda s, ids: outbox.prune_messages(s, utcnow(), utcnow()),
+}
+
+# A first page without a cursor walks the primary key from the start and stops
+# after `limit` rows; SQLite reports that bounded walk as a SCAN.
+EXPECTED_SCANS = {
+    "get_games": ["SCAN game"],
+    "get_gamers": ["SCAN gamer"],
+    "get_swaps": ["SCAN swap"],
+}
+
+
+@pytest.mark.parametrize("query", HOT_QUERIES)
+def test_hot_query_uses_indexes(query: str, swap: Swap, session: Session) -> None:
+    ids = {"swap": swap.id, "proposer": swap.proposer_id, "acceptor": swap.acceptor_id}
+    session.expunge_all()
+
+    scans = full_scans(session, lambda: HOT_QUERIES[query](session, ids))
+    assert [scan.split(" <- ")[0] for scan in scans] == EXPECTED_SCANS.get(query, [])
+
+
+def test_get_matches_starts_from_own_wishlist(swap: Swap, session: Session) -> None:
+    gamer_id = swap.proposer_id
+    with captured_statements(session) as statements:
+        wishes.get_matches(session, gamer_id, 100)
+
+    statement, parameters = statements[-1]
+    plan = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    # Seeking swap_id alone would walk every available game in the catalogue
+    assert not any("(swap_id=?)" in row[3] for row in plan)
+
+
+def test_create_swap_uses_indexes(swap: Swap, session: Session) -> None:
+    proposer_id, acceptor_id = swap.proposer_id, swap.acceptor_id
+    swaps.delete_swap(session, swap.id)
+    game_ids = {game.gamer_id: game.id for game in games.get_games(session)}
+    params = SwapCreate(
+        proposer=GamerWithGames(id=proposer_id, game_ids={game_ids[proposer_id]}),
+        acceptor=GamerWithGames(id=acceptor_id, game_ids={game_ids[acceptor_id]}),
+    )
+
+    create = lambda: swaps.create_swap(session, params)
+    assert full_scans(session, create) == []
+
+
+def test_upgrade_adds_missing_indexes() -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_game_title_platform"))
+        connection.execute(text("DROP INDEX ix_swap_proposer_id"))
+        connection.execute(text("DROP INDEX ix_game_swap_id_title_platform"))
+
+    with engine.begin() as connection:
+        upgrade(connection)
+
+    inspector = inspect(engine)
+    assert {"ix_game_title_platform", "ix_game_swap_id_title_platform"} <= {
+        index["name"] for index in inspector.get_indexes("game")
+    }
+    assert "ix_swap_proposer_id" in {index["name"] for index in inspector.get_indexes("swap")}
+
+
+def test_upgrade_drops_legacy_indexes() -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE INDEX ix_game_title ON game (title)"))
+
+    with engine.begin() as connection:
+        upgrade(connection)
+
+    assert "ix_game_title" not in {index["name"] for index in inspect(engine).get_indexes("game")}
+
+
+def test_upgrade_adds_missing_nullable_columns() -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE outbox DROP COLUMN data"))
+
+    with engine.begin() as connection:
+        upgrade(connection)
+
+    assert "data" in {column["name"] for column in inspect(engine).get_columns("outbox")}
+
+
+def test_upgrade_adds_version_columns_with_default() -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE game DROP COLUMN version"))
+        connection.execute(text("INSERT INTO gamer (name, email) VALUES ('Player One', 'press@start.com')"))
+        connection.execute(text("INSERT INTO game (title, platform, gamer_id) VALUES ('Tetris', 'Game Boy', 1)"))
+
+    with engine.begin() as connection:
+        upgrade(connection)
+        assert connection.execute(text("SELECT version FROM game")).scalar_one() == 1
@@ -0,0 +1,305 @@
+import asyncio
+from collections.abc import Callable, Iterator
+from enum import Enum
+import os
+import time
+import pytest
+
+from sqlalchemy import Engine, event, insert, update
+from sqlalchemy.orm import Session
+
+import app.crud.gamers as gamers
+import app.crud.games as games
+import app.crud.stats as stats
+import app.crud.swaps as swaps
+import app.crud.wishes as wishes
+from app.cycles import trade_graph
+from app.models import Game, Gamer, Swap, Wish
+from app.schemas.game import GameBulkUpdate, GameCreate, GameUpdate
+from app.schemas.gamer import GamerCreate, GamerUpdate
+from app.schemas.swap import GamerWithGames, SwapCreate
+import app.trades as trades
+from tests.conftest import count_statements, create_test_engine
+
+
+# Opt-in: seeding a million games takes a while, e.g.
+#   GAMESWAP_SCALE_ROWS=1000,100000,1000000 pytest tests/test_scale.py
+SIZES = sorted(int(rows) for rows in os.environ.get("GAMESWAP_SCALE_ROWS", "").split(",") if rows.strip())
+
+pytestmark = pytest.mark.skipif(
+    len(SIZES) < 2, reason="set GAMESWAP_SCALE_ROWS to two or more game counts to run scale tests"
+)
+
+PLATFORMS = ("SEGA Mega Drive", "Nintendo GAME BOY", "Super Nintendo", "PlayStation", "Neo Geo")
+# Every gamer's third game
+POPULAR = ("Tetris", "Nintendo GAME BOY")
+GAMES_PER_GAMER = 10
+BATCH_SIZE = 50_000
+REPEAT = 5
+
+
+class Complexity(Enum):
+    # Indexed lookups and keyset pages: allow for B-tree depth and cache misses
+    CONSTANT = 10
+    # Full reads (streams, ranking, graph builds): at most twice the growth in rows
+    LINEAR = 2
+
+    def allows(self, slowdown: float, growth: float) -> bool:
+        if self is Complexity.CONSTANT:
+            return slowdown <= self.value
+        return slowdown <= self.value * growth
+
+
+def populate(engine: Engine, rows: int) -> None:
+    """`rows` games, ten per gamer; every pair of the first fifth of gamers has
+    swapped their first games, and each gamer wishes for the next one's first game.
+    Every gamer's third game is the POPULAR title.
+
+    Ids are dense from 1, so game n belongs to gamer (n - 1) // 10 + 1.
+    """
+    gamer_count = rows // GAMES_PER_GAMER
+    titles = max(rows // 20, 1)
+    swap_count = rows // 100
+    with engine.begin() as connection:
+        connection.execute(insert(Gamer), [
+            {"name": f"gamer{n}", "email": f"gamer{n}@retro.com"} for n in range(1, gamer_count + 1)
+        ])
+        for start in range(1, rows + 1, BATCH_SIZE):
+            connection.execute(insert(Game), [
+                {
+                    "title": f"Title {n % titles}",
+                    "platform": PLATFORMS[n % len(PLATFORMS)],
+                    "gamer_id": (n - 1) // GAMES_PER_GAMER + 1,
+                } if n % GAMES_PER_GAMER != 3 else {
+                    "title": POPULAR[0],
+                    "platform": POPULAR[1],
+                    "gamer_id": (n - 1) // GAMES_PER_GAMER + 1,
+                }
+                for n in range(start, min(start + BATCH_SIZE, rows + 1))
+            ])
+        connection.execute(insert(Swap), [
+            {"proposer_id": 2 * n - 1, "acceptor_id": 2 * n} for n in range(1, swap_count + 1)
+        ])
+        connection.execute(
+            update(Game)
+            .where((Game.id - 1) % GAMES_PER_GAMER == 0, Game.id <= swap_count * 2 * GAMES_PER_GAMER)
+            .values(swap_id=(Game.id - 1) // (2 * GAMES_PER_GAMER) + 1)
+        )
+        connection.execute(insert(Wish), [
+            {
+                "gamer_id": n,
+                "title": f"Title {(n * GAMES_PER_GAMER + 1) % titles}",
+                "platform": PLATFORMS[(n * GAMES_PER_GAMER + 1) % len(PLATFORMS)],
+            }
+            for n in range(1, gamer_count)
+        ])
+    with Session(engine) as session:
+        stats.reconcile_stats(session)
+
+
+def seeded_ids(rows: int) -> dict:
+    # The last two gamers are not in a swap; the game is the last gamer's last one
+    gamer = rows // GAMES_PER_GAMER
+    return {
+        "gamer": gamer,
+        "other_gamer": gamer - 1,
+        "game": rows,
+        "other_game": rows - GAMES_PER_GAMER,
+        "title": f"Title {rows % max(rows // 20, 1)}",
+        "platform": PLATFORMS[rows % len(PLATFORMS)],
+        "swap": 1,
+        "middle": rows // 2,
+    }
+
+
+def consume(chunks: Iterator[list]) -> int:
+    return sum(len(chunk) for chunk in chunks)
+
+
+def get_matches_for_popular_wish(session: Session, ids: dict) -> object:
+    # A tenth of all games match the wish
+    session.add(Wish(gamer_id=ids["gamer"], title=POPULAR[0], platform=POPULAR[1]))
+    session.flush()
+    return wishes.get_matches(session, ids["gamer"], 100)
+
+
+def new_games(ids: dict, count: int) -> dict[int, GameCreate]:
+    return {
+        n: GameCreate(title=f"New Title {n}", platform="Neo Geo", gamer_id=ids["gamer"])
+        for n in range(count)
+    }
+
+
+Operation = Callable[[Session, dict], object]
+
+OPERATIONS: dict[str, tuple[Complexity, Operation]] = {
+    # app/crud/gamers.py
+    "get_gamer": (Complexity.CONSTANT, lambda s, ids: gamers.get_gamer(s, ids["gamer"])),
+    "get_gamer_version": (Complexity.CONSTANT, lambda s, ids: gamers.get_gamer_version(s, ids["gamer"])),
+    "get_gamers": (Complexity.CONSTANT, lambda s, ids: gamers.get_gamers(s, 100, ids["middle"] // GAMES_PER_GAMER)),
+    "stream_gamers": (Complexity.LINEAR, lambda s, ids: consume(gamers.stream_gamers(s))),
+    # A platform matches a fifth of the games here, and its IN subquery reads all of them
+    "stream_gamers(title, platform)": (
+        Complexity.LINEAR, lambda s, ids: consume(gamers.stream_gamers(s, ids["title"], ids["platform"]))
+    ),
+    "create_gamer": (
+        Complexity.CONSTANT, lambda s, ids: gamers.create_gamer(s, GamerCreate(name="New", email="new@retro.com"))
+    ),
+    "create_gamers": (Complexity.CONSTANT, lambda s, ids: gamers.create_gamers(s, {
+        n: GamerCreate(name=f"New {n}", email=f"new{n}@retro.com") for n in range(10)
+    })),
+    "update_gamer": (
+        Complexity.CONSTANT, lambda s, ids: gamers.update_gamer(s, ids["gamer"], GamerUpdate(name="Renamed"))
+    ),
+    "delete_gamer": (Complexity.CONSTANT, lambda s, ids: gamers.delete_gamer(s, ids["gamer"])),
+    "get_gamers_who_own_game(title)": (
+        Complexity.CONSTANT, lambda s, ids: gamers.get_gamers_who_own_game(s, ids["title"], None, 100)
+    ),
+    # Both page after reading every game on the platform, as stream_gamers(title, platform)
+    "get_gamers_who_own_game(platform)": (
+        Complexity.LINEAR, lambda s, ids: gamers.get_gamers_who_own_game(s, None, ids["platform"], 100)
+    ),
+    "get_gamers_who_own_game(title, platform)": (
+        Complexity.LINEAR, lambda s, ids: gamers.get_gamers_who_own_game(s, ids["title"], ids["platform"], 100)
+    ),
+    # app/crud/games.py
+    "get_game": (Complexity.CONSTANT, lambda s, ids: games.get_game(s, ids["game"])),
+    "get_game_version": (Complexity.CONSTANT, lambda s, ids: games.get_game_version(s, ids["game"])),
+    "get_games": (Complexity.CONSTANT, lambda s, ids: games.get_games(s, 100, ids["middle"])),
+    "get_available_games": (Complexity.CONSTANT, lambda s, ids: games.get_available_games(s, 100, ids["middle"])),
+    "get_gamer_games": (
+        Complexity.CONSTANT, lambda s, ids: games.get_gamer_games(s, ids["gamer"], expand=("gamer",))
+    ),
+    "get_gamer_game_versions": (
+        Complexity.CONSTANT, lambda s, ids: games.get_gamer_game_versions(s, ids["gamer"])
+    ),
+    "stream_games": (Complexity.LINEAR, lambda s, ids: consume(games.stream_games(s))),
+    "stream_games(gamer_id)": (
+        Complexity.CONSTANT, lambda s, ids: consume(games.stream_games(s, True, ids["gamer"]))
+    ),
+    "create_game": (Complexity.CONSTANT, lambda s, ids: games.create_game(s, new_games(ids, 1)[0])),
+    "create_games": (Complexity.CONSTANT, lambda s, ids: games.create_games(s, new_games(ids, 10))),
+    "import_games": (Complexity.CONSTANT, lambda s, ids: games.import_games(s, [
+        game.model_dump() for game in new_games(ids, 100).values()
+    ])),
+    "update_game": (
+        Complexity.CONSTANT, lambda s, ids: games.update_game(s, ids["game"], GameUpdate(title="Renamed"))
+    ),
+    "update_games": (Complexity.CONSTANT, lambda s, ids: games.update_games(s, {
+        n: GameBulkUpdate(id=ids["game"] - n, title=f"Renamed {n}") for n in range(10)
+    })),
+    "delete_game": (Complexity.CONSTANT, lambda s, ids: games.delete_game(s, ids["game"])),
+    "delete_games": (
+        Complexity.CONSTANT, lambda s, ids: games.delete_games(s, [ids["game"] - n for n in range(10)])
+    ),
+    # Ranks every title sharing a trigram with the query
+    "search_games": (Complexity.LINEAR, lambda s, ids: games.search_games(s, ids["title"], 100)),
+    # app/crud/swaps.py
+    "get_swap": (Complexity.CONSTANT, lambda s, ids: swaps.get_swap(s, ids["swap"])),
+    "get_swap_versions": (Complexity.CONSTANT, lambda s, ids: swaps.get_swap_versions(s, ids["swap"])),
+    "get_swaps": (Complexity.CONSTANT, lambda s, ids: swaps.get_swaps(s, 100)),
+    "stream_swaps": (Complexity.LINEAR, lambda s, ids: consume(swaps.stream_swaps(s))),
+    "create_swap": (Complexity.CONSTANT, lambda s, ids: swaps.create_swap(s, SwapCreate(
+        proposer=GamerWithGames(id=ids["gamer"], game_ids={ids["game"]}),
+        acceptor=GamerWithGames(id=ids["other_gamer"], game_ids={ids["other_game"]}),
+    ))),
+    "delete_swap": (Complexity.CONSTANT, lambda s, ids: swaps.delete_swap(s, ids["swap"])),
+    "get_trade_graph_versions": (Complexity.CONSTANT, lambda s, ids: swaps.get_trade_graph_versions(s)),
+    "stream_trade_graph_games": (Complexity.LINEAR, lambda s, ids: consume(swaps.stream_trade_graph_games(s))),
+    "stream_trade_graph_wishes": (Complexity.LINEAR, lambda s, ids: consume(swaps.stream_trade_graph_wishes(s))),
+    # app/trades.py: the warm trade graph is loaded from every available game
+    # and wish, once per process; the others read it (see WARM_TRADE_GRAPH)
+    "load_trade_graph": (Complexity.LINEAR, lambda s, ids: asyncio.run(trades.load_trade_graph(s))),
+    "refresh_trade_graph": (Complexity.CONSTANT, lambda s, ids: asyncio.run(trades.refresh_trade_graph(s))),
+    "get_trade_graph_state": (Complexity.CONSTANT, lambda s, ids: asyncio.run(trades.get_trade_graph_state(s))),
+    # Searches from every gamer with a wish until it has `limit` cycles
+    "get_swap_suggestions": (
+        Complexity.LINEAR, lambda s, ids: asyncio.run(trades.get_swap_suggestions(s, 4, 100))
+    ),
+    "get_swap_suggestions(gamer_id)": (
+        Complexity.CONSTANT,
+        lambda s, ids: asyncio.run(trades.get_swap_suggestions(s, 4, 100, ids["other_gamer"])),
+    ),
+    # app/crud/wishes.py
+    "get_matches": (Complexity.CONSTANT, lambda s, ids: wishes.get_matches(s, ids["other_gamer"], 100)),
+    "get_matches(popular title)": (Complexity.LINEAR, get_matches_for_popular_wish),
+    # app/crud/stats.py
+    "get_gamer_stats": (Complexity.CONSTANT, lambda s, ids: stats.get_gamer_stats(s, ids["gamer"])),
+}
+
+# Measured with the trade graph of the database already loaded, as it is once a process is up
+WARM_TRADE_GRAPH = {
+    "refresh_trade_graph", "get_trade_graph_state", "get_swap_suggestions", "get_swap_suggestions(gamer_id)"
+}
+
+
+def savepoint_engine() -> Engine:
+    # pysqlite emits its own BEGIN and breaks SAVEPOINT; let SQLAlchemy do it instead
+    engine = create_test_engine()
+    with engine.connect() as connection:
+        # The pool holds a single connection, already opened by create_all
+        connection.connection.driver_connection.isolation_level = None
+    event.listen(engine, "begin", lambda connection: connection.exec_driver_sql("BEGIN"))
+    return engine
+
+
+@pytest.fixture(scope="module")
+def databases() -> Iterator[dict[int, Engine]]:
+    engines = {}
+    for rows in SIZES:
+        engines[rows] = savepoint_engine()
+        populate(engines[rows], rows)
+    yield engines
+    for engine in engines.values():
+        engine.dispose()
+
+
+def measure(engine: Engine, rows: int, operation: Operation, warm: bool = False) -> tuple[int, float]:
+    """Statements run by one call, and its best time over REPEAT calls.
+
+    Each call runs in a savepoint that is rolled back, so writes leave the
+    seeded data as it was. With `warm` the trade graph is loaded beforehand.
+    """
+    ids = seeded_ids(rows)
+    counts, timings = set(), []
+    trade_graph.clear()
+    if warm:
+        # Streams join the session's connection: the pool only has the one
+        with engine.connect() as connection, Session(connection) as session:
+            asyncio.run(trades.load_trade_graph(session))
+    for _ in range(REPEAT):
+        with engine.connect() as connection:
+            transaction = connection.begin()
+            with Session(connection, autoflush=False, join_transaction_mode="create_savepoint") as session:
+                with count_statements(session) as statements:
+                    start = time.perf_counter()
+                    operation(session, ids)
+                    timings.append(time.perf_counter() - start)
+            transaction.rollback()
+        counts.add(len(statements))
+    assert len(counts) == 1, f"statement count varies between calls: {counts}"
+    return counts.pop(), min(timings)
+
+
+@pytest.mark.parametrize("name", OPERATIONS)
+def test_crud_scales(name: str, databases: dict[int, Engine]) -> None:
+    complexity, operation = OPERATIONS[name]
+    results = {
+        rows: measure(engine, rows, operation, name in WARM_TRADE_GRAPH) for rows, engine in databases.items()
+    }
+    summary = ", ".join(
+        f"{rows} rows: {count} statements in {seconds * 1000:.2f} ms"
+        for rows, (count, seconds) in results.items()
+    )
+
+    smallest, largest = SIZES[0], SIZES[-1]
+    counts = [count for count, _ in results.values()]
+    if complexity is Complexity.CONSTANT:
+        # The number of statements never depends on the size of the tables
+        assert len(set(counts)) == 1, summary
+    else:
+        # Streams may load relationships once per chunk, never once per row
+        assert counts[-1] <= counts[0] * largest / smallest, summary
+
+    slowdown = results[largest][1] / results[smallest][1]
+    assert complexity.allows(slowdown, largest / smallest), f"{slowdown:.1f}x slower ({complexity.name}): {summary}"
@@ -0,0 +1,128 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.crud.stats as stats
+from app.stats import StatsReconciler
+from app.models import Game, Gamer, GamerStats, PlatformStats, Swap, TitleStats
+
+
+def snapshot(session: Session) -> dict[str, list[tuple]]:
+    session.expire_all()
+    return {
+        "platforms": [
+            tuple(row) for row in session.execute(
+                select(PlatformStats.platform, PlatformStats.games, PlatformStats.available)
+                .where(PlatformStats.games != 0).order_by(PlatformStats.platform)
+            )
+        ],
+        "gamers": [
+            tuple(row) for row in session.execute(
+                select(GamerStats.gamer_id, GamerStats.swaps)
+                .where(GamerStats.swaps != 0).order_by(GamerStats.gamer_id)
+            )
+        ],
+        "titles": [
+            tuple(row) for row in session.execute(
+                select(TitleStats.title, TitleStats.platform, TitleStats.wishes)
+                .where(TitleStats.wishes != 0).order_by(TitleStats.title, TitleStats.platform)
+            )
+        ],
+    }
+
+
+def create_gamer(client: TestClient, n: int) -> int:
+    return client.post("/gamers", json={"name": f"gamer{n}", "email": f"gamer{n}@retro.com"}).json()["id"]
+
+
+def create_game(client: TestClient, gamer_id: int, title: str, platform: str) -> int:
+    return client.post("/games", json={"title": title, "platform": platform, "gamer_id": gamer_id}).json()["id"]
+
+
+def test_counters_follow_writes(session: Session, client: TestClient) -> None:
+    one, two, three = (create_gamer(client, n) for n in range(3))
+    sonic = create_game(client, one, "Sonic The Hedgehog", "SEGA Mega Drive")
+    mario = create_game(client, two, "Super Mario Land", "Game Boy")
+    create_game(client, two, "Tetris", "Game Boy")
+    client.post("/games/bulk", json=[{"title": "Ristar", "platform": "SEGA Mega Drive", "gamer_id": three}])
+    client.post(f"/gamers/{one}/wishlist", json={"title": "Tetris", "platform": "Game Boy"})
+    client.post(f"/gamers/{three}/wishlist", json={"title": "Tetris", "platform": "Game Boy"})
+    client.post(f"/gamers/{three}/wishlist", json={"title": "Ristar", "platform": "Game Gear"})
+    swap_data = {"proposer": {"id": one, "game_ids": [sonic]}, "acceptor": {"id": two, "game_ids": [mario]}}
+    client.post("/swaps", json=swap_data)
+
+    assert client.get("/stats/games").json() == {"games": 4, "available": 2, "in_swap": 2}
+    assert client.get("/stats/platforms").json() == [
+        {"platform": "Game Boy", "games": 2, "available": 1, "in_swap": 1},
+        {"platform": "SEGA Mega Drive", "games": 2, "available": 1, "in_swap": 1},
+    ]
+    assert client.get(f"/stats/gamers/{one}").json() == {"gamer_id": one, "swaps": 1}
+    assert client.get(f"/stats/gamers/{three}").json() == {"gamer_id": three, "swaps": 0}
+    assert client.get("/stats/most-wanted", params={"limit": 1}).json() == [
+        {"title": "Tetris", "platform": "Game Boy", "wishes": 2}
+    ]
+
+    counted = snapshot(session)
+    stats.reconcile_stats(session)
+    assert snapshot(session) == counted
+
+
+def test_counters_follow_updates_and_deletes(swap: Swap, session: Session, client: TestClient) -> None:
+    swap_id, proposer_id, acceptor_id = swap.id, swap.proposer_id, swap.acceptor_id
+    stats.reconcile_stats(session)
+    game_id = create_game(client, proposer_id, "Columns", "SEGA Mega Drive")
+    client.patch(f"/games/{game_id}", json={"platform": "Game Gear"})
+    client.patch("/games/bulk", json=[{"id": game_id, "platform": "SEGA Master System"}])
+    client.delete(f"/swaps/{swap_id}")
+    ristar = create_game(client, acceptor_id, "Ristar", "SEGA Mega Drive")
+    client.delete(f"/games/{ristar}")
+    client.request("DELETE", "/games/bulk", json=[game_id])
+    wish = client.post(f"/gamers/{acceptor_id}/wishlist", json={"title": "Ristar", "platform": "Game Gear"}).json()
+    client.delete(f"/gamers/{acceptor_id}/wishlist/{wish['id']}")
+    client.post(f"/gamers/{acceptor_id}/wishlist", json={"title": "Tetris", "platform": "Game Boy"})
+    assert client.delete(f"/gamers/{acceptor_id}").status_code == 204
+
+    counted = snapshot(session)
+    stats.reconcile_stats(session)
+    assert snapshot(session) == counted
+    assert counted["platforms"] == [("SEGA Mega Drive", 1, 1)]
+    assert counted["titles"] == []
+
+
+def test_reconcile_repairs_drift(swap: Swap, session: Session, client: TestClient) -> None:
+    stats.reconcile_stats(session)
+    session.execute(update(PlatformStats).values(games=PlatformStats.games + 5))
+    session.commit()
+    assert client.get("/stats/games").json()["games"] == 12
+
+    stats.reconcile_stats(session)
+
+    assert client.get("/stats/games").json() == {"games": 2, "available": 0, "in_swap": 2}
+    assert client.get(f"/stats/gamers/{swap.proposer_id}").json()["swaps"] == 1
+
+
+def test_gamer_stats_not_found(client: TestClient) -> None:
+    assert client.get("/stats/gamers/0").status_code == 404
+
+
+def test_reconciler_keeps_running_after_a_failure(session: Session) -> None:
+    runs = []
+
+    class Flaky(StatsReconciler):
+        async def reconcile(self) -> None:
+            runs.append(len(runs))
+            if len(runs) == 1:
+                raise RuntimeError
+
+    async def main() -> None:
+        reconciler = Flaky(session_factory=sessionmaker(bind=session.get_bind()), interval=0.001)
+        await reconciler.start()
+        while len(runs) < 3:
+            await asyncio.sleep(0.001)
+        await reconciler.stop()
+
+    asyncio.run(main())
+
+    assert runs[:3] == [0, 1, 2]
@@ -1,7 +1,17 @@
+import asyncio
+import json
+import pytest
+
 from fastapi.testclient import TestClient
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.models import Game, Gamer, Swap
+import app.crud.swaps as swaps
+from app.crud.versions import bump_table_versions
+from app.models import Game, Gamer, Swap, Wish
+import app.trades as trades
+from tests.conftest import count_statements
 
 
 def test_create_swap(session: Session, client: TestClient) -> None:
@@ -167,4 +177,248 @@ def test_delete_swap(swap: Swap, client: TestClient, session: Session) -> None:
 def test_delete_swap_not_exists(client: TestClient) -> None:
     response = client.delete(f"/swaps/{0}")
     assert response.status_code == 404, response.text
-    
\ No newline at end of file
+    
+
+def test_get_swaps_stream(swap: Swap, client: TestClient) -> None:
+    response = client.get("/swaps?stream=true")
+    lines = response.text.splitlines()
+
+    assert response.status_code == 200, response.text
+    assert len(lines) == 1
+    data = json.loads(lines[0])
+    assert (
+        data["id"] == swap.id
+        and data["proposer"]["id"] == swap.proposer_id
+        and len(data["games"]) == 2
+    )
+
+
+def test_get_swaps_stream_sparse_fields(swap: Swap, client: TestClient) -> None:
+    paged = client.get("/swaps", params={"fields": "proposer"}).json()
+    response = client.get("/swaps", params={"fields": "proposer", "stream": "true"})
+
+    assert response.status_code == 200, response.text
+    # The same shape whether streamed or paged
+    assert [json.loads(line) for line in response.text.splitlines()] == paged
+    assert set(paged[0]) == {"id", "proposer"}
+
+
+def test_get_swaps_matches_swap_schema(swap: Swap, client: TestClient) -> None:
+    listed = client.get("/swaps").json()[0]
+    detail = client.get(f"/swaps/{swap.id}").json()
+
+    # The list is built from plain columns, the detail from the ORM
+    assert sorted(listed["games"], key=lambda game: game["id"]) == sorted(detail["games"], key=lambda game: game["id"])
+    assert {**listed, "games": None} == {**detail, "games": None}
+
+
+
+def test_get_swaps_sparse_fields_skip_queries(swap: Swap, session: Session, client: TestClient) -> None:
+    swap_id, proposer_id = swap.id, swap.proposer_id
+    with count_statements(session) as statements:
+        response = client.get("/swaps", params={"fields": "proposer"})
+
+    assert response.status_code == 200, response.text
+    assert response.json() == [{"id": swap_id, "proposer": {"id": proposer_id, "name": "Player One", "email": "press@start.com"}}]
+    # The table versions for the ETag, then the swaps joined with the proposer only
+    assert len(statements) == 2
+    assert statements[1].count("JOIN") == 1
+
+
+def add_swaps(session: Session, count: int) -> None:
+    for _ in range(count):
+        n = session.query(Gamer).count()
+        proposer = Gamer(name=f"gamer{n}", email=f"gamer{n}@retro.com")
+        acceptor = Gamer(name=f"gamer{n + 1}", email=f"gamer{n + 1}@retro.com")
+        session.add_all([proposer, acceptor])
+        session.flush()
+
+        swap = Swap(proposer_id=proposer.id, acceptor_id=acceptor.id)
+        swap.games = [
+            Game(title="Sonic The Hedgehog", platform="SEGA Mega Drive", gamer_id=proposer.id),
+            Game(title="Super Mario Land", platform="Nintendo GAME BOY", gamer_id=acceptor.id),
+        ]
+        session.add(swap)
+    session.commit()
+
+
+def test_get_swaps_statement_count_is_constant(session: Session, client: TestClient) -> None:
+    add_swaps(session, 1)
+    with count_statements(session) as statements:
+        response = client.get("/swaps")
+    assert response.status_code == 200, response.text
+    baseline = len(statements)
+
+    add_swaps(session, 9)
+    with count_statements(session) as statements:
+        response = client.get("/swaps")
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 10
+    # The table versions for the ETag, the swaps with their gamers, and their games
+    assert len(statements) == baseline == 3
+
+
+def test_get_swap_statement_count(swap: Swap, session: Session, client: TestClient) -> None:
+    swap_id = swap.id
+    with count_statements(session) as statements:
+        response = client.get(f"/swaps/{swap_id}")
+    assert response.status_code == 200, response.text
+    # The row versions of the swap, its gamers and games for the ETag
+    # (get_swap_versions), then the swap in one JOIN
+    assert len(statements) == 2
+
+
+def test_create_swap_invalid_request_leaves_no_swap(session: Session, client: TestClient) -> None:
+    proposer = Gamer(name="Player One", email="press@start.com")
+    acceptor = Gamer(name="Player Two", email="insert@coin.com")
+    session.add_all([proposer, acceptor])
+    session.commit()
+
+    proposer_game = Game(title="Sonic The Hedgehog", platform="SEGA Mega Drive", gamer_id=proposer.id)
+    session.add(proposer_game)
+    session.commit()
+
+    swap_data = {
+        "proposer": {"id": proposer.id, "game_ids": [proposer_game.id]},
+        "acceptor": {"id": acceptor.id, "game_ids": [proposer_game.id + 1]},
+    }
+    response = client.post("/swaps", json=swap_data)
+    assert response.status_code == 422, response.text
+
+    assert session.query(Swap).count() == 0
+    assert session.get(Game, proposer_game.id).swap_id is None
+
+
+def test_create_swap_statement_count(session: Session, client: TestClient) -> None:
+    proposer = Gamer(name="Player One", email="press@start.com")
+    acceptor = Gamer(name="Player Two", email="insert@coin.com")
+    session.add_all([proposer, acceptor])
+    session.commit()
+
+    proposer_games = [Game(title=f"game{n}", platform="platform", gamer_id=proposer.id) for n in range(10)]
+    acceptor_games = [Game(title=f"game{n}", platform="other", gamer_id=acceptor.id) for n in range(10)]
+    session.add_all(proposer_games + acceptor_games)
+    session.commit()
+
+    swap_data = {
+        "proposer": {"id": proposer.id, "game_ids": [game.id for game in proposer_games]},
+        "acceptor": {"id": acceptor.id, "game_ids": [game.id for game in acceptor_games]},
+    }
+    with count_statements(session) as statements:
+        response = client.post("/swaps", json=swap_data)
+
+    assert response.status_code == 200, response.text
+    assert len(response.json()["games"]) == 20
+    # SELECT games, INSERT swap, UPDATE games, SELECT gamer names, INSERT outbox, 
+    # upsert platform and gamer stats, upsert table versions, SELECT swap graph
+    assert len(statements) == 9
+
+
+def test_get_swap_suggestions(session: Session, client: TestClient) -> None:
+    gamers = [Gamer(name=f"gamer{n}", email=f"gamer{n}@retro.com") for n in range(3)]
+    session.add_all(gamers)
+    session.commit()
+
+    titles = ["Sonic The Hedgehog", "Super Mario Land", "Ristar"]
+    for n, gamer in enumerate(gamers):
+        session.add(Game(title=titles[n], platform="platform", gamer_id=gamer.id))
+        session.add(Wish(title=titles[(n + 1) % 3], platform="platform", gamer_id=gamer.id))
+    session.commit()
+
+    response = client.get("/swaps/suggestions")
+    data = response.json()
+
+    assert response.status_code == 200, response.text
+    assert [suggestion["gamer_ids"] for suggestion in data] == [[gamer.id for gamer in gamers]]
+    assert [leg["title"] for leg in data[0]["legs"]] == ["Super Mario Land", "Ristar", "Sonic The Hedgehog"]
+
+    response = client.get(f"/swaps/suggestions?gamer_id={gamers[1].id}")
+    assert response.status_code == 200, response.text
+    assert response.json()[0]["gamer_ids"][0] == gamers[1].id
+
+    response = client.get(f"/swaps/suggestions?gamer_id={0}")
+    assert response.status_code == 404, response.text
+
+
+def test_swap_suggestions_follow_writes_without_rebuilding(session: Session, client: TestClient) -> None:
+    gamers = [Gamer(name=f"gamer{n}", email=f"gamer{n}@retro.com") for n in range(3)]
+    session.add_all(gamers)
+    session.commit()
+    gamer_ids = [gamer.id for gamer in gamers]
+
+    titles = ["Sonic The Hedgehog", "Super Mario Land", "Ristar"]
+    for n, gamer_id in enumerate(gamer_ids):
+        client.post("/games", json={"title": titles[n], "platform": "platform", "gamer_id": gamer_id})
+    for n, gamer_id in enumerate(gamer_ids[:2]):
+        client.post(f"/gamers/{gamer_id}/wishlist", json={"title": titles[n + 1], "platform": "platform"})
+    # The first request loads the graph
+    assert client.get("/swaps/suggestions").json() == []
+
+    # The last wish closes the cycle
+    client.post(f"/gamers/{gamer_ids[2]}/wishlist", json={"title": titles[0], "platform": "platform"})
+    with count_statements(session) as statements:
+        response = client.get("/swaps/suggestions")
+
+    assert [suggestion["gamer_ids"] for suggestion in response.json()] == [gamer_ids]
+    assert statements == []
+
+    game_id = client.get(f"/gamers/{gamer_ids[2]}/games").json()[0]["id"]
+    client.delete(f"/games/{game_id}")
+    assert client.get("/swaps/suggestions").json() == []
+
+
+def test_refresh_trade_graph_picks_up_other_writes(session: Session) -> None:
+    gamers = [Gamer(name=f"gamer{n}", email=f"gamer{n}@retro.com") for n in range(3)]
+    session.add_all(gamers)
+    session.commit()
+    assert asyncio.run(trades.get_swap_suggestions(session, 4, 10)) == []
+    assert not asyncio.run(trades.refresh_trade_graph(session))
+
+    # As another process would: straight to the database, bumping the table versions
+    titles = ["Sonic The Hedgehog", "Super Mario Land", "Ristar"]
+    for n, gamer in enumerate(gamers):
+        session.add(Game(title=titles[n], platform="platform", gamer_id=gamer.id))
+        session.add(Wish(title=titles[(n + 1) % 3], platform="platform", gamer_id=gamer.id))
+    bump_table_versions(session, "game", "wish")
+    session.commit()
+    assert asyncio.run(trades.get_swap_suggestions(session, 4, 10)) == []
+
+    assert asyncio.run(trades.refresh_trade_graph(session))
+    assert len(asyncio.run(trades.get_swap_suggestions(session, 4, 10))) == 1
+
+
+def test_swap_rejects_duplicate_game_on_append(session: Session) -> None:
+    proposer = Gamer(name="Player One", email="press@start.com")
+    acceptor = Gamer(name="Player Two", email="insert@coin.com")
+    session.add_all([proposer, acceptor])
+    session.commit()
+    sonic = Game(title="Sonic The Hedgehog", platform="SEGA Mega Drive", gamer_id=proposer.id)
+    other_sonic = Game(title="Sonic The Hedgehog", platform="SEGA Mega Drive", gamer_id=acceptor.id)
+    session.add_all([sonic, other_sonic])
+    session.commit()
+
+    swap = Swap(proposer_id=proposer.id, acceptor_id=acceptor.id)
+    swap.games.append(sonic)
+    with pytest.raises(ValueError, match="Duplicate game in swap"):
+        swap.games.append(other_sonic)
+
+    # Removing a game frees its title and platform
+    swap.games.remove(sonic)
+    swap.games.append(other_sonic)
+    session.add(swap)
+    session.commit()
+    assert [game.id for game in swap.games] == [other_sonic.id]
+
+
+def test_swap_duplicate_games_rejected_by_database(swap: Swap, session: Session) -> None:
+    sonic = next(game for game in swap.games if game.platform == "SEGA Mega Drive")
+    session.execute(
+        insert(Game).values(title=sonic.title, platform=sonic.platform, gamer_id=swap.acceptor_id)
+    )
+    session.commit()
+
+    with pytest.raises(IntegrityError):
+        session.execute(
+            update(Game).where(Game.swap_id == None, Game.title == sonic.title).values(swap_id=swap.id)
+        )
+    session.rollback()